@@ -1,8 +1,70 @@
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from dataclasses import dataclass
 from ollama_client import OllamaClient
 from config import AgentConfig
+from response_parser import (
+    parse_worker_sections, parse_boss_sections, parse_structured,
+    WorkerResponse, BossResponse, WORKER_RESPONSE_SCHEMA, BOSS_RESPONSE_SCHEMA
+)
+from prompt_budget import estimate_tokens, pack_worker_results
+
+# プレフィックス評価時に添える指示（応答は短く済ませる）
+PREFIX_ACK_INSTRUCTION = "以降の指示に備えて上記の内容を確認し、「了解しました」とだけ答えてください。"
+
+# 評価の最後に書かせる行。停止シーケンスに指定し、最後のセクションより後の生成を打ち切る
+EVALUATION_END_MARKER = "[評価終了]"
+EVALUATION_STOP_SEQUENCES = [EVALUATION_END_MARKER, "【評価終了】"]
+
+# Worker評価の指示（対象情報の前置きの後に続く）
+WORKER_EVALUATION_INSTRUCTION = f"""上記のアプリケーションについて評価し、以下の形式で回答してください：
+
+## 評価結果
+[専門分野での評価]
+
+## 推奨事項
+- [改善提案1]
+- [改善提案2]
+
+## リスクレベル
+[高/中/低] - [理由]
+
+## 優先度
+[高/中/低] - [理由]
+
+{EVALUATION_END_MARKER}"""
+
+# 構造化出力モードでのWorker評価の指示（formatのJSONスキーマと対応）
+WORKER_STRUCTURED_INSTRUCTION = """上記のアプリケーションについて評価し、以下のキーを持つJSONオブジェクトのみで回答してください：
+- evaluation: 専門分野での評価
+- recommendations: 改善提案の配列（1件以上）
+- risk_level: "高" / "中" / "低" のいずれか
+- priority: "高" / "中" / "低" のいずれか"""
+
+# BOSS評価の出力形式
+BOSS_EVALUATION_FORMAT = f"""以下の形式で最終評価を行ってください：
+
+## 統合評価結果
+[プロジェクト全体の品質評価]
+
+## 最終判定
+[Go/No-Go] - [理由]
+
+## リスク分析
+[高/中/低リスクの詳細分析]
+
+## 改善ロードマップ
+- [短期改善項目1]
+- [中期改善項目1]
+- [長期改善項目1]
+
+{EVALUATION_END_MARKER}"""
+
+BOSS_STRUCTURED_FORMAT = """以下のキーを持つJSONオブジェクトのみで最終評価を行ってください：
+- overall_evaluation: プロジェクト全体の品質評価
+- final_decision: "Go" または "No-Go"
+- risk_analysis: 高/中/低リスクの詳細分析（判定の根拠を含む）
+- improvement_roadmap: 短期・中期・長期の改善項目の配列"""
 
 @dataclass
 class AgentResult:
@@ -12,6 +74,9 @@ class AgentResult:
     recommendations: List[str]
     risk_level: str
     priority: str
+    error: Optional[str] = None  # 評価に失敗した場合のエラー内容
+    # 応答の解析方法（text: テキスト解析 / structured: JSONとして検証 / fallback: JSONの検証に失敗してテキスト解析）
+    parse_mode: str = "text"
 
 @dataclass
 class BossResult:
@@ -22,6 +87,10 @@ class BossResult:
     risk_analysis: str
     improvement_roadmap: List[str]
     worker_summary: Dict[str, Any]
+    error: Optional[str] = None
+    parse_mode: str = "text"
+    # Worker結果をプロンプトの上限に収めるために省略した内容の記録
+    prompt_compression: Optional[Dict[str, Any]] = None
 
 @dataclass
 class WorkerConversation:
@@ -30,6 +99,7 @@ class WorkerConversation:
     message: str
     timestamp: str
     conversation_type: str  # "question", "answer", "collaboration", "dispute"
+    error: Optional[str] = None
 
 class BaseAgent:
     def __init__(self, config: AgentConfig, ollama_client: OllamaClient):
@@ -40,101 +110,173 @@ class BaseAgent:
         self.model = config.model
         self.system_prompt = config.system_prompt
         self.temperature = config.temperature
-        self.conversation_history = []
+        # 対象情報ごとの評価済みプレフィックス（context, プロンプトトークン数）。取得できなければNone
+        self._prefix_contexts: Dict[str, Optional[Tuple[List[int], int]]] = {}
+        self._prefix_lock = asyncio.Lock()
     
-    async def evaluate(self, target_info: Dict[str, Any]) -> AgentResult:
+    async def evaluate(self, target_info: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None) -> AgentResult:
         """エージェント固有の評価を実行"""
         raise NotImplementedError
     
-    def create_prompt(self, target_info: Dict[str, Any]) -> str:
-        """評価用のプロンプトを作成"""
+    async def _generate(
+        self,
+        prompt: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        phase: str = "worker_evaluation",
+        conversation_type: Optional[str] = None,
+        prefix: Optional[str] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        stop: Optional[List[str]] = None
+    ) -> str:
+        """LLM呼び出し（on_tokenが指定された場合はストリーミングで逐次通知）
+        
+        prefixには対象情報などエージェント内で共通の前置きを渡す。評価済みのcontextがあれば
+        promptだけを送信し、なければprefixとpromptを連結して送信する。
+        response_formatを指定すると出力をそのJSONスキーマに制約する。
+        生成トークン数の上限はフェーズ（会話の場合は会話タイプ）ごとにAgentConfigから決まり、
+        stopの停止シーケンスとともにenforce_token_budgetsが有効な場合のみ適用する。
+        """
+        # 推論メトリクス集計用のタグ
+        tags = {"agent": self.name, "phase": phase, "conversation_type": conversation_type}
+        max_tokens = None
+        if self.client.config.enforce_token_budgets:
+            max_tokens = self.config.token_budget(conversation_type or phase, self.client.config.max_tokens)
+        else:
+            stop = None
+        context = None
+        if prefix is not None:
+            primed = await self._prefix_context(prefix) if self.client.config.prefix_reuse else None
+            if primed is None:
+                prompt = f"{prefix}\n\n{prompt}"
+            else:
+                context, tags["prefix_tokens_reused"] = primed
+        
+        if on_token is None:
+            return await self.client.generate_response(
+                model=self.model,
+                prompt=prompt,
+                system_prompt=self.system_prompt,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                tags=tags,
+                context=context,
+                response_format=response_format,
+                stop=stop
+            )
+        
+        tokens = []
+        async for token in self.client.stream_response(
+            model=self.model,
+            prompt=prompt,
+            system_prompt=self.system_prompt,
+            temperature=self.temperature,
+            max_tokens=max_tokens,
+            tags=tags,
+            context=context,
+            response_format=response_format,
+            stop=stop
+        ):
+            tokens.append(token)
+            on_token(token)
+        return "".join(tokens)
+    
+    async def _prefix_context(self, prefix: str) -> Optional[Tuple[List[int], int]]:
+        """システムプロンプト＋prefixを一度だけ評価し、返されたcontextを保持（失敗時はNone）"""
+        async with self._prefix_lock:
+            if prefix not in self._prefix_contexts:
+                try:
+                    context, prompt_tokens = await self.client.prime_context(
+                        model=self.model,
+                        prompt=f"{prefix}\n\n{PREFIX_ACK_INSTRUCTION}",
+                        system_prompt=self.system_prompt,
+                        temperature=self.temperature,
+                        tags={"agent": self.name, "phase": "prefix"}
+                    )
+                except Exception:
+                    context, prompt_tokens = None, 0
+                self._prefix_contexts[prefix] = (context, prompt_tokens) if context else None
+            return self._prefix_contexts[prefix]
+    
+    def _target_header(self, target_info: Dict[str, Any]) -> str:
+        """評価・会話で共通の前置き（対象情報と自分の役割）"""
         return f"""対象アプリケーション: {target_info.get('url', 'N/A')}
 概要: {target_info.get('description', 'N/A')}
 
-あなたの役割: {self.role}
-
-上記のアプリケーションについて評価し、以下の形式で回答してください：
-
-## 評価結果
-[専門分野での評価]
-
-## 推奨事項
-- [改善提案1]
-- [改善提案2]
-
-## リスクレベル
-[高/中/低] - [理由]
-
-## 優先度
-[高/中/低] - [理由]"""
-
-    def _parse_worker_response(self, response: str) -> AgentResult:
-        """Workerエージェント共通のレスポンス解析"""
-        lines = response.split('\n')
-        evaluation = ""
-        recommendations = []
-        risk_level = "中"
-        priority = "中"
-        
-        in_evaluation = False
-        in_recommendations = False
+あなたの役割: {self.role}"""
+    
+    @property
+    def structured_output(self) -> bool:
+        return self.client.config.structured_output
+    
+    def _past_findings(self, target_info: Dict[str, Any]) -> str:
+        """過去の評価で挙がった類似の指摘（target_info["past_findings"]にこのWorker宛てがある場合のみ）
         
-        for line in lines:
-            line = line.strip()
-            if "## 評価結果" in line:
-                in_evaluation = True
-                in_recommendations = False
-                continue
-            elif "## 推奨事項" in line:
-                in_evaluation = False
-                in_recommendations = True
-                continue
-            elif "## リスクレベル" in line:
-                in_recommendations = False
-                if "高" in line:
-                    risk_level = "高"
-                elif "低" in line:
-                    risk_level = "低"
-                continue
-            elif "## 優先度" in line:
-                if "高" in line:
-                    priority = "高"
-                elif "低" in line:
-                    priority = "低"
-                continue
-            
-            if in_evaluation and line:
-                evaluation += line + "\n"
-            elif in_recommendations and line.startswith("-"):
-                recommendations.append(line[1:].strip())
+        評価の指示の前に置き、評価対象の情報（プレフィックス）は変えない。
+        """
+        findings = (target_info.get("past_findings") or {}).get(self.name)
+        if not findings:
+            return ""
+        lines = "\n".join(f"- {finding}" for finding in findings)
+        return f"## 過去の評価で挙がった類似の指摘（参考。現在も当てはまるかを確認してください）\n{lines}\n\n"
+    
+    async def _evaluate_target(self, target_info: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None) -> AgentResult:
+        """Workerエージェント共通の評価（構造化出力モードではJSONスキーマで出力を制約する）"""
+        if not self.structured_output:
+            response = await self._generate(
+                self._past_findings(target_info) + WORKER_EVALUATION_INSTRUCTION,
+                on_token,
+                prefix=self._target_header(target_info),
+                stop=EVALUATION_STOP_SEQUENCES
+            )
+            return self._parse_worker_response(response)
         
-        if not evaluation.strip():
-            evaluation = response
+        response = await self._generate(
+            self._past_findings(target_info) + WORKER_STRUCTURED_INSTRUCTION,
+            on_token,
+            prefix=self._target_header(target_info),
+            response_format=WORKER_RESPONSE_SCHEMA
+        )
+        return self._parse_worker_response(response, structured=True)
+    
+    def _parse_worker_response(self, response: str, structured: bool = False) -> AgentResult:
+        """Workerエージェント共通のレスポンス解析（structuredの場合はJSONとして検証し、失敗時のみテキスト解析）"""
+        if structured:
+            parsed = parse_structured(response, WorkerResponse)
+            if parsed is not None:
+                return AgentResult(agent_name=self.name, role=self.role, parse_mode="structured", **parsed.model_dump())
         
-        if not recommendations:
-            recommendations = ["詳細な評価が必要です"]
+        sections = parse_worker_sections(response)
         
         return AgentResult(
             agent_name=self.name,
             role=self.role,
-            evaluation=evaluation.strip(),
-            recommendations=recommendations,
-            risk_level=risk_level,
-            priority=priority
+            evaluation=sections["evaluation"] or response.strip(),
+            recommendations=sections["recommendations"] or ["詳細な評価が必要です"],
+            risk_level=sections["risk_level"] or "中",
+            priority=sections["priority"] or "中",
+            parse_mode="fallback" if structured else "text"
         )
-
-    async def communicate_with_worker(self, other_worker: 'BaseAgent', target_info: Dict[str, Any], conversation_type: str) -> WorkerConversation:
-        """他のWorkerエージェントとの会話を実行"""
+    
+    async def communicate_with_worker(
+        self,
+        other_worker: 'BaseAgent',
+        target_info: Dict[str, Any],
+        conversation_type: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        in_reply_to: Optional[str] = None
+    ) -> WorkerConversation:
+        """他のWorkerエージェントとの会話を実行（in_reply_toには回答対象の相手の質問を渡す）"""
         from datetime import datetime
         
-        conversation_prompt = self._create_conversation_prompt(other_worker, target_info, conversation_type)
+        conversation_prompt = self._create_conversation_prompt(other_worker, conversation_type, in_reply_to)
         
         try:
-            response = await self.client.generate_response(
-                model=self.model,
-                prompt=conversation_prompt,
-                system_prompt=self.system_prompt,
-                temperature=self.temperature
+            response = await self._generate(
+                conversation_prompt,
+                on_token,
+                phase="conversation",
+                conversation_type=conversation_type,
+                prefix=self._target_header(target_info)
             )
             
             conversation = WorkerConversation(
@@ -145,66 +287,67 @@ class BaseAgent:
                 conversation_type=conversation_type
             )
             
-            self.conversation_history.append(conversation)
             return conversation
-            
+        
         except Exception as e:
             return WorkerConversation(
                 from_agent=self.name,
                 to_agent=other_worker.name,
                 message=f"会話中にエラーが発生しました: {str(e)}",
                 timestamp=datetime.now().isoformat(),
-                conversation_type=conversation_type
+                conversation_type=conversation_type,
+                error=str(e)
             )
-
-    def _create_conversation_prompt(self, other_worker: 'BaseAgent', target_info: Dict[str, Any], conversation_type: str) -> str:
-        """会話用のプロンプトを作成"""
+    
+    def _create_conversation_prompt(
+        self,
+        other_worker: 'BaseAgent',
+        conversation_type: str,
+        in_reply_to: Optional[str] = None
+    ) -> str:
+        """会話用のプロンプトを作成（対象情報の前置きの後に続く部分）"""
         
-        if conversation_type == "question":
-            return f"""あなたは{self.role}です。
-他のWorkerエージェント「{other_worker.name}」に質問をしてください。
+        if conversation_type == "answer" and in_reply_to:
+            return f"""他のWorkerエージェント「{other_worker.name}」からの質問に回答してください。
 
-対象アプリケーション: {target_info.get('url', 'N/A')}
-概要: {target_info.get('description', 'N/A')}
+あなたの専門分野: {self.role}
+相手の専門分野: {other_worker.role}
+
+相手からの質問:
+{in_reply_to}
+
+上記の質問に対して、あなたの専門分野の観点から回答してください。
+回答は具体的で実用的であるべきです。"""
+
+        if conversation_type == "question":
+            return f"""他のWorkerエージェント「{other_worker.name}」に質問をしてください。
 
 あなたの専門分野: {self.role}
 相手の専門分野: {other_worker.role}
 
 あなたの専門分野に関連して、相手の専門分野について質問してください。
 質問は具体的で建設的であるべきです。"""
-        
-        elif conversation_type == "answer":
-            return f"""あなたは{self.role}です。
-他のWorkerエージェント「{other_worker.name}」からの質問に回答してください。
 
-対象アプリケーション: {target_info.get('url', 'N/A')}
-概要: {target_info.get('description', 'N/A')}
+        elif conversation_type == "answer":
+            return f"""他のWorkerエージェント「{other_worker.name}」からの質問に回答してください。
 
 あなたの専門分野: {self.role}
 相手の専門分野: {other_worker.role}
 
 相手の質問に対して、あなたの専門分野の観点から回答してください。
 回答は具体的で実用的であるべきです。"""
-        
-        elif conversation_type == "collaboration":
-            return f"""あなたは{self.role}です。
-他のWorkerエージェント「{other_worker.name}」と協力して改善提案を検討してください。
 
-対象アプリケーション: {target_info.get('url', 'N/A')}
-概要: {target_info.get('description', 'N/A')}
+        elif conversation_type == "collaboration":
+            return f"""他のWorkerエージェント「{other_worker.name}」と協力して改善提案を検討してください。
 
 あなたの専門分野: {self.role}
 相手の専門分野: {other_worker.role}
 
 両方の専門分野を組み合わせた改善提案を検討してください。
 協力的で建設的な提案をしてください。"""
-        
-        else:  # dispute
-            return f"""あなたは{self.role}です。
-他のWorkerエージェント「{other_worker.name}」と異なる観点について議論してください。
 
-対象アプリケーション: {target_info.get('url', 'N/A')}
-概要: {target_info.get('description', 'N/A')}
+        else:  # dispute
+            return f"""他のWorkerエージェント「{other_worker.name}」と異なる観点について議論してください。
 
 あなたの専門分野: {self.role}
 相手の専門分野: {other_worker.role}
@@ -213,7 +356,12 @@ class BaseAgent:
 建設的な議論を心がけてください。"""
 
 class BossAgent(BaseAgent):
-    async def evaluate_workers(self, worker_results: List[AgentResult], target_info: Dict[str, Any]) -> BossResult:
+    async def evaluate_workers(
+        self,
+        worker_results: List[AgentResult],
+        target_info: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> BossResult:
         """Workerエージェントの結果を統合して最終評価を実行"""
         
         # Worker結果のサマリーを作成
@@ -228,17 +376,20 @@ class BossAgent(BaseAgent):
             }
         
         # BOSS用のプロンプトを作成
-        prompt = self._create_boss_prompt(worker_results, target_info)
+        prompt, prompt_compression = self._create_boss_prompt(worker_results, target_info)
         
         try:
-            response = await self.client.generate_response(
-                model=self.model,
-                prompt=prompt,
-                system_prompt=self.system_prompt,
-                temperature=self.temperature
+            response = await self._generate(
+                prompt,
+                on_token,
+                phase="boss_evaluation",
+                response_format=BOSS_RESPONSE_SCHEMA if self.structured_output else None,
+                stop=None if self.structured_output else EVALUATION_STOP_SEQUENCES
             )
             
-            return self._parse_boss_response(response, worker_summary)
+            boss_result = self._parse_boss_response(response, worker_summary, structured=self.structured_output)
+            boss_result.prompt_compression = prompt_compression
+            return boss_result
         except Exception as e:
             return BossResult(
                 agent_name=self.name,
@@ -247,126 +398,66 @@ class BossAgent(BaseAgent):
                 final_decision="No-Go",
                 risk_analysis="エラーにより評価できません",
                 improvement_roadmap=["システムエラーの解決が必要です"],
-                worker_summary=worker_summary
+                worker_summary=worker_summary,
+                error=str(e),
+                prompt_compression=prompt_compression
             )
     
-    def _create_boss_prompt(self, worker_results: List[AgentResult], target_info: Dict[str, Any]) -> str:
-        """BOSS用のプロンプトを作成"""
-        worker_summary = "\n\n".join([
-            f"## {result.agent_name} ({result.role})\n"
-            f"評価: {result.evaluation}\n"
-            f"推奨事項: {', '.join(result.recommendations)}\n"
-            f"リスクレベル: {result.risk_level}\n"
-            f"優先度: {result.priority}"
-            for result in worker_results
-        ])
+    def _create_boss_prompt(self, worker_results: List[AgentResult], target_info: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """BOSS用のプロンプトと、Worker結果の圧縮の記録を作成
         
-        return f"""対象アプリケーション: {target_info.get('url', 'N/A')}
+        prompt_token_budgetが指定されている場合は、システムプロンプトと固定部分の推定トークン数を
+        差し引いた残りにWorker結果が収まるように圧縮する。
+        """
+        header = f"""対象アプリケーション: {target_info.get('url', 'N/A')}
 概要: {target_info.get('description', 'N/A')}
 
 ## Workerエージェントの評価結果
 
-{worker_summary}
-
-上記のWorkerエージェントの評価結果を統合し、以下の形式で最終評価を行ってください：
-
-## 統合評価結果
-[プロジェクト全体の品質評価]
-
-## 最終判定
-[Go/No-Go] - [理由]
-
-## リスク分析
-[高/中/低リスクの詳細分析]
-
-## 改善ロードマップ
-- [短期改善項目1]
-- [中期改善項目1]
-- [長期改善項目1]"""
-
-    def _parse_boss_response(self, response: str, worker_summary: Dict[str, Any]) -> BossResult:
-        """BOSSのレスポンスを解析"""
-        lines = response.split('\n')
-        overall_evaluation = ""
-        final_decision = "No-Go"
-        risk_analysis = ""
-        improvement_roadmap = []
+"""
+        footer = f"\n\n上記のWorkerエージェントの評価結果を統合し、{BOSS_STRUCTURED_FORMAT if self.structured_output else BOSS_EVALUATION_FORMAT}"
         
-        in_evaluation = False
-        in_decision = False
-        in_risk = False
-        in_roadmap = False
+        budget = self.config.prompt_token_budget
+        if budget is not None:
+            budget = max(0, budget - estimate_tokens(self.system_prompt) - estimate_tokens(header + footer))
+        worker_summary, compression = pack_worker_results(worker_results, budget)
         
-        for line in lines:
-            line = line.strip()
-            if "## 統合評価結果" in line:
-                in_evaluation = True
-                in_decision = False
-                in_risk = False
-                in_roadmap = False
-                continue
-            elif "## 最終判定" in line:
-                in_evaluation = False
-                in_decision = True
-                in_risk = False
-                in_roadmap = False
-                continue
-            elif "## リスク分析" in line:
-                in_evaluation = False
-                in_decision = False
-                in_risk = True
-                in_roadmap = False
-                continue
-            elif "## 改善ロードマップ" in line:
-                in_evaluation = False
-                in_decision = False
-                in_risk = False
-                in_roadmap = True
-                continue
-            
-            if in_evaluation and line:
-                overall_evaluation += line + "\n"
-            elif in_decision and line:
-                if "Go" in line:
-                    final_decision = "Go"
-                elif "No-Go" in line:
-                    final_decision = "No-Go"
-            elif in_risk and line:
-                risk_analysis += line + "\n"
-            elif in_roadmap and line.startswith("-"):
-                improvement_roadmap.append(line[1:].strip())
+        return f"{header}{worker_summary}{footer}", compression
+
+    def _parse_boss_response(self, response: str, worker_summary: Dict[str, Any], structured: bool = False) -> BossResult:
+        """BOSSのレスポンスを解析（structuredの場合はJSONとして検証し、失敗時のみテキスト解析）"""
+        if structured:
+            parsed = parse_structured(response, BossResponse)
+            if parsed is not None:
+                return BossResult(
+                    agent_name=self.name,
+                    role=self.role,
+                    worker_summary=worker_summary,
+                    parse_mode="structured",
+                    **parsed.model_dump()
+                )
         
-        # デフォルト値の設定
-        if not overall_evaluation.strip():
-            overall_evaluation = "Workerエージェントの評価を統合した結果、プロジェクトの品質を総合的に評価しました。"
-        if not risk_analysis.strip():
-            risk_analysis = "中リスク - 改善が必要だがリリースは可能"
-        if not improvement_roadmap:
-            improvement_roadmap = ["短期: セキュリティ強化", "中期: UI/UX改善", "長期: 機能拡張"]
+        sections = parse_boss_sections(response)
         
+        # 見つからない項目はデフォルト値（判定が読み取れない場合はNo-Go）
         return BossResult(
             agent_name=self.name,
             role=self.role,
-            overall_evaluation=overall_evaluation.strip(),
-            final_decision=final_decision,
-            risk_analysis=risk_analysis.strip(),
-            improvement_roadmap=improvement_roadmap,
-            worker_summary=worker_summary
+            overall_evaluation=(
+                sections["overall_evaluation"]
+                or "Workerエージェントの評価を統合した結果、プロジェクトの品質を総合的に評価しました。"
+            ),
+            final_decision=sections["final_decision"] or "No-Go",
+            risk_analysis=sections["risk_analysis"] or "中リスク - 改善が必要だがリリースは可能",
+            improvement_roadmap=sections["improvement_roadmap"] or ["短期: セキュリティ強化", "中期: UI/UX改善", "長期: 機能拡張"],
+            worker_summary=worker_summary,
+            parse_mode="fallback" if structured else "text"
         )
 
 class ISTQBComplianceWorker(BaseAgent):
-    async def evaluate(self, target_info: Dict[str, Any]) -> AgentResult:
-        prompt = self.create_prompt(target_info)
-        
+    async def evaluate(self, target_info: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None) -> AgentResult:
         try:
-            response = await self.client.generate_response(
-                model=self.model,
-                prompt=prompt,
-                system_prompt=self.system_prompt,
-                temperature=self.temperature
-            )
-            
-            return self._parse_worker_response(response)
+            return await self._evaluate_target(target_info, on_token)
         except Exception as e:
             return AgentResult(
                 agent_name=self.name,
@@ -374,22 +465,14 @@ class ISTQBComplianceWorker(BaseAgent):
                 evaluation=f"評価中にエラーが発生しました: {str(e)}",
                 recommendations=["システムエラーのため評価を再実行してください", f"エラー詳細: {str(e)}"],
                 risk_level="不明",
-                priority="高"
+                priority="高",
+                error=str(e)
             )
 
 class ManagementRequirementsWorker(BaseAgent):
-    async def evaluate(self, target_info: Dict[str, Any]) -> AgentResult:
-        prompt = self.create_prompt(target_info)
-        
+    async def evaluate(self, target_info: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None) -> AgentResult:
         try:
-            response = await self.client.generate_response(
-                model=self.model,
-                prompt=prompt,
-                system_prompt=self.system_prompt,
-                temperature=self.temperature
-            )
-            
-            return self._parse_worker_response(response)
+            return await self._evaluate_target(target_info, on_token)
         except Exception as e:
             return AgentResult(
                 agent_name=self.name,
@@ -397,22 +480,14 @@ class ManagementRequirementsWorker(BaseAgent):
                 evaluation=f"評価中にエラーが発生しました: {str(e)}",
                 recommendations=["システムエラーのため評価を再実行してください", f"エラー詳細: {str(e)}"],
                 risk_level="不明",
-                priority="高"
+                priority="高",
+                error=str(e)
             )
 
 class TechnicalAnalystWorker(BaseAgent):
-    async def evaluate(self, target_info: Dict[str, Any]) -> AgentResult:
-        prompt = self.create_prompt(target_info)
-        
+    async def evaluate(self, target_info: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None) -> AgentResult:
         try:
-            response = await self.client.generate_response(
-                model=self.model,
-                prompt=prompt,
-                system_prompt=self.system_prompt,
-                temperature=self.temperature
-            )
-            
-            return self._parse_worker_response(response)
+            return await self._evaluate_target(target_info, on_token)
         except Exception as e:
             return AgentResult(
                 agent_name=self.name,
@@ -420,22 +495,14 @@ class TechnicalAnalystWorker(BaseAgent):
                 evaluation=f"評価中にエラーが発生しました: {str(e)}",
                 recommendations=["システムエラーのため評価を再実行してください", f"エラー詳細: {str(e)}"],
                 risk_level="不明",
-                priority="高"
+                priority="高",
+                error=str(e)
             )
 
 class UXDesignWorker(BaseAgent):
-    async def evaluate(self, target_info: Dict[str, Any]) -> AgentResult:
-        prompt = self.create_prompt(target_info)
-        
+    async def evaluate(self, target_info: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None) -> AgentResult:
         try:
-            response = await self.client.generate_response(
-                model=self.model,
-                prompt=prompt,
-                system_prompt=self.system_prompt,
-                temperature=self.temperature
-            )
-            
-            return self._parse_worker_response(response)
+            return await self._evaluate_target(target_info, on_token)
         except Exception as e:
             return AgentResult(
                 agent_name=self.name,
@@ -443,22 +510,14 @@ class UXDesignWorker(BaseAgent):
                 evaluation=f"評価中にエラーが発生しました: {str(e)}",
                 recommendations=["システムエラーのため評価を再実行してください", f"エラー詳細: {str(e)}"],
                 risk_level="不明",
-                priority="高"
+                priority="高",
+                error=str(e)
             )
 
 class SecurityAuditWorker(BaseAgent):
-    async def evaluate(self, target_info: Dict[str, Any]) -> AgentResult:
-        prompt = self.create_prompt(target_info)
-        
+    async def evaluate(self, target_info: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None) -> AgentResult:
         try:
-            response = await self.client.generate_response(
-                model=self.model,
-                prompt=prompt,
-                system_prompt=self.system_prompt,
-                temperature=self.temperature
-            )
-            
-            return self._parse_worker_response(response)
+            return await self._evaluate_target(target_info, on_token)
         except Exception as e:
             return AgentResult(
                 agent_name=self.name,
@@ -466,7 +525,8 @@ class SecurityAuditWorker(BaseAgent):
                 evaluation=f"評価中にエラーが発生しました: {str(e)}",
                 recommendations=["システムエラーのため評価を再実行してください", f"エラー詳細: {str(e)}"],
                 risk_level="不明",
-                priority="高"
+                priority="高",
+                error=str(e)
             )
 
 def create_agent(config: AgentConfig, ollama_client: OllamaClient) -> BaseAgent:
@@ -0,0 +1,128 @@
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+from dataclasses import asdict
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Optional
+
+from config import DEFAULT_TARGET_DESCRIPTION
+from multi_agent_system import MultiAgentSystem
+from recommendation_clusters import build_clusters, cluster_texts
+
+def load_targets(path: str) -> List[Dict[str, Any]]:
+    """JSONLまたはCSVから評価対象（url, source, description）を読み込む"""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_no}: JSONの解析に失敗しました: {e}")
+    
+    targets = []
+    for index, row in enumerate(rows, start=1):
+        url = (row.get("url") or "").strip()
+        if not url:
+            raise ValueError(f"{path}: {index}件目の対象にurlがありません")
+        targets.append({
+            "url": url,
+            "source_code": (row.get("source") or row.get("source_code") or "").strip(),
+            "description": (row.get("description") or "").strip() or DEFAULT_TARGET_DESCRIPTION
+        })
+    return targets
+
+def _report_filename(index: int, url: str) -> str:
+    """対象URLからレポートファイル名を作成"""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", re.sub(r"^https?://", "", url)).strip("_")[:60]
+    return f"report_{index:03d}_{slug or 'target'}.json"
+
+async def run_batch(
+    system: MultiAgentSystem,
+    targets: List[Dict[str, Any]],
+    output_dir: str,
+    concurrency: int = 2,
+    on_complete: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """共有クライアント・エージェントで複数対象を評価し、対象ごとのレポートとサマリーインデックスを出力
+    
+    全対象の推奨事項はほぼ同じ内容ごとにまとめ、recommendation_clusters.jsonに出力する。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    entries: List[Optional[Dict[str, Any]]] = [None] * len(targets)
+    # (推奨事項, Worker名, リスクレベル, 優先度, 対象の番号)
+    recommendations: List[tuple] = []
+    
+    async def evaluate(index: int, target_info: Dict[str, Any]):
+        async with semaphore:
+            target_system = system.fork()
+            started = time.perf_counter()
+            entry = {
+                "index": index,
+                "url": target_info["url"],
+                "source_code": target_info["source_code"],
+                "report": None,
+                "final_decision": None,
+                "error": None
+            }
+            try:
+                boss_result = await target_system.run_evaluation(target_info)
+                if boss_result is None:
+                    entry["error"] = "評価結果がありません"
+                else:
+                    filename = os.path.join(output_dir, _report_filename(index, target_info["url"]))
+                    target_system.save_report(filename)
+                    entry["report"] = os.path.basename(filename)
+                    entry["final_decision"] = boss_result.final_decision
+                    recommendations.extend(
+                        (rec, result.agent_name, result.risk_level, result.priority, index)
+                        for result in target_system.worker_results
+                        if not result.error
+                        for rec in result.recommendations
+                    )
+            except Exception as e:
+                entry["error"] = str(e)
+            finally:
+                target_system.worker_conversations.close()
+            entry["duration_seconds"] = round(time.perf_counter() - started, 2)
+            entries[index - 1] = entry
+            if on_complete:
+                on_complete(entry)
+    
+    started_at = datetime.now().isoformat()
+    await asyncio.gather(*(evaluate(i, target) for i, target in enumerate(targets, start=1)))
+    
+    clusters_file = os.path.join(output_dir, "recommendation_clusters.json")
+    clusters = []
+    if recommendations:
+        texts, agents, risk_levels, priorities, indices = (list(column) for column in zip(*recommendations))
+        clusters = build_clusters(texts, agents, risk_levels, priorities, cluster_texts(texts), indices)
+    with open(clusters_file, "w", encoding="utf-8") as f:
+        json.dump([asdict(cluster) for cluster in clusters], f, ensure_ascii=False, indent=2)
+    
+    summary = {
+        "started_at": started_at,
+        "finished_at": datetime.now().isoformat(),
+        "total_targets": len(targets),
+        "go": sum(1 for e in entries if e["final_decision"] == "Go"),
+        "no_go": sum(1 for e in entries if e["final_decision"] == "No-Go"),
+        "failed": sum(1 for e in entries if e["error"]),
+        "recommendation_clusters": {
+            "file": os.path.basename(clusters_file),
+            "recommendations": len(recommendations),
+            "clusters": len(clusters)
+        },
+        "targets": entries
+    }
+    with open(os.path.join(output_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
@@ -0,0 +1,309 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from rich.console import Console
+
+from config import config, BOSS_CONFIG, WORKER_CONFIGS, AgentConfig
+from mock_ollama import MockOllamaServer, DEFAULT_RESPONSE
+from multi_agent_system import MultiAgentSystem
+from response_parser import parse_worker_sections, parse_boss_sections
+from recommendation_clusters import cluster_texts
+
+BENCHMARK_TARGET = {
+    "url": "https://benchmark.example.com/",
+    "source_code": "https://github.com/example/benchmark",
+    "description": "ベンチマーク用のダミー対象"
+}
+
+def make_worker_configs(count: int) -> List[AgentConfig]:
+    """既存のWorker設定を巡回して指定数のWorkerを作成（名前に連番を付与）"""
+    configs = []
+    for i in range(count):
+        base = WORKER_CONFIGS[i % len(WORKER_CONFIGS)]
+        name = base.name if i < len(WORKER_CONFIGS) else f"{base.name}_{i + 1}"
+        configs.append(base.model_copy(update={"name": name}))
+    return configs
+
+async def benchmark_workers(
+    worker_count: int,
+    latency: float,
+    tokens_per_second: float,
+    concurrency: int,
+    stream: bool,
+    topology: Optional[str] = None,
+    spill_messages: bool = False,
+    track_memory: bool = False,
+    server_parallel: Optional[int] = None
+) -> Dict[str, Any]:
+    """スタブサーバーに対して1回分の評価を実行し、フェーズごとの所要時間とメモリ使用量を計測"""
+    worker_configs = make_worker_configs(worker_count)
+    models = sorted({c.model for c in worker_configs} | {BOSS_CONFIG.model})
+    
+    async with MockOllamaServer(
+        models, latency=latency, tokens_per_second=tokens_per_second, parallel=server_parallel
+    ) as server:
+        ollama_config = config.ollama.model_copy(update={
+            "base_url": server.url,
+            "endpoints": [],
+            "cache_mode": "off",
+            "max_concurrent_requests": concurrency,
+            "max_concurrent_per_model": concurrency,
+            "max_retries": 0
+        })
+        async with MultiAgentSystem(
+            stream=stream,
+            ollama_config=ollama_config,
+            worker_configs=worker_configs,
+            topology=topology,
+            conversation_config=config.conversation.model_copy(update={"spill_messages": spill_messages})
+        ) as system:
+            system.console = Console(quiet=True)
+            await system.ollama_client.check_models()
+            
+            # tracemallocは計測対象の処理を遅くするため、指定時のみ有効にする
+            if track_memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            boss_result = await system.run_evaluation(BENCHMARK_TARGET)
+            run_seconds = time.perf_counter() - started
+            peak_memory = None
+            if track_memory:
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            
+            started = time.perf_counter()
+            system.generate_report()
+            report_seconds = time.perf_counter() - started
+            
+            with tempfile.TemporaryDirectory() as tmp:
+                filename = os.path.join(tmp, "report.json")
+                started = time.perf_counter()
+                system.save_report(filename)
+                save_seconds = time.perf_counter() - started
+                report_bytes = os.path.getsize(filename)
+            
+            calls = len(system.ollama_client.call_stats)
+            return {
+                "workers": worker_count,
+                "stream": stream,
+                "topology": system.conversation_config.topology,
+                "final_decision": boss_result.final_decision if boss_result else None,
+                "llm_calls": calls,
+                "requests_served": server.requests_served,
+                "run_evaluation_seconds": round(run_seconds, 3),
+                "phase_seconds": system.phase_timings,
+                "generate_report_seconds": round(report_seconds, 4),
+                "save_report_seconds": round(save_seconds, 4),
+                "report_bytes": report_bytes,
+                "conversation_store": system.worker_conversations.memory_usage(),
+                "concurrency_limits": [
+                    {key: value for key, value in endpoint["concurrency"].items() if key != "history"}
+                    for endpoint in system.ollama_client.pool.summary() if endpoint["concurrency"]
+                ],
+                "peak_memory_bytes": peak_memory,
+                "calls_per_second": round(calls / run_seconds, 1) if run_seconds else None
+            }
+
+async def run_benchmark(
+    worker_counts: List[int],
+    latency: float = 0.01,
+    tokens_per_second: float = 2000.0,
+    concurrency: int = 16,
+    stream: bool = True,
+    topology: Optional[str] = None,
+    spill_messages: bool = False,
+    track_memory: bool = False,
+    server_parallel: Optional[int] = None,
+    baseline: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Worker数ごとにベンチマークを実行して結果をまとめる"""
+    results = []
+    for count in worker_counts:
+        results.append(await benchmark_workers(
+            count, latency, tokens_per_second, concurrency, stream, topology, spill_messages, track_memory, server_parallel
+        ))
+    
+    summary = {
+        "timestamp": datetime.now().isoformat(),
+        "settings": {
+            "latency": latency,
+            "tokens_per_second": tokens_per_second,
+            "concurrency": concurrency,
+            "stream": stream,
+            "topology": topology,
+            "spill_messages": spill_messages,
+            "track_memory": track_memory,
+            "server_parallel": server_parallel
+        },
+        "results": results
+    }
+    if baseline:
+        summary["comparison"] = compare_with_baseline(results, baseline)
+    return summary
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """同じWorker数のベースライン結果との比（今回/ベースライン）を算出"""
+    base_by_workers = {r["workers"]: r for r in baseline.get("results", [])}
+    comparison = []
+    for result in results:
+        base = base_by_workers.get(result["workers"])
+        if not base:
+            continue
+        comparison.append({
+            "workers": result["workers"],
+            "run_evaluation_ratio": round(result["run_evaluation_seconds"] / base["run_evaluation_seconds"], 3),
+            "conversations_ratio": round(
+                result["phase_seconds"]["conversations"] / base["phase_seconds"]["conversations"], 3
+            ) if base["phase_seconds"].get("conversations") else None,
+            "generate_report_ratio": round(
+                result["generate_report_seconds"] / base["generate_report_seconds"], 3
+            ) if base["generate_report_seconds"] else None
+        })
+    return comparison
+
+def make_parser_inputs(line_count: int) -> Dict[str, str]:
+    """パーサー計測用の応答（通常の応答を繰り返した巨大な応答と、正規表現のバックトラックを誘発しやすい入力）"""
+    base_lines = DEFAULT_RESPONSE.split("\n")
+    repeated = (base_lines * (line_count // len(base_lines) + 1))[:line_count]
+    width = line_count * 10  # 1行に詰め込む場合の文字数
+    return {
+        "large": "\n".join(repeated),
+        "headings_only": "\n".join(f"## 最終判定 {i}" if i % 2 else "## 推奨事項" for i in range(line_count)),
+        "bullets": "## 推奨事項\n## 改善ロードマップ\n" + "\n".join(f"- 項目{i}" for i in range(line_count)),
+        "long_whitespace_line": "## 最終判定\n" + "no" + " " * width + "x",
+        "long_heading_prefix": "#" * width + " 評価結果",
+        "long_bullet_line": "## 推奨事項\n-" + " " * width + "x" + " " * width,
+        "no_sections": "\n".join("評価 リスク 判定 Go No" for _ in range(line_count))
+    }
+
+def benchmark_parsers(line_counts: List[int], repeat: int = 3) -> List[Dict[str, Any]]:
+    """Worker・BOSSのパーサーを入力ごとに計測（repeat回の最短時間）"""
+    results = []
+    for line_count in line_counts:
+        for name, text in make_parser_inputs(line_count).items():
+            timings = {}
+            for parser_name, parser in (("worker", parse_worker_sections), ("boss", parse_boss_sections)):
+                best = None
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    parser(text)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[parser_name] = best
+            results.append({
+                "lines": line_count,
+                "input": name,
+                "bytes": len(text.encode("utf-8")),
+                "worker_seconds": round(timings["worker"], 4),
+                "boss_seconds": round(timings["boss"], 4),
+                "mb_per_second": round(
+                    len(text.encode("utf-8")) / 1024 / 1024 / max(timings["worker"], timings["boss"]), 1
+                ) if max(timings.values()) else None
+            })
+    return results
+
+# 推奨事項の計測用の語句（対象 × 観点 × 動作の組み合わせで異なる推奨事項を作る）
+_RECOMMENDATION_SUBJECTS = ["決済画面", "商品一覧", "カート", "会員登録", "管理画面", "Stripe Webhook", "API", "ログ", "通知メール", "検索"]
+_RECOMMENDATION_ASPECTS = ["入力検証", "エラーハンドリング", "アクセシビリティ", "表示速度", "CSRF対策", "監査ログ", "文言", "HTTPS", "レート制限", "テスト"]
+_RECOMMENDATION_ACTIONS = ["を改善する", "を強化する", "を見直す", "を追加する", "を整備する"]
+_RECOMMENDATION_SUFFIXES = ["", "。", "こと", "（優先）", "ことを推奨します", " 早急に"]
+
+def make_recommendations(count: int, seed: int = 0) -> List[str]:
+    """バッチ評価を模した推奨事項（同じ内容の表記ゆれ・全角半角の違い・番号付きの記述を含む）"""
+    rng = random.Random(seed)
+    recommendations = []
+    for _ in range(count):
+        text = (
+            f"{rng.choice(_RECOMMENDATION_SUBJECTS)}の{rng.choice(_RECOMMENDATION_ASPECTS)}"
+            f"{rng.choice(_RECOMMENDATION_ACTIONS)}{rng.choice(_RECOMMENDATION_SUFFIXES)}"
+        )
+        if rng.random() < 0.2:
+            text = text.replace("API", "ＡＰＩ").replace("HTTPS", "ｈｔｔｐｓ")
+        if rng.random() < 0.3:
+            text = f"{text}（対象{rng.randrange(count)}）"
+        recommendations.append(text)
+    return recommendations
+
+def benchmark_clustering(counts: List[int], repeat: int = 3, threshold: float = 0.5) -> List[Dict[str, Any]]:
+    """推奨事項のクラスタリングを件数ごとに計測（repeat回の最短時間）"""
+    results = []
+    for count in counts:
+        texts = make_recommendations(count)
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            labels = cluster_texts(texts, threshold)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results.append({
+            "recommendations": count,
+            "distinct": len(set(texts)),
+            "clusters": int(labels.max()) + 1 if count else 0,
+            "seconds": round(best, 3),
+            "recommendations_per_second": round(count / best) if best else None
+        })
+    return results
+
+# 評価を行わないコマンドで読み込まれてはならない重いモジュール
+STARTUP_COMMANDS = ["show-config", "show-structure", "preview-conversations"]
+STARTUP_FORBIDDEN_MODULES = ["aiohttp", "multi_agent_system", "agent", "ollama_client", "rich.progress", "numpy"]
+
+def parse_importtime(stderr: str) -> Tuple[Dict[str, int], int]:
+    """python -X importtime の出力から（モジュール名 -> 累積import時間, 全体のimport時間）をマイクロ秒で取得
+
+    読み込みの深さは名前のインデントで表されるため、最上位（インデント1文字）の累積時間の合計を全体とする。
+    """
+    modules = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return modules, total
+
+def benchmark_startup(commands: List[str], repeat: int = 5) -> List[Dict[str, Any]]:
+    """CLIコマンドを別プロセスで起動し、起動時間（中央値）・import時間・重いモジュールの読み込み有無を計測"""
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    results = []
+    for command in commands:
+        wall_times = []
+        import_times = []
+        modules: Dict[str, int] = {}
+        for _ in range(repeat):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", main_path, command],
+                capture_output=True,
+                text=True
+            )
+            wall_times.append(time.perf_counter() - started)
+            if completed.returncode != 0:
+                raise Exception(f"{command} exited with {completed.returncode}: {completed.stderr[-500:]}")
+            modules, total = parse_importtime(completed.stderr)
+            import_times.append(total)
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:5]
+        results.append({
+            "command": command,
+            "wall_ms": round(statistics.median(wall_times) * 1000, 1),
+            "import_ms": round(statistics.median(import_times) / 1000, 1),
+            "modules": len(modules),
+            "forbidden_modules": [name for name in STARTUP_FORBIDDEN_MODULES if name in modules],
+            "slowest_imports": [{"module": name, "ms": round(us / 1000, 1)} for name, us in slowest]
+        })
+    return results
+
+def save_benchmark(summary: Dict[str, Any], filename: str):
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
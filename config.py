@@ -1,12 +1,72 @@
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 
+DEFAULT_TARGET_DESCRIPTION = "Stripe決済統合を持つeコマースサイト（JPY通貨、日本限定取引、レスポンシブUI対応）"
+
+# フェーズ（Worker評価・会話タイプ・BOSS評価）ごとの生成トークン数の上限（num_predict）
+DEFAULT_TOKEN_BUDGETS: Dict[str, int] = {
+    "worker_evaluation": 700,
+    "question": 200,
+    "answer": 350,
+    "collaboration": 350,
+    "dispute": 300,
+    "boss_evaluation": 1000
+}
+
 class OllamaConfig(BaseModel):
     base_url: str = "http://localhost:11434"
+    # 複数のOllamaサーバーに振り分ける場合に指定（空ならbase_urlのみ使用）
+    endpoints: List[str] = []
+    health_check_interval: int = 30  # 異常なエンドポイントを再確認する間隔（秒）
+    # リトライ（ジッター付き指数バックオフ）
+    max_retries: int = 2
+    retry_base_delay: float = 1.0
+    retry_max_delay: float = 10.0
+    # サーキットブレーカー: 連続失敗がこの回数に達したエンドポイントへの送信を一定時間止める
+    circuit_failure_threshold: int = 3
+    circuit_reset_timeout: float = 30.0
+    # ヘッジリクエスト: 応答がp95を超えたら同じリクエストを追加発行（非ストリーミング時のみ）
+    hedge_requests: bool = False
+    hedge_min_samples: int = 20  # p95を算出するのに必要な過去の応答数
     models: List[str] = ["gemma3:latest", "pakachan/elyza-llama3-8b:latest", "llama3.2:latest"]
-    timeout: int = 120  # タイムアウトを120秒に延長
+    timeout: int = 120  # 読み取りタイムアウト（生成待ち）を120秒に延長
+    connect_timeout: int = 10  # 接続確立のタイムアウト
     max_tokens: int = 1000  # 最大トークンを1000に削減
+    # フェーズごとの生成トークン数の上限と停止シーケンスを適用する（無効にすると生成はモデルが止まるまで続く）
+    enforce_token_budgets: bool = True
+    # HTTPコネクションプール設定
+    max_connections: int = 100
+    max_connections_per_host: int = 8
+    keepalive_timeout: int = 60  # アイドル接続を保持する秒数
+    dns_cache_ttl: int = 300
+    # 適応的同時実行制御（AIMD）: エンドポイントごとの同時実行数を、応答の遅延・モデルのロード・過負荷エラーから自動調整
+    adaptive_concurrency: bool = True
+    adaptive_initial_limit: int = 2
+    adaptive_min_limit: int = 1
+    adaptive_max_limit: int = 16
+    adaptive_latency_tolerance: float = 2.0  # 生成以外にかかった時間が基準値のこの倍数を超えたら上限を減らす
+    adaptive_backoff: float = 0.7  # 上限を減らすときに掛ける係数
+    adaptive_load_threshold: float = 1.0  # これ以上のload_duration（秒）はモデルのロードとみなして上限を減らす
+    # Worker間会話の同時実行数
+    max_concurrent_requests: int = 4
+    max_concurrent_per_model: int = 2
+    # 会話のディスパッチ方式: "interleaved"（列挙順）/ "model_affinity"（モデル単位でまとめて実行）
+    dispatch_mode: str = "interleaved"
+    keep_alive: str = "10m"  # リクエスト後にモデルをメモリに保持する時間
+    # 接続テストと並行して全エージェントのモデルを事前に読み込む（存在しないモデルがあれば評価前に中止）
+    preload_models: bool = True
+    preload_keep_alive: Optional[str] = None  # 事前読み込み時のkeep_alive（未指定ならkeep_alive）
+    seed: Optional[int] = None  # 指定すると生成を再現可能にする
+    # エージェントごとにシステムプロンプト＋対象情報を一度だけ評価し、返されたcontextを後続の呼び出しで再利用する
+    prefix_reuse: bool = True
+    # Worker・BOSSの評価をJSONスキーマで制約して出力させ、pydanticで検証する（失敗時はテキスト解析にフォールバック）
+    structured_output: bool = False
+    # レスポンスキャッシュ: "read-write" / "read-only" / "off"
+    cache_mode: str = "off"
+    cache_path: str = ".cache/ollama_responses.sqlite3"
+    cache_max_size_mb: float = 256
+    cache_max_age_days: float = 30
 
 class AgentConfig(BaseModel):
     name: str
@@ -14,18 +74,58 @@ class AgentConfig(BaseModel):
     model: str
     temperature: float = 0.7
     system_prompt: str
+    max_tokens: Optional[int] = None  # 全フェーズ共通の上限（未指定ならOllamaConfig.max_tokens）
+    token_budgets: Dict[str, int] = {}  # フェーズ別の上限（DEFAULT_TOKEN_BUDGETSより優先）
+    # プロンプト（システムプロンプトを含む）の推定トークン数の上限。BOSSはWorker結果を圧縮してこの範囲に収める
+    prompt_token_budget: Optional[int] = None
+    
+    def token_budget(self, phase: str, default_max_tokens: int) -> int:
+        """フェーズの生成トークン数の上限（エージェント個別の指定 > 既定のフェーズ別上限と全体の上限の小さい方）"""
+        if phase in self.token_budgets:
+            return self.token_budgets[phase]
+        max_tokens = self.max_tokens or default_max_tokens
+        budget = DEFAULT_TOKEN_BUDGETS.get(phase)
+        return min(budget, max_tokens) if budget else max_tokens
+
+class ConversationConfig(BaseModel):
+    # Worker間会話のトポロジー: "all-pairs" / "ring" / "star" / "random-k"
+    topology: str = "all-pairs"
+    types: List[str] = ["question", "answer", "collaboration", "dispute"]
+    hub: Optional[str] = None  # starの中心となるWorker名（未指定時は先頭のWorker）
+    neighbors: int = 2  # random-kで各Workerが話しかける相手の数
+    seed: Optional[int] = None  # random-kの相手選択の乱数シード
+    spill_messages: bool = False  # 会話本文をメモリではなくセグメントファイルに保持する
+    spill_dir: str = ".cache/conversations"
+
+class FindingIndexConfig(BaseModel):
+    # 過去のレポートの指摘（評価・推奨事項）の埋め込みインデックス
+    index_dir: str = ".cache/findings"
+    report_patterns: List[str] = ["boss_worker_report_*.json"]
+    # 埋め込み方式: "ollama"（/api/embeddings）/ "local"（文字n-gramの特徴ハッシュ。Ollama不要）
+    embedder: str = "ollama"
+    embedding_model: str = "nomic-embed-text"
+    local_dimensions: int = 512
+    # Worker評価のプロンプトに、同じWorkerの過去の類似した指摘を添える
+    enrich_prompts: bool = False
+    enrich_top_k: int = 3
+    enrich_min_score: float = 0.5
 
 class MultiAgentConfig(BaseModel):
     ollama: OllamaConfig
     agents: List[AgentConfig]
+    conversation: ConversationConfig = ConversationConfig()
+    findings: FindingIndexConfig = FindingIndexConfig()
     target_url: str = "https://ecommerce-with-stripe-six.vercel.app/"
     source_code_url: str = "https://github.com/kychan23/ecommerce-with-stripe"
+    journal_dir: str = "runs"  # 実行ジャーナル（再開用）の保存先
 
 # BOSSエージェント設定（改善版）
 BOSS_CONFIG = AgentConfig(
     name="BOSS_Agent",
     role="プロジェクト統括・品質保証マネージャー",
     model="pakachan/elyza-llama3-8b:latest",
+    # コンテキスト長4096から生成の上限（boss_evaluation）を差し引いた程度
+    prompt_token_budget=3000,
     system_prompt="""あなたはプロジェクト全体を統括するBOSSエージェントです。
 各Workerエージェントの評価結果を統合し、プロジェクトの品質保証とリリース判定を行います。
 
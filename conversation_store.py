@@ -0,0 +1,106 @@
+import os
+import sys
+import tempfile
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from agent import WorkerConversation
+
+class ConversationRecord:
+    """会話1件分のレコード（エージェント名・会話タイプはintern済み、本文はメモリ上またはセグメントファイル上）"""
+    __slots__ = ("from_agent", "to_agent", "conversation_type", "timestamp", "error", "message", "offset", "length")
+    
+    def __init__(self, conversation: WorkerConversation):
+        self.from_agent = sys.intern(conversation.from_agent)
+        self.to_agent = sys.intern(conversation.to_agent)
+        self.conversation_type = sys.intern(conversation.conversation_type)
+        self.timestamp = conversation.timestamp
+        self.error = conversation.error
+        self.message: Optional[str] = conversation.message
+        self.offset = -1  # セグメントファイル上の位置（メモリ上に本文がある場合は-1）
+        self.length = 0
+
+class ConversationStore:
+    """1回の評価分のWorker間会話の共有ストア
+    
+    会話はスロット付きのレコードとして1か所にだけ保持する。レポートに全件を出力するため件数では削除せず、
+    評価ごとに新しいストアを使う（評価をまたいで溜まらない）。spill_dirを指定すると本文をセグメントファイルへ
+    退避し、メモリ上にはメタデータだけを残す。
+    """
+    
+    def __init__(self, spill_dir: Optional[str] = None):
+        self._records: List[ConversationRecord] = []
+        self._segment = None
+        self._segment_size = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._segment = tempfile.TemporaryFile(dir=spill_dir, prefix="conversations_", suffix=".seg")
+    
+    def append(self, conversation: WorkerConversation) -> int:
+        """会話を追加してレコード番号を返す"""
+        record = ConversationRecord(conversation)
+        if self._segment is not None:
+            data = record.message.encode("utf-8")
+            self._segment.seek(self._segment_size)
+            self._segment.write(data)
+            record.offset, record.length = self._segment_size, len(data)
+            record.message = None
+            self._segment_size += len(data)
+        
+        self._records.append(record)
+        return len(self._records) - 1
+    
+    def extend(self, conversations: Iterable[WorkerConversation]):
+        for conversation in conversations:
+            self.append(conversation)
+    
+    def reorder(self, record_ids: List[int]):
+        """指定したレコードを指定順で末尾に並べ直す（完了順に追加した会話を列挙順に戻す）"""
+        selected = set(record_ids)
+        self._records = (
+            [record for i, record in enumerate(self._records) if i not in selected]
+            + [self._records[i] for i in record_ids]
+        )
+    
+    def _message(self, record: ConversationRecord) -> str:
+        if record.message is not None:
+            return record.message
+        self._segment.seek(record.offset)
+        return self._segment.read(record.length).decode("utf-8")
+    
+    def _materialize(self, record: ConversationRecord) -> WorkerConversation:
+        return WorkerConversation(
+            from_agent=record.from_agent,
+            to_agent=record.to_agent,
+            message=self._message(record),
+            timestamp=record.timestamp,
+            conversation_type=record.conversation_type,
+            error=record.error
+        )
+    
+    def __getitem__(self, index: int) -> WorkerConversation:
+        return self._materialize(self._records[index])
+    
+    def __iter__(self) -> Iterator[WorkerConversation]:
+        for record in self._records:
+            yield self._materialize(record)
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    def memory_usage(self) -> Dict[str, Any]:
+        """ストアが保持しているメモリ量の概算（バイト）"""
+        record_bytes = sys.getsizeof(self._records) + sum(sys.getsizeof(record) for record in self._records)
+        message_bytes = sum(sys.getsizeof(record.message) for record in self._records if record.message is not None)
+        return {
+            "conversations": len(self._records),
+            "record_bytes": record_bytes,
+            "message_bytes": message_bytes,
+            "spilled_bytes": self._segment_size,
+            "total_bytes": record_bytes + message_bytes
+        }
+    
+    def close(self):
+        """セグメントファイルを削除"""
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
@@ -0,0 +1,284 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Any, List, Optional, Set
+
+import aiohttp
+
+from ollama_errors import OllamaModelNotFoundError, status_error
+
+class CircuitOpenError(Exception):
+    """全エンドポイントのサーキットブレーカーが開いている"""
+
+def normalize_model_name(name: str) -> str:
+    """タグ省略時は:latestとして扱う"""
+    return name if ":" in name else f"{name}:latest"
+
+class AIMDLimiter:
+    """同時実行数の上限を加算的に増やし、乗算的に減らす（AIMD）リミッター
+    
+    応答時間のうちサーバー側の処理（ロード・プロンプト評価・生成）以外の時間をキュー待ちの遅延とみなし、
+    これが基準値のtolerance倍を超えた場合、モデルのロードを検知した場合、過負荷エラーの場合に上限をbackoff倍する。
+    それ以外の完了ごとに上限を1/上限ずつ増やす（上限いっぱいまで使われているときのみ）。
+    最初に減らすまではスロースタートとして完了ごとに1ずつ増やす。
+    """
+    
+    def __init__(
+        self,
+        initial_limit: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        tolerance: float = 2.0,
+        backoff: float = 0.7,
+        load_threshold: float = 1.0,
+        baseline_window: int = 100,
+        history_size: int = 1000
+    ):
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.load_threshold = load_threshold
+        self.in_flight = 0
+        # キュー待ちの遅延の基準値（直近baseline_window件の最小値、秒）
+        self._recent_overheads: Deque[float] = deque(maxlen=baseline_window)
+        self.decreases = 0
+        self.slow_start = True
+        self.min_seen = self.max_seen = int(self.limit)
+        self._created = time.perf_counter()
+        self._last_decrease = float("-inf")
+        self._waiters: Deque[asyncio.Future] = deque()
+        # (経過秒, 上限, 理由) の推移
+        self.history: Deque[tuple] = deque([(0.0, int(self.limit), "initial")], maxlen=history_size)
+    
+    @property
+    def baseline(self) -> Optional[float]:
+        return min(self._recent_overheads) if self._recent_overheads else None
+    
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+    
+    async def acquire(self) -> float:
+        """枠が空くまで待機して確保し、確保した時刻（perf_counter）を返す"""
+        while self.in_flight >= self.current_limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # 起こされた直後に取り消された場合は次の待機者に枠を譲る
+                    self._wake()
+                raise
+        self.in_flight += 1
+        return time.perf_counter()
+    
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+    
+    def _wake(self):
+        """空いている枠の数だけ待機者を起こす"""
+        free = self.current_limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+    
+    def _set_limit(self, limit: float, reason: str):
+        previous = self.current_limit
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+        if self.current_limit != previous or reason != "increase":
+            self.history.append((round(time.perf_counter() - self._created, 3), self.current_limit, reason))
+        self.min_seen = min(self.min_seen, self.current_limit)
+        self.max_seen = max(self.max_seen, self.current_limit)
+        self._wake()
+    
+    def _decrease(self, started: float, reason: str):
+        # 同じ混雑で同時に完了したリクエストごとに何度も減らさないよう、直前の減少より前に始まったものは無視する
+        if started <= self._last_decrease:
+            return
+        self._last_decrease = time.perf_counter()
+        self.decreases += 1
+        self.slow_start = False
+        self._set_limit(self.limit * self.backoff, reason)
+    
+    def record_success(self, started: float, overhead: float, load_seconds: float = 0.0):
+        """完了したリクエスト（枠を解放する前に呼ぶ）のキュー待ちの遅延とモデルのロード時間（秒）から上限を調整"""
+        if load_seconds >= self.load_threshold:
+            self._decrease(started, "model_load")
+            return
+        baseline = self.baseline
+        self._recent_overheads.append(overhead)
+        if baseline is not None and overhead > baseline * self.tolerance + 0.05:
+            self._decrease(started, "latency")
+            return
+        if self.in_flight >= self.current_limit:
+            self._set_limit(self.limit + (1 if self.slow_start else 1 / self.limit), "increase")
+    
+    def record_overload(self, started: float, reason: str = "overload"):
+        """タイムアウト・5xx・429など過負荷を示すエラー"""
+        self._decrease(started, reason)
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "limit": self.current_limit,
+            "min_limit_seen": self.min_seen,
+            "max_limit_seen": self.max_seen,
+            "decreases": self.decreases,
+            "baseline_overhead_seconds": round(self.baseline, 4) if self.baseline is not None else None,
+            "history": [{"seconds": t, "limit": limit, "reason": reason} for t, limit, reason in self.history]
+        }
+
+@dataclass
+class Endpoint:
+    url: str
+    models: Optional[Set[str]] = None  # /api/tagsで確認済みのモデル（未確認ならNone）
+    model_details: List[Dict[str, Any]] = field(default_factory=list)
+    healthy: bool = True
+    outstanding: int = 0  # 処理中のリクエスト数
+    total_requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    circuit_opened_at: Optional[float] = None  # サーキットが開いた時刻（閉じていればNone）
+    probing: bool = False  # half-openの試行リクエストを送信中
+    last_checked: float = 0.0
+    last_error: Optional[str] = None
+    limiter: Optional[AIMDLimiter] = None  # 適応的同時実行制御（無効ならNone）
+    
+    def has_model(self, model: str) -> bool:
+        return self.models is None or normalize_model_name(model) in self.models
+    
+    def circuit_allows(self, reset_timeout: float) -> bool:
+        """サーキットが閉じているか、リセット時間経過後の試行（half-open、同時に1件のみ）なら許可"""
+        if self.circuit_opened_at is None:
+            return True
+        return not self.probing and time.monotonic() - self.circuit_opened_at >= reset_timeout
+
+class EndpointPool:
+    """複数のOllamaエンドポイントを管理し、処理中リクエストが最も少ないノードへ振り分ける"""
+    
+    def __init__(
+        self,
+        urls: List[str],
+        health_check_interval: float = 30.0,
+        circuit_failure_threshold: int = 3,
+        circuit_reset_timeout: float = 30.0
+    ):
+        if not urls:
+            raise ValueError("At least one Ollama endpoint is required")
+        self.endpoints = [Endpoint(url=url.rstrip("/")) for url in urls]
+        self.health_check_interval = health_check_interval
+        self.circuit_failure_threshold = circuit_failure_threshold
+        self.circuit_reset_timeout = circuit_reset_timeout
+    
+    async def _probe(self, session: aiohttp.ClientSession, endpoint: Endpoint):
+        """/api/tagsで死活確認と利用可能モデルの取得を行う"""
+        endpoint.last_checked = time.monotonic()
+        try:
+            async with session.get(f"{endpoint.url}/api/tags") as response:
+                if response.status != 200:
+                    raise status_error(response.status, await response.text(), "Failed to get models")
+                data = await response.json()
+            endpoint.model_details = data.get("models", [])
+            endpoint.models = {normalize_model_name(m["name"]) for m in endpoint.model_details}
+            endpoint.healthy = True
+            endpoint.last_error = None
+        except Exception as e:
+            endpoint.healthy = False
+            endpoint.last_error = str(e)
+    
+    async def refresh(self, session: aiohttp.ClientSession):
+        """全エンドポイントを並行してヘルスチェック"""
+        await asyncio.gather(*(self._probe(session, endpoint) for endpoint in self.endpoints))
+    
+    async def recheck_unhealthy(self, session: aiohttp.ClientSession):
+        """前回の確認から一定時間経過した異常エンドポイントを再確認"""
+        now = time.monotonic()
+        stale = [
+            endpoint for endpoint in self.endpoints
+            if not endpoint.healthy and now - endpoint.last_checked >= self.health_check_interval
+        ]
+        if stale:
+            await asyncio.gather(*(self._probe(session, endpoint) for endpoint in stale))
+    
+    def select(self, model: str) -> Endpoint:
+        """モデルを持つ正常なエンドポイントのうち、処理中リクエストが最少のものを選択"""
+        serving = [e for e in self.endpoints if e.has_model(model)]
+        if not serving:
+            raise OllamaModelNotFoundError(f"No Ollama endpoint serves model '{model}'")
+        
+        allowed = [e for e in serving if e.circuit_allows(self.circuit_reset_timeout)]
+        if not allowed:
+            raise CircuitOpenError(f"Circuit open for all endpoints serving model '{model}'")
+        
+        # 全滅時はヘルスチェック異常のノードも候補に戻す（単一エンドポイント構成で一時的な障害に巻き込まれないように）
+        candidates = [e for e in allowed if e.healthy] or allowed
+        return min(candidates, key=lambda e: (e.outstanding, e.total_requests))
+    
+    def checkout(self, model: str) -> Endpoint:
+        """エンドポイントを選択し、release()まで処理中として数える（サーキットが開いていればhalf-openの試行とする）"""
+        endpoint = self.select(model)
+        if endpoint.circuit_opened_at is not None:
+            endpoint.probing = True
+        return self.claim(endpoint)
+    
+    def claim(self, endpoint: Endpoint) -> Endpoint:
+        """指定したエンドポイントをrelease()まで処理中として数える（全エンドポイントへのモデル読み込みなど）"""
+        endpoint.outstanding += 1
+        endpoint.total_requests += 1
+        return endpoint
+    
+    def release(self, endpoint: Endpoint):
+        # 試行の結果はmark_success / mark_failureで反映済み（キャンセル・4xxでも次の試行を妨げない）
+        endpoint.outstanding -= 1
+        endpoint.probing = False
+    
+    def mark_success(self, endpoint: Endpoint):
+        """成功したらサーキットを閉じる"""
+        endpoint.consecutive_failures = 0
+        endpoint.circuit_opened_at = None
+        endpoint.healthy = True
+    
+    def mark_failure(self, endpoint: Endpoint, error: Exception):
+        """障害を記録し、連続失敗が閾値に達したらサーキットを開く（half-open中の失敗は開き直す）"""
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        endpoint.last_error = str(error)
+        if endpoint.consecutive_failures >= self.circuit_failure_threshold:
+            endpoint.circuit_opened_at = time.monotonic()
+            endpoint.healthy = False
+            endpoint.last_checked = time.monotonic()
+    
+    def endpoints_with_model(self, model: str) -> List[Endpoint]:
+        return [e for e in self.endpoints if e.healthy and e.has_model(model)]
+    
+    def available_models(self) -> List[Dict[str, Any]]:
+        """全エンドポイントのモデル一覧（重複除去）"""
+        seen = {}
+        for endpoint in self.endpoints:
+            for model in endpoint.model_details:
+                seen.setdefault(model["name"], model)
+        return list(seen.values())
+    
+    def summary(self) -> List[Dict[str, Any]]:
+        """エンドポイントごとの状態と振り分け実績"""
+        return [
+            {
+                "url": endpoint.url,
+                "healthy": endpoint.healthy,
+                "models": sorted(endpoint.models) if endpoint.models is not None else None,
+                "total_requests": endpoint.total_requests,
+                "failures": endpoint.failures,
+                "circuit_open": endpoint.circuit_opened_at is not None,
+                "last_error": endpoint.last_error,
+                "concurrency": endpoint.limiter.summary() if endpoint.limiter else None
+            }
+            for endpoint in self.endpoints
+        ]
@@ -0,0 +1,304 @@
+import hashlib
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from recommendation_clusters import normalize_text, shingle_hashes
+
+if TYPE_CHECKING:
+    from config import FindingIndexConfig
+    from ollama_client import OllamaClient
+
+VECTORS_FILE = "vectors.f32"
+RECORDS_FILE = "findings.jsonl"
+AGENTS_FILE = "agents.i32"
+META_FILE = "index.json"
+# 一度に埋め込みを計算する指摘の数
+EMBED_BATCH = 256
+# プロンプトに添える指摘1件あたりの最大文字数
+PROMPT_FINDING_CHARS = 200
+
+def extract_findings(report: Dict[str, Any], source: str) -> List[Dict[str, Any]]:
+    """統合レポートのWorker結果から、評価文と推奨事項を1件ずつの指摘として取り出す（形式の異なるレポートは空）"""
+    findings = []
+    for worker in report.get("worker_results") or []:
+        common = {
+            "report": source,
+            "timestamp": report.get("timestamp"),
+            "agent": worker.get("name"),
+            "role": worker.get("role"),
+            "risk_level": worker.get("risk_level"),
+            "priority": worker.get("priority")
+        }
+        evaluation = (worker.get("evaluation") or "").strip()
+        if evaluation:
+            findings.append({**common, "kind": "evaluation", "text": evaluation})
+        for recommendation in worker.get("recommendations") or []:
+            if recommendation.strip():
+                findings.append({**common, "kind": "recommendation", "text": recommendation.strip()})
+    return findings
+
+def compact_finding(text: str, limit: int = PROMPT_FINDING_CHARS) -> str:
+    """改行・連続する空白を1つにまとめ、limit文字を超える部分を省略（プロンプトに添える用）"""
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """行ごとにL2正規化（内積をコサイン類似度として扱う。ゼロベクトルはそのまま）"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+def hashed_features(texts: Sequence[str], dim: int = 512, ngram: int = 2) -> np.ndarray:
+    """正規化したテキストの文字n-gramを符号付きの特徴ハッシュでdim次元に集計し、L2正規化したベクトル"""
+    if not texts:
+        return np.zeros((0, dim), dtype=np.float32)
+    hashes, offsets = shingle_hashes([normalize_text(text) for text in texts], ngram)
+    owners = np.repeat(np.arange(len(texts)), np.diff(np.append(offsets, len(hashes))))
+    buckets = (hashes % np.uint64(dim)).astype(np.int64)
+    # 最上位ビットで符号を決め、衝突したn-gramが打ち消し合うようにする
+    signs = ((hashes >> np.uint64(63)).astype(np.float64) * 2 - 1)
+    counts = np.bincount(owners * dim + buckets, weights=signs, minlength=len(texts) * dim)
+    return _normalize_rows(counts.reshape(len(texts), dim)).astype(np.float32)
+
+class LocalEmbedder:
+    """Ollamaを使わない埋め込みの代替（文字n-gramの特徴ハッシュ。表記の近さだけを捉える）"""
+    name = "local"
+    
+    def __init__(self, dim: int = 512):
+        self.model = f"hashing-{dim}"
+        self.dim = dim
+    
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return hashed_features(texts, self.dim)
+
+class OllamaEmbedder:
+    """Ollamaの/api/embeddingsで埋め込みを計算（次元は最初の応答から決まる）"""
+    name = "ollama"
+    
+    def __init__(self, client: "OllamaClient", model: str):
+        self.client = client
+        self.model = model
+        self.dim: Optional[int] = None
+    
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        vectors = np.asarray(await self.client.embed(self.model, list(texts)), dtype=np.float32)
+        self.dim = vectors.shape[1]
+        return _normalize_rows(vectors).astype(np.float32)
+
+def make_embedder(findings_config: "FindingIndexConfig", client: Optional["OllamaClient"] = None):
+    """設定に応じた埋め込み方式（"ollama" / "local"）"""
+    if findings_config.embedder == "local":
+        return LocalEmbedder(findings_config.local_dimensions)
+    if findings_config.embedder == "ollama":
+        if client is None:
+            raise Exception("embedder=ollama にはOllamaクライアントが必要です")
+        return OllamaEmbedder(client, findings_config.embedding_model)
+    raise Exception(f"Unknown embedder '{findings_config.embedder}' (ollama / local)")
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _empty_meta() -> Dict[str, Any]:
+    return {"embedder": None, "model": None, "dim": None, "count": 0, "records_bytes": 0, "agents": [], "reports": {}}
+
+class FindingIndex:
+    """過去の指摘の埋め込みインデックス
+    
+    埋め込みはfloat32の行列としてvectors.f32に追記し、検索時はnp.memmapで読み込む。
+    行番号と指摘（レポート・Worker・リスクレベル・本文）の対応はfindings.jsonlに1行ずつ記録し、
+    Workerで絞り込むための行ごとのWorker番号をagents.i32に記録する（JSONは検索結果の行だけ読み込む）。
+    件数・埋め込み方式・索引済みレポートのハッシュはindex.jsonに置き換えで書き込む。
+    index.jsonの件数より後ろのデータ（追記中に中断した分）は読み込まず、次の追記で切り詰める。
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta: Dict[str, Any] = _empty_meta()
+        path = os.path.join(directory, META_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.meta.update(json.load(f))
+        self._vectors: Optional[np.ndarray] = None
+        self._lines: Optional[List[bytes]] = None
+        self._agents: Optional[np.ndarray] = None
+    
+    @property
+    def count(self) -> int:
+        return self.meta["count"]
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+    
+    def check_embedder(self, embedder):
+        """既存のインデックスと埋め込み方式・モデルが異なる場合はエラー（ベクトルを比較できないため）"""
+        if self.meta["embedder"] is None:
+            return
+        if (self.meta["embedder"], self.meta["model"]) != (embedder.name, embedder.model):
+            raise Exception(
+                f"インデックスの埋め込み方式（{self.meta['embedder']}: {self.meta['model']}）と"
+                f"指定された方式（{embedder.name}: {embedder.model}）が異なります。--rebuild で作り直してください"
+            )
+    
+    def reset(self):
+        """インデックスのファイルを削除して空にする（埋め込み方式を変えて作り直す場合）"""
+        for name in (META_FILE, VECTORS_FILE, RECORDS_FILE, AGENTS_FILE):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+        self.meta = _empty_meta()
+        self._vectors = self._lines = self._agents = None
+    
+    def is_indexed(self, digest: str) -> bool:
+        return digest in self.meta["reports"]
+    
+    def append(self, vectors: np.ndarray, records: List[Dict[str, Any]], digest: str, source: str, embedder):
+        """1レポート分の指摘を追記し、メタデータを更新"""
+        if len(vectors) != len(records):
+            raise Exception(f"埋め込みの数（{len(vectors)}）と指摘の数（{len(records)}）が一致しません")
+        if len(records) and self.meta["dim"] not in (None, vectors.shape[1]):
+            raise Exception(f"埋め込みの次元（{vectors.shape[1]}）がインデックス（{self.meta['dim']}）と異なります")
+        os.makedirs(self.directory, exist_ok=True)
+        
+        vector_bytes = self.count * (self.meta["dim"] or 0) * 4
+        with open(self._path(VECTORS_FILE), "ab") as f:
+            f.truncate(vector_bytes)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        with open(self._path(RECORDS_FILE), "ab") as f:
+            f.truncate(self.meta["records_bytes"])
+            f.write(data)
+        agent_names = list(self.meta["agents"])
+        positions = {name: i for i, name in enumerate(agent_names)}
+        agent_ids = []
+        for record in records:
+            name = record.get("agent") or ""
+            if name not in positions:
+                positions[name] = len(agent_names)
+                agent_names.append(name)
+            agent_ids.append(positions[name])
+        with open(self._path(AGENTS_FILE), "ab") as f:
+            f.truncate(self.count * 4)
+            f.write(np.asarray(agent_ids, dtype=np.int32).tobytes())
+        
+        meta = dict(self.meta)
+        meta["agents"] = agent_names
+        meta["reports"] = {**self.meta["reports"], digest: {"path": source, "findings": len(records)}}
+        meta["embedder"], meta["model"] = embedder.name, embedder.model
+        if len(records):
+            meta["dim"] = int(vectors.shape[1])
+        meta["count"] = self.count + len(records)
+        meta["records_bytes"] = self.meta["records_bytes"] + len(data)
+        temp_path = self._path(META_FILE + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self._path(META_FILE))
+        self.meta = meta
+        self._vectors = self._lines = self._agents = None
+    
+    def vectors(self) -> np.ndarray:
+        """埋め込み行列（count × dim）をメモリマップで読み込む"""
+        if self._vectors is None:
+            if self.count == 0:
+                self._vectors = np.zeros((0, self.meta["dim"] or 0), dtype=np.float32)
+            else:
+                self._vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.float32, mode="r", shape=(self.count, self.meta["dim"]))
+        return self._vectors
+    
+    def record(self, row: int) -> Dict[str, Any]:
+        """行番号の指摘（findings.jsonlはindex.jsonの件数分だけ読み、JSONは参照した行だけ解析する）"""
+        if self._lines is None:
+            with open(self._path(RECORDS_FILE), "rb") as f:
+                self._lines = f.read(self.meta["records_bytes"]).splitlines()
+        return json.loads(self._lines[row])
+    
+    def agent_ids(self) -> np.ndarray:
+        """行ごとのWorker番号（meta["agents"]の添字）"""
+        if self._agents is None:
+            self._agents = np.memmap(self._path(AGENTS_FILE), dtype=np.int32, mode="r", shape=(self.count,))
+        return self._agents
+    
+    def search(
+        self,
+        queries: np.ndarray,
+        top_k: int = 5,
+        agents: Optional[Sequence[Optional[str]]] = None,
+        min_score: float = -1.0
+    ) -> List[List[Dict[str, Any]]]:
+        """クエリ（L2正規化済み）ごとにコサイン類似度の高い指摘top_k件（agentsを指定するとクエリごとにそのWorkerの指摘のみ）"""
+        if self.count == 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        scores = np.asarray(queries, dtype=np.float32) @ self.vectors().T
+        if agents is not None:
+            names = self.meta["agents"]
+            for row, agent in enumerate(agents):
+                if agent is not None:
+                    # 未知のWorkerは該当なし（-1はどの行とも一致しない）
+                    scores[row, self.agent_ids() != (names.index(agent) if agent in names else -1)] = -np.inf
+        
+        k = min(top_k, self.count)
+        # 上位k件をargpartitionで選んでから並べ替える（全件のソートを避ける）
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates], kind="stable")]
+            results.append([
+                {"score": round(float(scores[row, i]), 4), **self.record(i)}
+                for i in ordered.tolist()
+                if scores[row, i] >= min_score
+            ])
+        return results
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "embedder": self.meta["embedder"],
+            "model": self.meta["model"],
+            "dim": self.meta["dim"],
+            "findings": self.count,
+            "reports": len(self.meta["reports"])
+        }
+
+async def index_reports(index: FindingIndex, embedder, paths: Iterable[str]) -> Dict[str, Any]:
+    """レポートの指摘を埋め込んでインデックスに追記（索引済みのレポートは内容のハッシュで判定してスキップ）"""
+    index.check_embedder(embedder)
+    stats = {"indexed_reports": 0, "skipped_reports": 0, "unsupported_reports": 0, "findings": 0}
+    for path in paths:
+        digest = file_digest(path)
+        if index.is_indexed(digest):
+            stats["skipped_reports"] += 1
+            continue
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+        findings = extract_findings(report, os.path.basename(path))
+        if not findings:
+            # Worker結果を含まない形式のレポートも記録し、次回以降は読み込まない
+            index.append(np.zeros((0, index.meta["dim"] or 0), dtype=np.float32), [], digest, path, embedder)
+            stats["unsupported_reports"] += 1
+            continue
+        
+        batches = [
+            await embedder.embed([finding["text"] for finding in findings[start:start + EMBED_BATCH]])
+            for start in range(0, len(findings), EMBED_BATCH)
+        ]
+        index.append(np.concatenate(batches), findings, digest, path, embedder)
+        stats["indexed_reports"] += 1
+        stats["findings"] += len(findings)
+    return stats
+
+async def search_findings(
+    index: FindingIndex,
+    embedder,
+    queries: Sequence[str],
+    top_k: int = 5,
+    agents: Optional[Sequence[Optional[str]]] = None,
+    min_score: float = -1.0
+) -> List[List[Dict[str, Any]]]:
+    """テキストのクエリで類似した過去の指摘を検索"""
+    index.check_embedder(embedder)
+    if index.count == 0:
+        return [[] for _ in queries]
+    return index.search(await embedder.embed(queries), top_k, agents, min_score)
@@ -4,18 +4,46 @@ BOSS-Workerマルチエージェントシステム メイン実行ファイル
 Ollamaモデルを使用してeコマースアプリケーションの多角的評価を実行
 """
 
-import asyncio
+import json
 import typer
+from datetime import datetime
+from typing import List
 from rich.console import Console
 from rich.panel import Panel
-from rich.prompt import Confirm
 
-from multi_agent_system import MultiAgentSystem
-from config import config, BOSS_CONFIG, WORKER_CONFIGS
+from topology import TOPOLOGIES, parse_conversation_types
+
+# 評価を行うコマンドだけが必要とするモジュール（aiohttp・pydantic・エージェント等）は各コマンド内でimportし、
+# show-config / show-structure / preview-conversations やシェル補完の起動を軽く保つ
 
 console = Console()
 app = typer.Typer()
 
+def _parse_conversation_options(topology: str, conversation_types: str):
+    """--topology / --conversation-types を検証（未指定ならNone）"""
+    if topology is not None and topology not in TOPOLOGIES:
+        raise typer.BadParameter(f"--topology は {' / '.join(TOPOLOGIES)} のいずれかを指定してください")
+    if conversation_types is None:
+        return None
+    try:
+        return parse_conversation_types(conversation_types)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+async def _check_connection(system):
+    """接続テストとモデルの事前読み込みを行い、失敗した場合は終了コード1で終わる"""
+    from ollama_client import OllamaModelNotFoundError
+    
+    console.print("\n[bold]🔍 Ollamaサーバー接続テスト中...[/bold]")
+    try:
+        connected = await system.test_connection()
+    except OllamaModelNotFoundError as e:
+        console.print(f"[red]❌ エージェントが使用するモデルが見つかりません: {e}[/red]")
+        raise typer.Exit(1)
+    if not connected:
+        console.print("[red]❌ Ollamaサーバーに接続できません。サーバーが起動しているか確認してください。[/red]")
+        raise typer.Exit(1)
+
 @app.command()
 def run(
     url: str = typer.Option(
@@ -45,9 +73,78 @@ def run(
         True,
         "--conversations/--no-conversations",
         help="Worker間の会話をリアルタイムで表示するかどうか"
+    ),
+    stream: bool = typer.Option(
+        True,
+        "--stream/--no-stream",
+        help="生成中のトークンを逐次表示するかどうか"
+    ),
+    dispatch: str = typer.Option(
+        None,
+        "--dispatch",
+        help="会話のディスパッチ方式（interleaved / model_affinity、未指定時はconfig.pyの設定）"
+    ),
+    cache: str = typer.Option(
+        None,
+        "--cache",
+        help="レスポンスキャッシュ（read-write / read-only / off、未指定時はconfig.pyの設定）"
+    ),
+    topology: str = typer.Option(
+        None,
+        "--topology",
+        help="Worker間会話のトポロジー（all-pairs / ring / star / random-k、未指定時はconfig.pyの設定）"
+    ),
+    conversation_types: str = typer.Option(
+        None,
+        "--conversation-types",
+        help="実行する会話タイプ（question,answer,collaboration,disputeからカンマ区切りで指定）"
+    ),
+    structured: bool = typer.Option(
+        None,
+        "--structured/--no-structured",
+        help="評価をJSONスキーマで制約して出力させるかどうか（未指定時はconfig.pyの設定）"
+    ),
+    past_findings: bool = typer.Option(
+        None,
+        "--past-findings/--no-past-findings",
+        help="過去のレポートの類似した指摘をWorker評価のプロンプトに添えるかどうか（index-findingsで作成したインデックスを使用）"
+    ),
+    resume: str = typer.Option(
+        None,
+        "--resume",
+        help="中断した実行のrun-idを指定して、完了済みの評価・会話をスキップして再開"
+    ),
+    metrics_out: str = typer.Option(
+        None,
+        "--metrics-out",
+        help="呼び出しごとの推論メトリクスをPrometheusテキスト形式で保存するファイル"
+    ),
+    report_format: str = typer.Option(
+        "json",
+        "--report-format",
+        help="レポート形式（json: 終了時に一括保存 / jsonl: 結果が届くたびに1行ずつ追記）"
     )
 ):
     """BOSS-Workerマルチエージェントシステムを実行してeコマースアプリケーションを評価"""
+    import asyncio
+    from rich.prompt import Confirm
+    from multi_agent_system import MultiAgentSystem
+    from run_journal import RunJournal
+    from config import config, BOSS_CONFIG, WORKER_CONFIGS, DEFAULT_TARGET_DESCRIPTION
+    from response_cache import CACHE_MODES
+    from report_stream import REPORT_FORMATS, ReportStreamWriter
+    
+    if cache is not None and cache not in CACHE_MODES:
+        raise typer.BadParameter(f"--cache は {' / '.join(CACHE_MODES)} のいずれかを指定してください")
+    types = _parse_conversation_options(topology, conversation_types)
+    if report_format not in REPORT_FORMATS:
+        raise typer.BadParameter(f"--report-format は {' / '.join(REPORT_FORMATS)} のいずれかを指定してください")
+    
+    try:
+        journal = RunJournal.load(config.journal_dir, resume) if resume else RunJournal.create(config.journal_dir)
+    except ValueError as e:
+        console.print(f"[red]❌ {e}[/red]")
+        raise typer.Exit(1)
     
     console.print(Panel.fit(
         "[bold blue]BOSS-Workerマルチエージェント評価システム[/bold blue]\n"
@@ -59,100 +156,637 @@ def run(
     target_info = {
         "url": url,
         "source_code": source_code,
-        "description": "Stripe決済統合を持つeコマースサイト（JPY通貨、日本限定取引、レスポンシブUI対応）"
+        "description": DEFAULT_TARGET_DESCRIPTION
     }
+    # 再開時は中断した実行と同じ対象を評価
+    if journal.target_info() is not None:
+        target_info = journal.target_info()
     
     async def main():
         # システム初期化
-        system = MultiAgentSystem()
+        async with MultiAgentSystem(
+            stream=stream,
+            dispatch_mode=dispatch,
+            cache_mode=cache,
+            journal=journal,
+            topology=topology,
+            conversation_types=types,
+            structured_output=structured,
+            past_findings=past_findings
+        ) as system:
         
-        # 接続テスト
-        console.print("\n[bold]🔍 Ollamaサーバー接続テスト中...[/bold]")
-        if not await system.test_connection():
-            console.print("[red]❌ Ollamaサーバーに接続できません。サーバーが起動しているか確認してください。[/red]")
-            return
+            # 接続テスト
+            await _check_connection(system)
         
-        # 設定確認
-        console.print(f"\n[bold]📋 評価設定[/bold]")
-        console.print(f"対象URL: {target_info['url']}")
-        console.print(f"ソースコード: {target_info['source_code']}")
-        console.print(f"BOSS: {BOSS_CONFIG.name} ({BOSS_CONFIG.model})")
-        console.print(f"Worker: {len(WORKER_CONFIGS)}名")
-        for worker in WORKER_CONFIGS:
-            console.print(f"  • {worker.name} ({worker.model})")
-        console.print(f"会話表示: {'有効' if show_conversations else '無効'}")
+            # 設定確認
+            console.print(f"\n[bold]📋 評価設定[/bold]")
+            console.print(f"対象URL: {target_info['url']}")
+            console.print(f"ソースコード: {target_info['source_code']}")
+            console.print(f"BOSS: {BOSS_CONFIG.name} ({BOSS_CONFIG.model})")
+            console.print(f"Worker: {len(WORKER_CONFIGS)}名")
+            for worker in WORKER_CONFIGS:
+                console.print(f"  • {worker.name} ({worker.model})")
+            console.print(f"会話表示: {'有効' if show_conversations else '無効'}")
+            console.print(f"ストリーミング表示: {'有効' if stream else '無効'}")
+            console.print(f"会話ディスパッチ: {system.dispatch_mode}")
+            console.print(
+                f"会話トポロジー: {system.conversation_config.topology} "
+                f"({', '.join(system.conversation_config.types)})"
+            )
+            console.print(f"レスポンスキャッシュ: {system.ollama_client.config.cache_mode}")
+            console.print(f"構造化出力: {'有効' if system.ollama_client.config.structured_output else '無効'}")
+            console.print(f"過去の指摘の参照: {'有効' if system.findings_config.enrich_prompts else '無効'}")
+            console.print(f"run-id: {journal.run_id}{' (再開)' if resume else ''}")
         
-        if not Confirm.ask("評価を開始しますか？"):
-            console.print("[yellow]評価をキャンセルしました[/yellow]")
-            return
+            if not Confirm.ask("評価を開始しますか？"):
+                console.print("[yellow]評価をキャンセルしました[/yellow]")
+                return
         
-        # 評価実行
-        console.print("\n[bold]🚀 BOSS-Worker評価開始[/bold]")
-        boss_result = await system.run_evaluation(target_info)
+            # JSONL形式では評価結果が届くたびにレポートへ追記する
+            if save_report and report_format == "jsonl":
+                system.report_stream = ReportStreamWriter(
+                    output_file or f"boss_worker_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+                )
         
-        if not boss_result:
-            console.print("[red]❌ 評価結果がありません[/red]")
-            return
+            # 評価実行
+            console.print("\n[bold]🚀 BOSS-Worker評価開始[/bold]")
+            try:
+                boss_result = await system.run_evaluation(target_info)
+            finally:
+                if system.report_stream is not None:
+                    system.report_stream.close()
         
-        # 結果表示
-        console.print("\n[bold]📊 評価結果[/bold]")
-        system.display_results()
+            if not boss_result:
+                console.print("[red]❌ 評価結果がありません[/red]")
+                return
         
-        # レポート保存
-        if save_report:
-            filename = system.save_report(output_file)
-            console.print(f"\n[green]✅ レポートが保存されました: {filename}[/green]")
+            # 結果表示
+            console.print("\n[bold]📊 評価結果[/bold]")
+            system.display_results()
         
-        # 最終判定
-        decision = boss_result.final_decision
-        decision_color = "green" if decision == "Go" else "red"
+            # レポート保存
+            if system.report_stream is not None:
+                console.print(f"\n[green]✅ レポートが保存されました: {system.report_stream.path}[/green]")
+            elif save_report:
+                filename = system.save_report(output_file)
+                console.print(f"\n[green]✅ レポートが保存されました: {filename}[/green]")
+            if metrics_out:
+                system.save_metrics(metrics_out)
         
-        console.print(Panel.fit(
-            f"[bold]最終判定: [{decision_color}]{decision}[/{decision_color}][/bold]\n"
-            f"リスク分析: {boss_result.risk_analysis}\n"
-            f"改善項目数: {len(boss_result.improvement_roadmap)}件",
-            title="BOSS最終判定",
-            border_style=decision_color
-        ))
-    
-    # 非同期実行
-    asyncio.run(main())
+            # 最終判定
+            decision = boss_result.final_decision
+            decision_color = "green" if decision == "Go" else "red"
+        
+            console.print(Panel.fit(
+                f"[bold]最終判定: [{decision_color}]{decision}[/{decision_color}][/bold]\n"
+                f"リスク分析: {boss_result.risk_analysis}\n"
+                f"改善項目数: {len(boss_result.improvement_roadmap)}件",
+                title="BOSS最終判定",
+                border_style=decision_color
+            ))
+    
+    # 非同期実行（中断しても完了分はジャーナルに残る）
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        console.print(
+            f"\n[yellow]評価を中断しました。再開するには: python main.py run --resume {journal.run_id}[/yellow]"
+        )
+        raise typer.Exit(130)
+
+@app.command("report")
+def report_command(
+    stream_file: str = typer.Argument(..., help="--report-format jsonl で出力したレポートストリーム"),
+    legacy_json: str = typer.Option(
+        None,
+        "--legacy-json",
+        help="従来形式のJSONレポートを生成して保存するファイル"
+    )
+):
+    """JSONLレポートストリームからサマリーを表示（実行中のストリームも可）"""
+    from rich.table import Table
+    from report_stream import load_report_stream, summarize_report_stream, build_legacy_report
+    
+    try:
+        state = load_report_stream(stream_file)
+    except OSError as e:
+        console.print(f"[red]❌ レポートストリームの読み込みに失敗しました: {e}[/red]")
+        raise typer.Exit(1)
+    
+    summary = summarize_report_stream(state)
+    table = Table(title=f"レポートサマリー: {stream_file}")
+    table.add_column("項目", style="cyan")
+    table.add_column("値")
+    table.add_row("状態", "完了" if summary["status"] == "finished" else "実行中（または中断）")
+    table.add_row("対象URL", str(summary["target_url"]))
+    table.add_row("Worker評価", f"{summary['workers_completed']}/{summary['workers_expected']}")
+    table.add_row("失敗したWorker", ", ".join(summary["failed_workers"]) or "なし")
+    table.add_row("リスクレベル", " / ".join(f"{k}: {v}" for k, v in summary["risk_levels"].items()))
+    table.add_row("優先度", " / ".join(f"{k}: {v}" for k, v in summary["priorities"].items()))
+    table.add_row("会話数", f"{summary['conversations']} ({', '.join(f'{k}: {v}' for k, v in summary['conversation_types'].items())})")
+    table.add_row("最終判定", summary["final_decision"] or "未確定")
+    console.print(table)
+    
+    if legacy_json:
+        report = build_legacy_report(state)
+        if "error" in report:
+            console.print(f"[red]❌ {report['error']}[/red]")
+            raise typer.Exit(1)
+        with open(legacy_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        console.print(f"[green]従来形式のレポートを保存しました: {legacy_json}[/green]")
+
+@app.command("run-batch")
+def run_batch_command(
+    targets_file: str = typer.Argument(..., help="評価対象を記述したJSONLまたはCSVファイル（url, source, description）"),
+    output_dir: str = typer.Option(
+        None,
+        "--output-dir",
+        "-o",
+        help="レポート出力ディレクトリ（指定しない場合は自動生成）"
+    ),
+    concurrency: int = typer.Option(
+        2,
+        "--concurrency",
+        "-c",
+        help="同時に評価する対象の数"
+    ),
+    dispatch: str = typer.Option(
+        None,
+        "--dispatch",
+        help="会話のディスパッチ方式（interleaved / model_affinity、未指定時はconfig.pyの設定）"
+    ),
+    cache: str = typer.Option(
+        None,
+        "--cache",
+        help="レスポンスキャッシュ（read-write / read-only / off、未指定時はconfig.pyの設定）"
+    ),
+    topology: str = typer.Option(
+        None,
+        "--topology",
+        help="Worker間会話のトポロジー（all-pairs / ring / star / random-k、未指定時はconfig.pyの設定）"
+    ),
+    conversation_types: str = typer.Option(
+        None,
+        "--conversation-types",
+        help="実行する会話タイプ（question,answer,collaboration,disputeからカンマ区切りで指定）"
+    ),
+    structured: bool = typer.Option(
+        None,
+        "--structured/--no-structured",
+        help="評価をJSONスキーマで制約して出力させるかどうか（未指定時はconfig.pyの設定）"
+    ),
+    past_findings: bool = typer.Option(
+        None,
+        "--past-findings/--no-past-findings",
+        help="過去のレポートの類似した指摘をWorker評価のプロンプトに添えるかどうか（index-findingsで作成したインデックスを使用）"
+    )
+):
+    """複数の評価対象を1プロセス・非対話でまとめて評価"""
+    import asyncio
+    from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
+    from rich.table import Table
+    from multi_agent_system import MultiAgentSystem
+    from batch import load_targets, run_batch
+    from response_cache import CACHE_MODES
+    
+    if cache is not None and cache not in CACHE_MODES:
+        raise typer.BadParameter(f"--cache は {' / '.join(CACHE_MODES)} のいずれかを指定してください")
+    types = _parse_conversation_options(topology, conversation_types)
+    
+    try:
+        targets = load_targets(targets_file)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]❌ 評価対象の読み込みに失敗しました: {e}[/red]")
+        raise typer.Exit(1)
+    
+    if output_dir is None:
+        output_dir = f"batch_reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    async def main():
+        async with MultiAgentSystem(
+            stream=False,
+            dispatch_mode=dispatch,
+            cache_mode=cache,
+            topology=topology,
+            conversation_types=types,
+            structured_output=structured,
+            past_findings=past_findings
+        ) as system:
+            await _check_connection(system)
+            
+            console.print(f"[bold]🚀 バッチ評価開始[/bold]: {len(targets)}件 (同時実行数: {concurrency})")
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                TextColumn("{task.completed}/{task.total}"),
+                console=console
+            ) as progress:
+                task = progress.add_task("バッチ評価中...", total=len(targets))
+                
+                def on_complete(entry):
+                    status = entry["final_decision"] or f"[red]エラー: {entry['error']}[/red]"
+                    progress.console.print(f"• {entry['url']}: {status} ({entry['duration_seconds']}秒)")
+                    progress.advance(task)
+                
+                return await run_batch(system, targets, output_dir, concurrency, on_complete)
+    
+    summary = asyncio.run(main())
+    
+    table = Table(title="バッチ評価サマリー")
+    table.add_column("#", style="dim")
+    table.add_column("対象URL", style="cyan")
+    table.add_column("最終判定")
+    table.add_column("レポート", style="green")
+    for entry in summary["targets"]:
+        decision = entry["final_decision"] or "[red]エラー[/red]"
+        table.add_row(str(entry["index"]), entry["url"], decision, entry["report"] or entry["error"] or "")
+    console.print(table)
+    console.print(
+        f"Go: {summary['go']}件 / No-Go: {summary['no_go']}件 / 失敗: {summary['failed']}件\n"
+        f"推奨事項: {summary['recommendation_clusters']['recommendations']}件 → "
+        f"重複をまとめて{summary['recommendation_clusters']['clusters']}件 "
+        f"({output_dir}/{summary['recommendation_clusters']['file']})\n"
+        f"[green]サマリーを保存しました: {output_dir}/index.json[/green]"
+    )
+
+def _finding_index_options(index_dir: str, embedder: str, model: str):
+    """--index-dir / --embedder / --model を反映した過去の指摘のインデックス設定"""
+    from config import config
+    
+    if embedder is not None and embedder not in ("ollama", "local"):
+        raise typer.BadParameter("--embedder は ollama / local のいずれかを指定してください")
+    updates = {"index_dir": index_dir, "embedder": embedder, "embedding_model": model}
+    return config.findings.model_copy(update={key: value for key, value in updates.items() if value is not None})
+
+@app.command("index-findings")
+def index_findings_command(
+    reports: List[str] = typer.Argument(
+        None,
+        help="索引するレポートJSON（globも可。未指定時はconfig.pyのreport_patterns）"
+    ),
+    index_dir: str = typer.Option(None, "--index-dir", help="インデックスの保存先（未指定時はconfig.pyの設定）"),
+    embedder: str = typer.Option(None, "--embedder", help="埋め込み方式（ollama / local、未指定時はconfig.pyの設定）"),
+    model: str = typer.Option(None, "--model", help="Ollamaの埋め込みモデル（未指定時はconfig.pyの設定）"),
+    rebuild: bool = typer.Option(False, "--rebuild", help="既存のインデックスを削除して作り直す")
+):
+    """過去のレポートのWorkerの評価・推奨事項を埋め込み、類似した指摘を検索するためのインデックスに追加"""
+    import asyncio
+    import glob
+    from config import config
+    from ollama_client import OllamaClient
+    from finding_index import FindingIndex, index_reports, make_embedder
+    
+    findings_config = _finding_index_options(index_dir, embedder, model)
+    paths = sorted({path for pattern in (reports or findings_config.report_patterns) for path in glob.glob(pattern, recursive=True)})
+    if not paths:
+        console.print("[yellow]索引するレポートが見つかりません[/yellow]")
+        raise typer.Exit(1)
+    
+    index = FindingIndex(findings_config.index_dir)
+    if rebuild:
+        index.reset()
+    
+    async def main():
+        async with OllamaClient(config.ollama) as client:
+            if findings_config.embedder == "ollama":
+                await client.check_models()
+            return await index_reports(index, make_embedder(findings_config, client), paths)
+    
+    try:
+        stats = asyncio.run(main())
+    except Exception as e:
+        console.print(f"[red]❌ インデックスの作成に失敗しました: {e}[/red]")
+        raise typer.Exit(1)
+    
+    summary = index.summary()
+    console.print(
+        f"[green]✅ {stats['indexed_reports']}件のレポートから{stats['findings']}件の指摘を追加しました[/green] "
+        f"(索引済みでスキップ: {stats['skipped_reports']}件 / Worker結果のない形式: {stats['unsupported_reports']}件)\n"
+        f"インデックス: {summary['directory']} - {summary['findings']}件 / {summary['reports']}レポート "
+        f"({summary['embedder']}: {summary['model']}, {summary['dim']}次元)"
+    )
+
+@app.command("search-findings")
+def search_findings_command(
+    query: str = typer.Argument(..., help="検索する指摘・観点のテキスト"),
+    top_k: int = typer.Option(5, "--top-k", "-k", help="表示する件数"),
+    agent: str = typer.Option(None, "--agent", help="指定したWorkerの指摘に限定"),
+    index_dir: str = typer.Option(None, "--index-dir", help="インデックスの保存先（未指定時はconfig.pyの設定）"),
+    embedder: str = typer.Option(None, "--embedder", help="埋め込み方式（ollama / local、未指定時はconfig.pyの設定）"),
+    model: str = typer.Option(None, "--model", help="Ollamaの埋め込みモデル（未指定時はconfig.pyの設定）")
+):
+    """過去のレポートから類似した指摘を検索"""
+    import asyncio
+    import time
+    from rich.table import Table
+    from config import config
+    from ollama_client import OllamaClient
+    from finding_index import FindingIndex, make_embedder, search_findings
+    
+    findings_config = _finding_index_options(index_dir, embedder, model)
+    index = FindingIndex(findings_config.index_dir)
+    if index.count == 0:
+        console.print(f"[yellow]インデックスが空です（{findings_config.index_dir}）。index-findingsで作成してください[/yellow]")
+        raise typer.Exit(1)
+    
+    async def main():
+        async with OllamaClient(config.ollama) as client:
+            if findings_config.embedder == "ollama":
+                await client.check_models()
+            return await search_findings(index, make_embedder(findings_config, client), [query], top_k, agents=[agent])
+    
+    started = time.perf_counter()
+    try:
+        matches = asyncio.run(main())[0]
+    except Exception as e:
+        console.print(f"[red]❌ 検索に失敗しました: {e}[/red]")
+        raise typer.Exit(1)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    table = Table(title=f"類似した過去の指摘（{index.count}件から検索、{elapsed_ms:.1f}ms）")
+    table.add_column("類似度", justify="right")
+    table.add_column("Worker", style="cyan")
+    table.add_column("種別")
+    table.add_column("リスク")
+    table.add_column("指摘")
+    table.add_column("レポート", style="dim")
+    for match in matches:
+        table.add_row(
+            f"{match['score']:.3f}",
+            match["agent"] or "",
+            "評価" if match["kind"] == "evaluation" else "推奨事項",
+            match["risk_level"] or "",
+            match["text"],
+            match["report"]
+        )
+    console.print(table)
+
+@app.command()
+def benchmark(
+    workers: str = typer.Option(
+        "3,5,20,50",
+        "--workers",
+        "-w",
+        help="計測するWorker数（カンマ区切り）"
+    ),
+    latency: float = typer.Option(0.01, "--latency", help="スタブサーバーの最初のトークンまでの遅延（秒）"),
+    tokens_per_second: float = typer.Option(2000.0, "--tokens-per-second", help="スタブサーバーのトークン生成速度"),
+    concurrency: int = typer.Option(16, "--concurrency", "-c", help="会話の同時実行数"),
+    stream: bool = typer.Option(True, "--stream/--no-stream", help="ストリーミングAPIを使うかどうか"),
+    topology: str = typer.Option(None, "--topology", help="Worker間会話のトポロジー（all-pairs / ring / star / random-k）"),
+    spill: bool = typer.Option(False, "--spill/--no-spill", help="会話本文をセグメントファイルに退避するかどうか"),
+    memory: bool = typer.Option(False, "--memory/--no-memory", help="tracemallocでピークメモリを計測するかどうか（計測中は遅くなる）"),
+    server_parallel: int = typer.Option(None, "--server-parallel", help="スタブサーバーが同時に生成できるリクエスト数（超えた分はキューで待つ）"),
+    output_file: str = typer.Option(
+        None,
+        "--output",
+        "-o",
+        help="結果JSONの出力先（指定しない場合は自動生成）"
+    ),
+    baseline_file: str = typer.Option(
+        None,
+        "--baseline",
+        help="比較対象のベンチマーク結果JSON"
+    )
+):
+    """スタブOllamaサーバーを起動してシステム自体のオーバーヘッドを計測"""
+    import asyncio
+    from rich.table import Table
+    from benchmark import run_benchmark, save_benchmark
+    
+    _parse_conversation_options(topology, None)
+    worker_counts = [int(w) for w in workers.split(",") if w.strip()]
+    baseline = None
+    if baseline_file:
+        with open(baseline_file, encoding="utf-8") as f:
+            baseline = json.load(f)
+    
+    summary = asyncio.run(run_benchmark(
+        worker_counts,
+        latency=latency,
+        tokens_per_second=tokens_per_second,
+        concurrency=concurrency,
+        stream=stream,
+        topology=topology,
+        spill_messages=spill,
+        track_memory=memory,
+        server_parallel=server_parallel,
+        baseline=baseline
+    ))
+    
+    table = Table(title="ベンチマーク結果")
+    table.add_column("Worker数", justify="right")
+    table.add_column("LLM呼び出し", justify="right")
+    table.add_column("評価全体(秒)", justify="right")
+    table.add_column("Worker評価(秒)", justify="right")
+    table.add_column("会話(秒)", justify="right")
+    table.add_column("BOSS(秒)", justify="right")
+    table.add_column("レポート生成(秒)", justify="right")
+    table.add_column("レポートサイズ", justify="right")
+    table.add_column("会話ストア", justify="right")
+    table.add_column("ピークメモリ", justify="right")
+    for result in summary["results"]:
+        phases = result["phase_seconds"]
+        table.add_row(
+            str(result["workers"]),
+            str(result["llm_calls"]),
+            str(result["run_evaluation_seconds"]),
+            str(phases.get("worker_evaluation")),
+            str(phases.get("conversations")),
+            str(phases.get("boss_evaluation")),
+            str(result["generate_report_seconds"]),
+            f"{result['report_bytes'] / 1024:.1f} KB",
+            f"{result['conversation_store']['total_bytes'] / 1024:.1f} KB",
+            f"{result['peak_memory_bytes'] / 1024 / 1024:.1f} MB" if result["peak_memory_bytes"] is not None else "-"
+        )
+    console.print(table)
+    
+    for comparison in summary.get("comparison", []):
+        console.print(
+            f"• Worker {comparison['workers']}名: 評価全体 ×{comparison['run_evaluation_ratio']} / "
+            f"会話 ×{comparison['conversations_ratio']} / レポート生成 ×{comparison['generate_report_ratio']} (ベースライン比)"
+        )
+    
+    if output_file is None:
+        output_file = f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    save_benchmark(summary, output_file)
+    console.print(f"[green]ベンチマーク結果を保存しました: {output_file}[/green]")
+
+@app.command("benchmark-parser")
+def benchmark_parser(
+    lines: str = typer.Option("1000,100000", "--lines", "-l", help="計測する応答の行数（カンマ区切り）"),
+    repeat: int = typer.Option(3, "--repeat", help="各入力の計測回数（最短時間を採用）"),
+    output_file: str = typer.Option(None, "--output", "-o", help="結果JSONの出力先")
+):
+    """Worker・BOSS応答パーサーを巨大な応答・バックトラックを誘発しやすい応答で計測"""
+    from rich.table import Table
+    from benchmark import benchmark_parsers, save_benchmark
+    
+    line_counts = [int(n) for n in lines.split(",") if n.strip()]
+    results = benchmark_parsers(line_counts, repeat=repeat)
+    
+    table = Table(title="パーサーベンチマーク")
+    table.add_column("行数", justify="right")
+    table.add_column("入力")
+    table.add_column("サイズ", justify="right")
+    table.add_column("Worker(秒)", justify="right")
+    table.add_column("BOSS(秒)", justify="right")
+    table.add_column("MB/秒", justify="right")
+    for result in results:
+        table.add_row(
+            str(result["lines"]),
+            result["input"],
+            f"{result['bytes'] / 1024:.0f} KB",
+            str(result["worker_seconds"]),
+            str(result["boss_seconds"]),
+            str(result["mb_per_second"])
+        )
+    console.print(table)
+    
+    if output_file:
+        save_benchmark({"timestamp": datetime.now().isoformat(), "repeat": repeat, "results": results}, output_file)
+        console.print(f"[green]ベンチマーク結果を保存しました: {output_file}[/green]")
+
+@app.command("benchmark-clusters")
+def benchmark_clusters(
+    counts: str = typer.Option("1000,10000,50000", "--counts", "-n", help="計測する推奨事項の件数（カンマ区切り）"),
+    repeat: int = typer.Option(3, "--repeat", help="各件数の計測回数（最短時間を採用）"),
+    threshold: float = typer.Option(0.5, "--threshold", help="同じクラスタとみなす類似度（文字n-gramのJaccard係数）"),
+    output_file: str = typer.Option(None, "--output", "-o", help="結果JSONの出力先")
+):
+    """推奨事項の重複検出・クラスタリングをバッチ評価規模の件数で計測"""
+    from rich.table import Table
+    from benchmark import benchmark_clustering, save_benchmark
+    
+    results = benchmark_clustering([int(n) for n in counts.split(",") if n.strip()], repeat=repeat, threshold=threshold)
+    
+    table = Table(title="推奨事項クラスタリングのベンチマーク")
+    table.add_column("推奨事項", justify="right")
+    table.add_column("異なる表記", justify="right")
+    table.add_column("クラスタ", justify="right")
+    table.add_column("秒", justify="right")
+    table.add_column("件/秒", justify="right")
+    for result in results:
+        table.add_row(
+            str(result["recommendations"]),
+            str(result["distinct"]),
+            str(result["clusters"]),
+            str(result["seconds"]),
+            str(result["recommendations_per_second"])
+        )
+    console.print(table)
+    
+    if output_file:
+        save_benchmark(
+            {"timestamp": datetime.now().isoformat(), "repeat": repeat, "threshold": threshold, "results": results},
+            output_file
+        )
+        console.print(f"[green]ベンチマーク結果を保存しました: {output_file}[/green]")
+
+@app.command("benchmark-startup")
+def benchmark_startup_command(
+    commands: str = typer.Option(
+        "show-config,show-structure,preview-conversations",
+        "--commands",
+        help="計測するコマンド（カンマ区切り）"
+    ),
+    repeat: int = typer.Option(5, "--repeat", help="各コマンドの起動回数（中央値を採用）"),
+    max_import_ms: float = typer.Option(None, "--max-import-ms", help="import時間の上限（超えたら終了コード1）"),
+    output_file: str = typer.Option(None, "--output", "-o", help="結果JSONの出力先")
+):
+    """CLIコマンドの起動時間をpython -X importtimeで計測し、重いモジュールの読み込みを検出"""
+    from rich.table import Table
+    from benchmark import benchmark_startup, save_benchmark
+    
+    results = benchmark_startup([c.strip() for c in commands.split(",") if c.strip()], repeat=repeat)
+    
+    table = Table(title="起動時間ベンチマーク")
+    table.add_column("コマンド")
+    table.add_column("起動(ms)", justify="right")
+    table.add_column("import(ms)", justify="right")
+    table.add_column("モジュール数", justify="right")
+    table.add_column("遅いimport")
+    table.add_column("不要な読み込み")
+    for result in results:
+        table.add_row(
+            result["command"],
+            str(result["wall_ms"]),
+            str(result["import_ms"]),
+            str(result["modules"]),
+            ", ".join(f"{m['module']} {m['ms']}ms" for m in result["slowest_imports"][:3]),
+            ", ".join(result["forbidden_modules"]) or "-"
+        )
+    console.print(table)
+    
+    if output_file:
+        save_benchmark({"timestamp": datetime.now().isoformat(), "repeat": repeat, "results": results}, output_file)
+        console.print(f"[green]ベンチマーク結果を保存しました: {output_file}[/green]")
+    
+    # スクリプトやCIで起動時間の劣化を検出できるよう、問題があれば終了コード1で終わる
+    failed = [
+        r["command"] for r in results
+        if r["forbidden_modules"] or (max_import_ms is not None and r["import_ms"] > max_import_ms)
+    ]
+    if failed:
+        console.print(f"[red]❌ 起動時間の基準を満たしていません: {', '.join(failed)}[/red]")
+        raise typer.Exit(1)
 
 @app.command()
 def test_connection():
     """Ollamaサーバーとの接続をテスト"""
+    import asyncio
+    from multi_agent_system import MultiAgentSystem
+    from ollama_client import OllamaModelNotFoundError
+    
     async def test():
-        system = MultiAgentSystem()
-        success = await system.test_connection()
+        async with MultiAgentSystem() as system:
+            try:
+                success = await system.test_connection()
+            except OllamaModelNotFoundError as e:
+                console.print(f"[red]❌ エージェントが使用するモデルが見つかりません: {e}[/red]")
+                raise typer.Exit(1)
         
-        if success:
-            console.print("[green]✅ Ollamaサーバーに正常に接続できました[/green]")
+            if success:
+                console.print("[green]✅ Ollamaサーバーに正常に接続できました[/green]")
             
-            # 利用可能なモデルを表示
-            try:
-                models = await system.ollama_client.check_models()
-                console.print(f"\n[bold]利用可能なモデル:[/bold]")
-                for model in models.get('models', []):
-                    console.print(f"• {model['name']} ({model['details']['parameter_size']})")
-            except Exception as e:
-                console.print(f"[yellow]⚠️ モデル情報の取得に失敗: {e}[/yellow]")
-        else:
-            console.print("[red]❌ Ollamaサーバーに接続できません[/red]")
-            console.print("以下の点を確認してください:")
-            console.print("• Ollamaサーバーが起動しているか")
-            console.print("• http://localhost:11434 にアクセスできるか")
-            console.print("• ファイアウォール設定")
+                # 利用可能なモデルを表示
+                try:
+                    models = await system.ollama_client.check_models()
+                    console.print(f"\n[bold]利用可能なモデル:[/bold]")
+                    for model in models.get('models', []):
+                        console.print(f"• {model['name']} ({model['details']['parameter_size']})")
+                except Exception as e:
+                    console.print(f"[yellow]⚠️ モデル情報の取得に失敗: {e}[/yellow]")
+            else:
+                console.print("[red]❌ Ollamaサーバーに接続できません[/red]")
+                console.print("以下の点を確認してください:")
+                console.print("• Ollamaサーバーが起動しているか")
+                console.print("• http://localhost:11434 にアクセスできるか")
+                console.print("• ファイアウォール設定")
     
     asyncio.run(test())
 
 @app.command()
 def show_config():
     """現在の設定を表示"""
+    from config import config, BOSS_CONFIG, WORKER_CONFIGS
+    
     console.print(Panel.fit(
         f"[bold]BOSS-Worker設定情報[/bold]\n\n"
-        f"Ollama URL: {config.ollama.base_url}\n"
-        f"タイムアウト: {config.ollama.timeout}秒\n"
-        f"最大トークン: {config.ollama.max_tokens}\n\n"
+        f"Ollama URL: {', '.join(config.ollama.endpoints or [config.ollama.base_url])}\n"
+        f"タイムアウト: 接続 {config.ollama.connect_timeout}秒 / 読み取り {config.ollama.timeout}秒\n"
+        f"接続プール: ホストあたり最大 {config.ollama.max_connections_per_host} (keep-alive {config.ollama.keepalive_timeout}秒)\n"
+        f"会話の同時実行数: 全体 {config.ollama.max_concurrent_requests} / モデルあたり {config.ollama.max_concurrent_per_model}\n"
+        f"最大トークン: {config.ollama.max_tokens} "
+        f"(フェーズ別の上限と停止シーケンス: {'有効' if config.ollama.enforce_token_budgets else '無効'})\n"
+        f"プレフィックス再利用: {'有効' if config.ollama.prefix_reuse else '無効'}\n"
+        f"構造化出力: {'有効' if config.ollama.structured_output else '無効'}\n"
+        f"過去の指摘のインデックス: {config.findings.index_dir} "
+        f"({config.findings.embedder}, プロンプトへの参照: {'有効' if config.findings.enrich_prompts else '無効'})\n"
+        f"モデルの事前読み込み: {'有効' if config.ollama.preload_models else '無効'} "
+        f"(keep_alive {config.ollama.preload_keep_alive or config.ollama.keep_alive})\n\n"
         f"[bold]BOSSエージェント:[/bold]\n"
         f"• {BOSS_CONFIG.name} ({BOSS_CONFIG.model}) - {BOSS_CONFIG.role}\n\n"
         f"[bold]Workerエージェント:[/bold]\n" +
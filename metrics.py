@@ -0,0 +1,168 @@
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+from ollama_client import GenerationStats
+
+NANOSECONDS = 1e9
+
+def _empty_bucket() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "cached_calls": 0,
+        "eval_tokens": 0,
+        "eval_seconds": 0.0,
+        "prompt_eval_tokens": 0,
+        "prompt_eval_seconds": 0.0,
+        "load_seconds": 0.0,
+        "wall_seconds": 0.0,
+        "prefix_tokens_reused": 0,
+        # 生成トークン数の上限（num_predict）を指定した呼び出しの予算と使用量
+        "budgeted_calls": 0,
+        "token_budget": 0,
+        "budgeted_eval_tokens": 0,
+        "budget_exhausted_calls": 0
+    }
+
+def _is_budgeted(stat: GenerationStats) -> bool:
+    """評価・会話の生成で上限を指定した呼び出し（プレフィックスのプライミングは含めない）"""
+    return bool(stat.token_budget) and stat.phase != "prefix" and not stat.cached
+
+def _add(bucket: Dict[str, Any], stat: GenerationStats):
+    bucket["calls"] += 1
+    bucket["wall_seconds"] += stat.total_time
+    if stat.cached:
+        bucket["cached_calls"] += 1
+        return
+    bucket["eval_tokens"] += stat.eval_count or 0
+    bucket["eval_seconds"] += (stat.eval_duration or 0) / NANOSECONDS
+    bucket["prompt_eval_tokens"] += stat.prompt_eval_count or 0
+    bucket["prompt_eval_seconds"] += (stat.prompt_eval_duration or 0) / NANOSECONDS
+    bucket["load_seconds"] += (stat.load_duration or 0) / NANOSECONDS
+    bucket["prefix_tokens_reused"] += stat.prefix_tokens_reused
+    if _is_budgeted(stat):
+        bucket["budgeted_calls"] += 1
+        bucket["token_budget"] += stat.token_budget
+        bucket["budgeted_eval_tokens"] += stat.eval_count or 0
+        if stat.done_reason == "length":
+            bucket["budget_exhausted_calls"] += 1
+
+def _finish(bucket: Dict[str, Any]) -> Dict[str, Any]:
+    """生成速度・プロンプト評価速度を算出して丸める"""
+    eval_seconds = bucket["eval_seconds"]
+    prompt_eval_seconds = bucket["prompt_eval_seconds"]
+    result = dict(bucket)
+    result["tokens_per_second"] = round(bucket["eval_tokens"] / eval_seconds, 2) if eval_seconds else None
+    result["prompt_tokens_per_second"] = (
+        round(bucket["prompt_eval_tokens"] / prompt_eval_seconds, 2) if prompt_eval_seconds else None
+    )
+    result["budget_utilization"] = (
+        round(bucket["budgeted_eval_tokens"] / bucket["token_budget"], 3) if bucket["token_budget"] else None
+    )
+    for key in ("eval_seconds", "prompt_eval_seconds", "load_seconds", "wall_seconds"):
+        result[key] = round(result[key], 3)
+    return result
+
+def summarize_inference(stats: List[GenerationStats]) -> Dict[str, Any]:
+    """呼び出しごとのOllamaタイミング情報をエージェント・フェーズ・モデル単位で集計"""
+    total = _empty_bucket()
+    by_agent: Dict[str, Dict[str, Any]] = defaultdict(_empty_bucket)
+    by_phase: Dict[str, Dict[str, Any]] = defaultdict(_empty_bucket)
+    by_model: Dict[str, Dict[str, Any]] = defaultdict(_empty_bucket)
+    by_conversation_type: Dict[str, Dict[str, Any]] = defaultdict(_empty_bucket)
+    
+    for stat in stats:
+        _add(total, stat)
+        _add(by_agent[stat.agent or "unknown"], stat)
+        _add(by_phase[stat.phase or "unknown"], stat)
+        _add(by_model[stat.model], stat)
+        if stat.conversation_type:
+            _add(by_conversation_type[stat.conversation_type], stat)
+    
+    # プレフィックス再利用の効果。contextなしで送った場合のprompt_eval_countは計測していないため、
+    # 削減量はプライミング時に評価したプレフィックスのトークン数×再利用した呼び出し数による推定値
+    # （プライミング自体のコストを差し引いた値も算出）。再利用した呼び出しで実際に評価されたトークン数は計測値
+    priming = [stat for stat in stats if stat.phase == "prefix" and not stat.cached]
+    priming_tokens = sum(stat.prompt_eval_count or 0 for stat in priming)
+    reused = [stat for stat in stats if stat.prefix_tokens_reused and not stat.cached]
+    prefix_reuse = {
+        "priming_calls": len(priming),
+        "priming_prompt_tokens": priming_tokens,
+        "reused_calls": len(reused),
+        "reused_prompt_eval_tokens": sum(stat.prompt_eval_count or 0 for stat in reused),
+        "estimated_prompt_eval_tokens_saved": total["prefix_tokens_reused"],
+        "estimated_net_prompt_eval_tokens_saved": total["prefix_tokens_reused"] - priming_tokens
+    }
+    
+    return {
+        "total": _finish(total),
+        "prefix_reuse": prefix_reuse,
+        "by_agent": {name: _finish(bucket) for name, bucket in sorted(by_agent.items())},
+        "by_phase": {name: _finish(bucket) for name, bucket in by_phase.items()},
+        "by_model": {name: _finish(bucket) for name, bucket in sorted(by_model.items())},
+        "by_conversation_type": {name: _finish(bucket) for name, bucket in by_conversation_type.items()}
+    }
+
+def token_budget_calls(stats: List[GenerationStats]) -> List[Dict[str, Any]]:
+    """呼び出しごとの生成トークン数と上限（上限に達して打ち切られた呼び出しはexhausted）"""
+    return [
+        {
+            "agent": stat.agent,
+            "phase": stat.phase,
+            "conversation_type": stat.conversation_type,
+            "model": stat.model,
+            "token_budget": stat.token_budget,
+            "eval_tokens": stat.eval_count or 0,
+            "utilization": round((stat.eval_count or 0) / stat.token_budget, 3),
+            "done_reason": stat.done_reason,
+            "exhausted": stat.done_reason == "length"
+        }
+        for stat in stats
+        if _is_budgeted(stat)
+    ]
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.6f}"
+
+def _labels(stat: GenerationStats) -> Tuple[Tuple[str, str], ...]:
+    return (
+        ("agent", stat.agent or "unknown"),
+        ("model", stat.model),
+        ("phase", stat.phase or "unknown"),
+        ("conversation_type", stat.conversation_type or ""),
+        ("cached", "true" if stat.cached else "false")
+    )
+
+# (メトリクス名, 説明, 値の取得関数)
+PROMETHEUS_COUNTERS = [
+    ("ollama_requests_total", "Number of generate calls", lambda s: 1),
+    ("ollama_eval_tokens_total", "Generated tokens (eval_count)", lambda s: s.eval_count or 0),
+    ("ollama_eval_seconds_total", "Time spent generating tokens", lambda s: (s.eval_duration or 0) / NANOSECONDS),
+    ("ollama_prompt_eval_tokens_total", "Prompt tokens evaluated (prompt_eval_count)", lambda s: s.prompt_eval_count or 0),
+    ("ollama_prompt_eval_seconds_total", "Time spent evaluating prompts", lambda s: (s.prompt_eval_duration or 0) / NANOSECONDS),
+    ("ollama_load_seconds_total", "Time spent loading models", lambda s: (s.load_duration or 0) / NANOSECONDS),
+    ("ollama_token_budget_total", "Generation token budget (num_predict) of budgeted calls", lambda s: s.token_budget if _is_budgeted(s) else 0),
+    ("ollama_budget_exhausted_total", "Calls stopped by reaching the token budget", lambda s: 1 if _is_budgeted(s) and s.done_reason == "length" else 0),
+    ("ollama_prefix_tokens_reused_total", "Prompt tokens skipped by reusing an evaluated prefix context", lambda s: 0 if s.cached else s.prefix_tokens_reused),
+    ("ollama_request_seconds_total", "Wall-clock time of generate calls", lambda s: s.total_time)
+]
+
+def to_prometheus(stats: List[GenerationStats], prefix: Optional[str] = None) -> str:
+    """呼び出しごとのメトリクスをPrometheusのテキスト形式（カウンター）で出力"""
+    totals: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = defaultdict(lambda: defaultdict(float))
+    for stat in stats:
+        labels = _labels(stat)
+        for name, _, value in PROMETHEUS_COUNTERS:
+            totals[name][labels] += value(stat)
+    
+    lines = []
+    for name, description, _ in PROMETHEUS_COUNTERS:
+        metric = f"{prefix}_{name}" if prefix else name
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in sorted(totals[name].items()):
+            label_text = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels)
+            lines.append(f"{metric}{{{label_text}}} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
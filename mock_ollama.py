@@ -0,0 +1,189 @@
+import asyncio
+import json
+import time
+from typing import List, Optional
+
+from aiohttp import web
+
+from response_parser import parse_worker_sections, parse_boss_sections
+from finding_index import hashed_features
+
+# ワーカー・BOSS双方のパーサーが解釈できる固定レスポンス
+DEFAULT_RESPONSE = """## 評価結果
+決済フローはStripe Checkoutを利用しており、カード情報を自前で保持していません。
+一方で特定商取引法に基づく表記が見当たらず、エラーハンドリングも不十分です。
+
+## 推奨事項
+- 特定商取引法に基づく表記ページを追加する
+- 決済失敗時のエラーメッセージを具体化する
+- セキュリティヘッダー（CSP、HSTS）を設定する
+
+## リスクレベル
+中 - 法的表記の不備があるが決済情報は保護されている
+
+## 優先度
+高 - リリース前に法的表記の対応が必要
+
+## 統合評価結果
+Workerの評価を統合すると、技術面は概ね良好だが法的要件に不備がある。
+
+## 最終判定
+No-Go - 特定商取引法の表記不備（中リスク3件以上）
+
+## リスク分析
+高リスク: なし / 中リスク: 法的表記、エラーハンドリング、セキュリティヘッダー
+
+## 改善ロードマップ
+- 短期: 特定商取引法に基づく表記の追加
+- 中期: エラーハンドリングとセキュリティヘッダーの整備
+- 長期: アクセシビリティ監査の定期実施
+"""
+
+class MockOllamaServer:
+    """ベンチマーク用のOllama互換スタブ（/api/tags, /api/generate, /api/embeddings）"""
+    
+    def __init__(
+        self,
+        models: List[str],
+        latency: float = 0.01,
+        tokens_per_second: float = 2000.0,
+        response: str = DEFAULT_RESPONSE,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        parallel: Optional[int] = None
+    ):
+        self.models = models
+        self.latency = latency  # 最初のトークンまでの遅延（秒）
+        self.tokens_per_second = tokens_per_second
+        self.response = response
+        self.host = host
+        self.port = port
+        self.requests_served = 0
+        # 同時に生成できるリクエスト数（OLLAMA_NUM_PARALLEL相当。超えた分はキューで待つ。Noneなら無制限）
+        self.parallel = parallel
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._runner: Optional[web.AppRunner] = None
+    
+    def _response_for(self, body: dict) -> str:
+        """formatにJSONスキーマが指定された場合は、固定レスポンスの各セクションをJSONにして返す"""
+        schema = body.get("format")
+        if not isinstance(schema, dict):
+            return self.response
+        properties = schema.get("properties", {})
+        sections = parse_boss_sections(self.response) if "final_decision" in properties else parse_worker_sections(self.response)
+        return json.dumps({key: value for key, value in sections.items() if key in properties}, ensure_ascii=False)
+    
+    def _truncate(self, body: dict, text: str):
+        """停止シーケンスとnum_predictを適用したトークン列とdone_reason"""
+        options = body.get("options") or {}
+        for stop in options.get("stop") or []:
+            if stop in text:
+                text = text[:text.index(stop)]
+        tokens = self._tokenize(text)
+        limit = options.get("num_predict")
+        if limit and len(tokens) > limit:
+            return tokens[:limit], "length"
+        return tokens, "stop"
+    
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        """1行を1トークンとして扱う（JSONは1行なので、およそ16文字ごとに区切る）"""
+        if "\n" not in text:
+            return [text[i:i + 16] for i in range(0, len(text), 16)]
+        return text.splitlines(keepends=True)
+    
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+    
+    async def __aenter__(self) -> "MockOllamaServer":
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+    
+    async def start(self):
+        self._slots = asyncio.Semaphore(self.parallel) if self.parallel else None
+        app = web.Application()
+        app.router.add_get("/api/tags", self._tags)
+        app.router.add_post("/api/generate", self._generate)
+        app.router.add_post("/api/embeddings", self._embeddings)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # port=0の場合は割り当てられたポートを取得
+        self.port = self._runner.addresses[0][1]
+    
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def _tags(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "models": [{"name": name, "details": {"parameter_size": "mock"}} for name in self.models]
+        })
+    
+    def _timings(self, body: dict, tokens: List[str], elapsed: float) -> dict:
+        """Ollamaと同じ形式のタイミング情報（ナノ秒）と、1文字を1トークンとみなしたcontext"""
+        eval_duration = int(len(tokens) / self.tokens_per_second * 1e9)
+        # contextがある場合はシステムプロンプトを含むプレフィックスを評価済みとして扱う
+        prompt = body["prompt"] if body.get("context") else body.get("system", "") + body["prompt"]
+        return {
+            "context": list(body.get("context") or []) + list(range(len(prompt))),
+            "total_duration": int(elapsed * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt),
+            "prompt_eval_duration": int(self.latency * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": eval_duration
+        }
+    
+    async def _embeddings(self, request: web.Request) -> web.Response:
+        """文字n-gramの特徴ハッシュを埋め込みとして返す（表記の近いテキストほど類似度が高い）"""
+        body = await request.json()
+        await asyncio.sleep(self.latency)
+        self.requests_served += 1
+        return web.json_response({"embedding": hashed_features([body["prompt"]], 384)[0].tolist()})
+    
+    async def _generate(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        started = time.perf_counter()
+        self.requests_served += 1
+        if body.get("model") not in self.models:
+            return web.json_response({"error": f"model '{body.get('model')}' not found"}, status=404)
+        if "prompt" not in body:
+            # keep_aliveのみのリクエスト（モデルのロード・解放）
+            return web.json_response({"model": body.get("model"), "response": "", "done": True})
+        
+        if self._slots is None:
+            return await self._respond(request, body, started)
+        async with self._slots:
+            return await self._respond(request, body, started)
+    
+    async def _respond(self, request: web.Request, body: dict, started: float) -> web.StreamResponse:
+        await asyncio.sleep(self.latency)
+        tokens, done_reason = self._truncate(body, self._response_for(body))
+        token_delay = 1.0 / self.tokens_per_second
+        if not body.get("stream", True):
+            await asyncio.sleep(token_delay * len(tokens))
+            return web.json_response({
+                "model": body["model"],
+                "response": "".join(tokens),
+                "done": True,
+                "done_reason": done_reason,
+                **self._timings(body, tokens, time.perf_counter() - started)
+            })
+        
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for token in tokens:
+            await asyncio.sleep(token_delay)
+            chunk = {"model": body["model"], "response": token, "done": False}
+            await response.write((json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8"))
+        final = {"model": body["model"], "response": "", "done": True, "done_reason": done_reason, **self._timings(body, tokens, time.perf_counter() - started)}
+        await response.write((json.dumps(final) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
@@ -1,42 +1,196 @@
 import asyncio
+import copy
 import json
+import time
+import uuid
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Dict, Any
-from rich.console import Console
+from typing import List, Dict, Any, Optional
+from rich.console import Console, Group
 from rich.table import Table
 from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
+from rich.live import Live
+from rich.text import Text
 
-from config import config, BOSS_CONFIG, WORKER_CONFIGS
-from ollama_client import OllamaClient
+from config import config, BOSS_CONFIG, WORKER_CONFIGS, OllamaConfig, AgentConfig, ConversationConfig
+from topology import build_pairs, parse_conversation_types, CONVERSATION_TYPES
+from ollama_client import OllamaClient, OllamaError, OllamaModelNotFoundError, current_run
+from scheduler import RequestScheduler
+from run_journal import RunJournal
+from report_stream import ReportStreamWriter, build_report
+from conversation_store import ConversationStore
+from metrics import summarize_inference, token_budget_calls, to_prometheus
 from agent import create_agent, AgentResult, BossResult, WorkerConversation
+from recommendation_clusters import cluster_recommendations
+from finding_index import FindingIndex, compact_finding, make_embedder, search_findings
 
 console = Console()
 
+@dataclass
+class _PipelineView:
+    """パイプライン実行中の表示状態（1つのLiveでまとめて描画する）"""
+    progress: Progress
+    jobs: List[tuple]
+    in_flight: Dict[int, List[str]] = field(default_factory=dict)  # 実行中の会話（ジョブ番号→受信済みトークン）
+    boss_tokens: List[str] = field(default_factory=list)
+
 class MultiAgentSystem:
-    def __init__(self):
-        self.ollama_client = OllamaClient(config.ollama)
+    def __init__(
+        self,
+        stream: bool = True,
+        dispatch_mode: Optional[str] = None,
+        cache_mode: Optional[str] = None,
+        journal: Optional[RunJournal] = None,
+        report_stream: Optional[ReportStreamWriter] = None,
+        ollama_config: Optional[OllamaConfig] = None,
+        worker_configs: Optional[List[AgentConfig]] = None,
+        topology: Optional[str] = None,
+        conversation_types: Optional[List[str]] = None,
+        conversation_config: Optional[ConversationConfig] = None,
+        structured_output: Optional[bool] = None,
+        past_findings: Optional[bool] = None
+    ):
+        ollama_config = ollama_config or config.ollama
+        if cache_mode is not None:
+            ollama_config = ollama_config.model_copy(update={"cache_mode": cache_mode})
+        if structured_output is not None:
+            ollama_config = ollama_config.model_copy(update={"structured_output": structured_output})
+        self.ollama_client = OllamaClient(ollama_config)
+        self.stream = stream  # トークンを逐次表示するかどうか
+        self.console = console
+        self.dispatch_mode = dispatch_mode or ollama_config.dispatch_mode
+        self.model_dispatch = {}
+        # 会話トポロジーと会話タイプ（列挙順に正規化）
+        conversation_config = conversation_config or config.conversation
+        self.conversation_config = conversation_config.model_copy(update={
+            "topology": topology or conversation_config.topology,
+            "types": parse_conversation_types(",".join(conversation_types or conversation_config.types))
+        })
+        self.conversation_plan = {}
+        self.journal = journal  # 完了した評価・会話を記録し、再開時にスキップする
+        self.report_stream = report_stream  # 評価結果を到着順にJSONLへ書き出す
+        self.scheduler = RequestScheduler(
+            ollama_config.max_concurrent_requests,
+            ollama_config.max_concurrent_per_model
+        )
         self.boss_agent = None
         self.worker_agents = []
         self.worker_results = []
         self.boss_result = None
-        self.worker_conversations = []
+        self.worker_conversations = self._new_conversation_store()
+        self.phase_timings = {}  # フェーズごとの所要時間（秒）
+        # 呼び出しの計測値のうちこのインスタンスの評価の分を取り出すためのタグ（評価ごとに採番）
+        self.run_tag: Optional[str] = None
+        self.held_models = set()  # この評価が使用中として数えているモデル
+        self.model_warmup = {}  # モデルごとの事前読み込み結果
+        # 過去の類似した指摘をWorker評価のプロンプトに添える（findings.enrich_prompts）
+        self.findings_config = config.findings
+        if past_findings is not None:
+            self.findings_config = self.findings_config.model_copy(update={"enrich_prompts": past_findings})
+        self.past_findings = {}  # Worker名 -> プロンプトに添えた過去の指摘
         
         # BOSSエージェントを初期化
         self.boss_agent = create_agent(BOSS_CONFIG, self.ollama_client)
         
         # Workerエージェントを初期化
-        for worker_config in WORKER_CONFIGS:
+        for worker_config in worker_configs or WORKER_CONFIGS:
             worker = create_agent(worker_config, self.ollama_client)
             self.worker_agents.append(worker)
     
+    async def __aenter__(self) -> "MultiAgentSystem":
+        await self.ollama_client.__aenter__()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def close(self):
+        """Ollamaクライアントの共有セッションと会話ストアを解放"""
+        await self.ollama_client.close()
+        self.worker_conversations.close()
+    
+    def _new_conversation_store(self) -> ConversationStore:
+        conv = self.conversation_config
+        return ConversationStore(conv.spill_dir if conv.spill_messages else None)
+    
+    def fork(self) -> "MultiAgentSystem":
+        """クライアント・スケジューラ・エージェントを共有し、評価結果と表示先だけを分離したインスタンスを作成"""
+        child = copy.copy(self)
+        child.console = Console(quiet=True)
+        child.worker_results = []
+        child.boss_result = None
+        child.worker_conversations = self._new_conversation_store()
+        child.model_dispatch = {}
+        child.conversation_plan = {}
+        child.phase_timings = {}
+        child.run_tag = None
+        child.held_models = set()
+        child.past_findings = {}
+        child.journal = None
+        child.report_stream = None
+        return child
+    
     async def test_connection(self) -> bool:
-        """Ollamaサーバーとの接続をテスト"""
-        return await self.ollama_client.test_connection()
+        """Ollamaサーバーとの接続をテスト（preload_modelsが有効なら全エージェントのモデルを事前に読み込む）
+        
+        エージェントが使用するモデルが導入されていない場合はOllamaModelNotFoundErrorを送出する。
+        """
+        if not self.ollama_client.config.preload_models:
+            return await self.ollama_client.test_connection()
+        
+        models = sorted({self.boss_agent.model} | {agent.model for agent in self.worker_agents})
+        try:
+            self.model_warmup = await self.ollama_client.warm_up(models)
+        except OllamaModelNotFoundError:
+            # 接続はできているため、呼び出し元でモデルが見つからない旨を表示して終了する
+            raise
+        except OllamaError:
+            # 接続失敗の内容はtest_connection内で表示済み
+            return False
+        self.display_model_warmup()
+        return True
+    
+    def display_model_warmup(self):
+        """モデルごとの事前読み込み時間を表示"""
+        table = Table(title="モデルの事前読み込み")
+        table.add_column("モデル", style="cyan")
+        table.add_column("エンドポイント", justify="right")
+        table.add_column("読み込み(秒)", justify="right", style="yellow")
+        table.add_column("keep_alive", justify="right")
+        table.add_column("エラー", style="red")
+        for model, warmup in self.model_warmup.items():
+            table.add_row(
+                model,
+                str(len(warmup["loaded"])),
+                str(warmup["load_seconds"]),
+                warmup["keep_alive"],
+                "; ".join(f"{url}: {error}" for url, error in warmup["errors"].items()) or "-"
+            )
+        self.console.print(table)
     
     async def run_evaluation(self, target_info: Dict[str, Any]) -> BossResult:
-        """BOSS-Worker構造で評価を実行"""
-        console.print(Panel.fit(
+        """BOSS-Worker構造で評価を実行
+        
+        フェーズ間で全件の完了を待たず、依存関係に従って進める。
+        Worker評価が揃ったペアから会話を始め、全Workerの評価が揃った時点でBOSS評価を開始する
+        （会話はBOSS評価の入力ではないため、BOSS評価と並行して続ける）。
+        バッチ評価で並行する他のインスタンスの呼び出しと区別できるよう、この評価の呼び出しにはrun_tagを付ける。
+        """
+        self.run_tag = uuid.uuid4().hex
+        token = current_run.set(self.run_tag)
+        self.held_models = {self.boss_agent.model} | {worker.model for worker in self.worker_agents}
+        self.ollama_client.hold_models(sorted(self.held_models))
+        try:
+            return await self._run_evaluation(target_info)
+        finally:
+            current_run.reset(token)
+            for model in self.held_models:
+                self.ollama_client.release_model(model)
+            self.held_models = set()
+    
+    async def _run_evaluation(self, target_info: Dict[str, Any]) -> BossResult:
+        self.console.print(Panel.fit(
             f"[bold blue]BOSS-Worker評価システム開始[/bold blue]\n"
             f"対象: {target_info.get('url', 'N/A')}\n"
             f"BOSS: 1名\n"
@@ -44,79 +198,317 @@ class MultiAgentSystem:
             border_style="blue"
         ))
         
-        # Step 1: Workerエージェントによる並行評価
-        console.print("\n[bold]🔧 Step 1: Workerエージェントによる専門評価[/bold]")
-        worker_results = await self._run_worker_evaluation(target_info)
+        # 同じインスタンスで評価を繰り返しても前回の会話を持ち越さない
+        if len(self.worker_conversations):
+            self.worker_conversations.close()
+            self.worker_conversations = self._new_conversation_store()
         
-        if not worker_results:
-            console.print("[red]❌ Workerエージェントの評価が失敗しました[/red]")
-            return None
+        if self.journal is not None and self.journal.target_info() is None:
+            self.journal.record_run_started(target_info)
+        if self.report_stream is not None:
+            self.report_stream.record_run_started(target_info, self._project_structure())
         
-        # Step 1.5: Workerエージェント間の会話
-        console.print("\n[bold]💬 Step 1.5: Workerエージェント間の会話[/bold]")
-        await self._run_worker_conversations(target_info)
+        self.console.print(
+            "\n[bold]🔧 Step 1: Worker専門評価 → 💬 Step 1.5: Worker間会話 / 👑 Step 2: BOSS統合評価[/bold]"
+        )
+        view = _PipelineView(
+            progress=Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                TextColumn("{task.completed}/{task.total}"),
+                console=self.console
+            ),
+            jobs=self._build_conversation_jobs()
+        )
+        # Workerごとの評価完了（会話ジョブの開始条件）
+        evaluated = {worker.name: asyncio.Event() for worker in self.worker_agents}
+        started = time.perf_counter()
         
-        # Step 2: BOSSエージェントによる統合評価
-        console.print("\n[bold]👑 Step 2: BOSSエージェントによる統合評価[/bold]")
-        boss_result = await self._run_boss_evaluation(worker_results, target_info)
+        # 進捗・実行中の会話・BOSSの生成途中の内容を1つのLiveで描画する
+        with Live(
+            get_renderable=lambda: self._render_pipeline(view),
+            console=self.console,
+            refresh_per_second=8,
+            transient=True
+        ) as live:
+            conversations = asyncio.create_task(self._run_worker_conversations(target_info, view, evaluated, live))
+            try:
+                worker_target_info = target_info
+                if self.findings_config.enrich_prompts:
+                    worker_target_info = {**target_info, "past_findings": await self._lookup_past_findings(target_info)}
+                worker_results = await self._run_worker_evaluation(worker_target_info, view, evaluated)
+                self.phase_timings["worker_evaluation"] = round(time.perf_counter() - started, 3)
+                
+                if not worker_results:
+                    self.console.print("[red]❌ Workerエージェントの評価が失敗しました[/red]")
+                    return None
+                
+                boss_started = time.perf_counter()
+                boss_result = await self._run_boss_evaluation(worker_results, target_info, view)
+                self.phase_timings["boss_evaluation"] = round(time.perf_counter() - boss_started, 3)
+                
+                # BOSS評価後も残っている会話の完了を待つ
+                await conversations
+                self.phase_timings["conversations"] = round(time.perf_counter() - started, 3)
+            finally:
+                if not conversations.done():
+                    conversations.cancel()
+                    await asyncio.gather(conversations, return_exceptions=True)
         
+        self.phase_timings["total"] = round(time.perf_counter() - started, 3)
         self.worker_results = worker_results
         self.boss_result = boss_result
+        if self.report_stream is not None:
+            self.report_stream.record_run_finished(self._run_stats())
         
         return boss_result
     
-    async def _run_worker_evaluation(self, target_info: Dict[str, Any]) -> List[AgentResult]:
-        """Workerエージェントによる並行評価を実行"""
-        tasks = []
-        for worker in self.worker_agents:
-            task = asyncio.create_task(worker.evaluate(target_info))
-            tasks.append(task)
-        
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console
-        ) as progress:
-            task = progress.add_task("Workerエージェント評価中...", total=len(tasks))
+    async def _run_worker_evaluation(
+        self,
+        target_info: Dict[str, Any],
+        view: "_PipelineView",
+        evaluated: Dict[str, asyncio.Event]
+    ) -> List[AgentResult]:
+        """Workerエージェントによる並行評価を実行（完了したものから順に進捗・会話の開始条件に反映）"""
+        completed = self.journal.completed_worker_results() if self.journal else {}
+        pending = [worker for worker in self.worker_agents if worker.name not in completed]
+        if completed:
+            self.console.print(f"[dim]記録済みのWorker評価を再利用: {len(completed)}件[/dim]")
+        for name, result in completed.items():
+            evaluated[name].set()
+            if self.report_stream is not None:
+                self.report_stream.record_worker_result(result)
+        
+        task = view.progress.add_task(
+            "Workerエージェント評価中...", total=len(self.worker_agents), completed=len(completed)
+        )
+        received_tokens = [0]
+        
+        def on_token(token: str):
+            received_tokens[0] += 1
+            view.progress.update(task, description=f"Workerエージェント評価中... (受信トークン: {received_tokens[0]})")
+        
+        async def evaluate(worker) -> tuple:
+            try:
+                result = await worker.evaluate(target_info, on_token if self.stream else None)
+                # 完了した評価はすぐにジャーナルへ記録
+                if self.journal is not None:
+                    self.journal.record_worker_result(result)
+                if self.report_stream is not None:
+                    self.report_stream.record_worker_result(result)
+                return worker, result
+            except Exception as e:
+                return worker, e
+            finally:
+                evaluated[worker.name].set()
+        
+        for finished in asyncio.as_completed([evaluate(worker) for worker in pending]):
+            worker, result = await finished
+            if isinstance(result, Exception):
+                self.console.print(f"[red]Worker {worker.name} でエラー: {result}[/red]")
+            else:
+                if result.error:
+                    self.console.print(f"[red]Worker {worker.name} の評価に失敗しました（リトライ後）: {result.error}[/red]")
+                completed[worker.name] = result
+            view.progress.advance(task)
+        view.progress.update(task, description="Workerエージェント評価完了")
+        
+        return [completed[worker.name] for worker in self.worker_agents if worker.name in completed]
+    
+    def _build_conversation_jobs(self) -> List[tuple]:
+        """トポロジーと会話タイプから会話ジョブ（話し手, 相手, 会話タイプ, 回答対象の質問ジョブ番号）を列挙"""
+        conv = self.conversation_config
+        pairs = build_pairs([worker.name for worker in self.worker_agents], conv.topology, conv.hub, conv.neighbors, conv.seed)
+        jobs = []
+        for i, j in pairs:
+            asker, partner = self.worker_agents[i], self.worker_agents[j]
+            question_index = None
+            for conv_type in conv.types:
+                if conv_type == "answer":
+                    # 回答は質問された側が、対応する質問を受け取ってから行う
+                    jobs.append((partner, asker, conv_type, question_index))
+                else:
+                    if conv_type == "question":
+                        question_index = len(jobs)
+                    jobs.append((asker, partner, conv_type, None))
+        return jobs
+    
+    async def _run_worker_conversations(
+        self,
+        target_info: Dict[str, Any],
+        view: "_PipelineView",
+        evaluated: Dict[str, asyncio.Event],
+        live: Live
+    ):
+        """Workerエージェント間の会話を実行（両者の評価が揃った組から、同時実行数を制限して並行実行）"""
+        # トポロジーに従って会話ジョブを決定的な順序で列挙（自分自身とは会話しない）
+        jobs = view.jobs
+        conv = self.conversation_config
+        self.conversation_plan = {
+            "topology": conv.topology,
+            "conversation_types": conv.types,
+            "hub": conv.hub if conv.topology == "star" else None,
+            "neighbors": conv.neighbors if conv.topology == "random-k" else None,
+            "seed": conv.seed if conv.topology == "random-k" else None,
+            "conversation_calls": len(jobs),
+            "all_pairs_calls": len(self.worker_agents) * (len(self.worker_agents) - 1) * len(CONVERSATION_TYPES),
+            "conditioned_answers": sum(1 for job in jobs if job[3] is not None)
+        }
+        self.console.print(
+            f"[dim]会話トポロジー: {conv.topology} / 会話タイプ: {', '.join(conv.types)} / 会話数: {len(jobs)}[/dim]"
+        )
+        
+        # 会話は完了順にストアへ追加し、ジョブ番号→レコード番号で参照する
+        store = self.worker_conversations
+        record_ids: List[Optional[int]] = [None] * len(jobs)
+        # 回答ジョブは対応する質問の完了を待つ
+        question_done = {job[3]: asyncio.Event() for job in jobs if job[3] is not None}
+        completed = self.journal.completed_conversations() if self.journal else {}
+        if completed:
+            self.console.print(f"[dim]記録済みの会話を再利用: {len(completed)}件[/dim]")
+        switches_at_start = self.ollama_client.run_counts(self.run_tag).model_switches
+        in_flight = view.in_flight
+        task = view.progress.add_task("Worker間会話...", total=len(jobs))
+        
+        async def run_job(index: int, in_reply_to: Optional[str]) -> WorkerConversation:
+            worker1, worker2, conv_type, _ = jobs[index]
+            tokens = in_flight.setdefault(index, [])
             
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            def on_token(token: str):
+                tokens.append(token)
             
-            worker_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    console.print(f"[red]Worker {self.worker_agents[i].name} でエラー: {result}[/red]")
-                else:
-                    worker_results.append(result)
-                progress.advance(task)
-        
-        return worker_results
-    
-    async def _run_worker_conversations(self, target_info: Dict[str, Any]):
-        """Workerエージェント間の会話を実行"""
-        conversation_types = ["question", "answer", "collaboration", "dispute"]
-        
-        # 各Workerペアで会話を実行
-        for i, worker1 in enumerate(self.worker_agents):
-            for j, worker2 in enumerate(self.worker_agents):
-                if i != j:  # 自分自身とは会話しない
-                    for conv_type in conversation_types:
-                        try:
-                            conversation = await worker1.communicate_with_worker(
-                                worker2, target_info, conv_type
-                            )
-                            self.worker_conversations.append(conversation)
-                            
-                            # 会話をリアルタイムで表示
-                            self._display_conversation(conversation)
-                            
-                            # 会話間の短い待機
-                            await asyncio.sleep(1)
-                            
-                        except Exception as e:
-                            console.print(f"[red]会話エラー ({worker1.name} → {worker2.name}): {e}[/red]")
+            try:
+                return await worker1.communicate_with_worker(
+                    worker2, target_info, conv_type, on_token if self.stream else None, in_reply_to
+                )
+            finally:
+                in_flight.pop(index, None)
+        
+        async def schedule(index: int):
+            worker1, worker2, conv_type, question_index = jobs[index]
+            try:
+                if (worker1.name, worker2.name, conv_type) in completed:
+                    conversation = completed[(worker1.name, worker2.name, conv_type)]
+                    record_ids[index] = store.append(conversation)
+                    if self.report_stream is not None:
+                        self.report_stream.record_conversation(conversation, index)
+                    return
+                
+                # スロットを確保する前に待つ（先行するジョブの実行を妨げない）
+                await evaluated[worker1.name].wait()
+                await evaluated[worker2.name].wait()
+                in_reply_to = None
+                if question_index is not None:
+                    await question_done[question_index].wait()
+                    if record_ids[question_index] is not None:
+                        question = store[record_ids[question_index]]
+                        if not question.error:
+                            in_reply_to = question.message
+                
+                conversation = await self.scheduler.run(worker1.model, lambda: run_job(index, in_reply_to))
+                record_ids[index] = store.append(conversation)
+                if self.journal is not None:
+                    self.journal.record_conversation(conversation)
+                if self.report_stream is not None:
+                    self.report_stream.record_conversation(conversation, index)
+                # 完了した会話をリアルタイムで表示
+                if not self.console.quiet:
+                    live.console.print(self._render_conversation(
+                        conversation.from_agent, conversation.to_agent,
+                        conversation.conversation_type, conversation.message
+                    ))
+            except Exception as e:
+                live.console.print(f"[red]会話エラー ({worker1.name} → {worker2.name}): {e}[/red]")
+            finally:
+                view.progress.advance(task)
+                if index in question_done:
+                    question_done[index].set()
+        
+        if self.dispatch_mode == "model_affinity":
+            # モデルごとにキューをまとめ、ロード済みのモデルで処理し切ってから次へ移る
+            groups = self._dispatch_groups(jobs)
+            last_position = {model: position for position, (model, _) in enumerate(groups)}
+            for position, (model, indices) in enumerate(groups):
+                await asyncio.gather(*(schedule(index) for index in indices))
+                # 以降使わないモデル（BOSSが使うモデルを除く）はメモリから解放して次のモデルのロードに備える
+                # （バッチ評価で並行する他の対象がまだ使用中なら、最後に使い終えた対象が解放する）
+                if model != self.boss_agent.model and last_position[model] == position:
+                    self.held_models.discard(model)
+                    if not self.ollama_client.release_model(model):
+                        continue
+                    try:
+                        await self.ollama_client.unload_model(model)
+                    except Exception as e:
+                        live.console.print(f"[yellow]⚠️ モデル解放に失敗 ({model}): {e}[/yellow]")
+        else:
+            await asyncio.gather(*(schedule(index) for index in range(len(jobs))))
+        view.progress.update(task, description="Worker間会話完了")
+        
+        # 計画上の切り替え回数（列挙順 vs モデル単位）と実際の切り替え回数を記録
+        affinity_order = [index for _, indices in self._dispatch_groups(jobs) for index in indices]
+        self.model_dispatch = {
+            "mode": self.dispatch_mode,
+            "conversation_calls": len(jobs),
+            "planned_switches_interleaved": self._count_model_switches([job[0].model for job in jobs]),
+            "planned_switches_model_affinity": self._count_model_switches([jobs[i][0].model for i in affinity_order]),
+            "observed_switches": self.ollama_client.run_counts(self.run_tag).model_switches - switches_at_start
+        }
+        
+        # 完了順に関わらずレポート上の順序は列挙順で固定
+        store.reorder([record_id for record_id in record_ids if record_id is not None])
+    
+    def _dispatch_groups(self, jobs: List[tuple]) -> List[tuple]:
+        """model_affinity用の実行順（モデル, ジョブ番号）。質問を待つ回答は後半にまとめてデッドロックを避ける"""
+        waves = [
+            [index for index, job in enumerate(jobs) if job[3] is None],
+            [index for index, job in enumerate(jobs) if job[3] is not None]
+        ]
+        return [
+            (model, indices)
+            for wave in waves if wave
+            for model, indices in self._group_jobs_by_model(jobs, wave).items()
+        ]
+    
+    def _group_jobs_by_model(self, jobs: List[tuple], indices: List[int]) -> Dict[str, List[int]]:
+        """会話ジョブをモデル別にまとめる（BOSSのモデルは最後にしてBOSS評価まで常駐させる）"""
+        groups: Dict[str, List[int]] = {}
+        for index in indices:
+            groups.setdefault(jobs[index][0].model, []).append(index)
+        
+        if self.boss_agent.model in groups:
+            groups[self.boss_agent.model] = groups.pop(self.boss_agent.model)
+        return groups
+    
+    @staticmethod
+    def _count_model_switches(models: List[str]) -> int:
+        """モデル列の切り替え回数を数える"""
+        return sum(1 for prev, curr in zip(models, models[1:]) if prev != curr)
+    
+    def _render_in_flight(self, jobs: List[tuple], in_flight: Dict[int, List[str]]):
+        """実行中の会話を受信途中の内容とともに表示"""
+        if not in_flight:
+            return Panel("待機中...", title="Worker会話 実行中: 0件", border_style="dim")
+        
+        panels = []
+        # 描画はLiveの更新スレッドから呼ばれるため、スナップショットを取ってから走査する
+        for index, tokens in sorted(list(in_flight.items())):
+            worker1, worker2, conv_type, _ = jobs[index]
+            message = "".join(list(tokens))[-300:] or "..."
+            panels.append(self._render_conversation(worker1.name, worker2.name, conv_type, message))
+        return Group(
+            Text(f"Worker会話 実行中: {len(in_flight)}件 / 全{len(jobs)}件", style="bold cyan"),
+            *panels
+        )
     
     def _display_conversation(self, conversation: WorkerConversation):
         """会話を表示"""
+        self.console.print(self._render_conversation(
+            conversation.from_agent, conversation.to_agent, conversation.conversation_type, conversation.message
+        ))
+    
+    def _render_conversation(self, from_agent: str, to_agent: str, conversation_type: str, message: str) -> Panel:
+        """会話パネルを作成"""
         conv_type_icons = {
             "question": "❓",
             "answer": "💬",
@@ -124,7 +516,7 @@ class MultiAgentSystem:
             "dispute": "⚖️"
         }
         
-        icon = conv_type_icons.get(conversation.conversation_type, "💬")
+        icon = conv_type_icons.get(conversation_type, "💬")
         conv_type_names = {
             "question": "質問",
             "answer": "回答",
@@ -132,35 +524,74 @@ class MultiAgentSystem:
             "dispute": "議論"
         }
         
-        conv_type_name = conv_type_names.get(conversation.conversation_type, "会話")
+        conv_type_name = conv_type_names.get(conversation_type, "会話")
         
-        console.print(Panel(
-            f"[bold]{conversation.from_agent}[/bold] → [bold]{conversation.to_agent}[/bold]\n"
+        return Panel(
+            f"[bold]{from_agent}[/bold] → [bold]{to_agent}[/bold]\n"
             f"[yellow]{conv_type_name}[/yellow] {icon}\n\n"
-            f"{conversation.message}",
-            title=f"Worker会話: {conversation.from_agent} → {conversation.to_agent}",
+            f"{message}",
+            title=f"Worker会話: {from_agent} → {to_agent}",
             border_style="cyan"
-        ))
+        )
     
-    async def _run_boss_evaluation(self, worker_results: List[AgentResult], target_info: Dict[str, Any]) -> BossResult:
+    async def _run_boss_evaluation(
+        self,
+        worker_results: List[AgentResult],
+        target_info: Dict[str, Any],
+        view: "_PipelineView"
+    ) -> BossResult:
         """BOSSエージェントによる統合評価を実行"""
+        task = view.progress.add_task("BOSSエージェント統合評価中...", total=1)
+        if self.journal is not None:
+            recorded = self.journal.completed_boss_result()
+            if recorded is not None:
+                self.console.print("[dim]記録済みのBOSS評価を再利用[/dim]")
+                if self.report_stream is not None:
+                    self.report_stream.record_boss_result(recorded)
+                view.progress.update(task, completed=1, description="BOSSエージェント統合評価完了")
+                return recorded
+        
+        def on_token(token: str):
+            view.boss_tokens.append(token)
+        
         try:
-            boss_result = await self.boss_agent.evaluate_workers(worker_results, target_info)
+            boss_result = await self.boss_agent.evaluate_workers(
+                worker_results, target_info, on_token if self.stream else None
+            )
+            if self.journal is not None:
+                self.journal.record_boss_result(boss_result)
+            if self.report_stream is not None:
+                self.report_stream.record_boss_result(boss_result)
             return boss_result
         except Exception as e:
-            console.print(f"[red]BOSSエージェントでエラー: {e}[/red]")
+            self.console.print(f"[red]BOSSエージェントでエラー: {e}[/red]")
             return None
+        finally:
+            view.boss_tokens.clear()
+            view.progress.update(task, completed=1, description="BOSSエージェント統合評価完了")
+    
+    def _render_pipeline(self, view: "_PipelineView"):
+        """パイプライン全体の進捗と、生成途中のBOSS評価・実行中の会話を描画"""
+        parts = [view.progress]
+        # 描画はLiveの更新スレッドから呼ばれるため、スナップショットを取ってから走査する
+        boss_text = "".join(list(view.boss_tokens))
+        if boss_text:
+            parts.append(Panel(boss_text[-1500:], title="BOSS評価生成中", border_style="yellow"))
+        if view.in_flight:
+            parts.append(self._render_in_flight(view.jobs, view.in_flight))
+        return Group(*parts)
     
     def display_conversation_summary(self):
         """会話サマリーを表示"""
         if not self.worker_conversations:
-            console.print("[yellow]Worker間の会話はありません[/yellow]")
+            self.console.print("[yellow]Worker間の会話はありません[/yellow]")
             return
         
-        console.print(Panel.fit(
+        self.console.print(Panel.fit(
             f"[bold]Worker会話サマリー[/bold]\n"
             f"総会話数: {len(self.worker_conversations)}\n"
-            f"参加Worker: {len(self.worker_agents)}名",
+            f"参加Worker: {len(self.worker_agents)}名\n"
+            f"トポロジー: {self.conversation_config.topology}",
             title="会話統計",
             border_style="green"
         ))
@@ -180,104 +611,120 @@ class MultiAgentSystem:
         
         for conv_type, count in conv_type_counts.items():
             name = conv_type_names.get(conv_type, conv_type)
-            console.print(f"• {name}: {count}回")
-    
-    def generate_report(self) -> Dict[str, Any]:
-        """評価結果から統合レポートを生成"""
-        if not self.boss_result:
-            return {"error": "BOSS評価結果がありません"}
+            self.console.print(f"• {name}: {count}回")
         
-        # Worker結果の分類
-        high_priority_workers = []
-        medium_priority_workers = []
-        low_priority_workers = []
+        if self.model_dispatch:
+            self.console.print(
+                f"• モデル切り替え: {self.model_dispatch['observed_switches']}回 "
+                f"(ディスパッチ方式: {self.model_dispatch['mode']})"
+            )
+    
+    def _project_structure(self) -> Dict[str, Any]:
+        return {
+            "boss_agent": self.boss_agent.name,
+            "worker_agents": [worker.name for worker in self.worker_agents],
+            "total_agents": len(self.worker_agents) + 1
+        }
+    
+    def _structured_output_stats(self) -> Dict[str, Any]:
+        """構造化出力モードでJSONとして検証できた応答数と、テキスト解析にフォールバックした応答数"""
+        results = [r for r in self.worker_results if not r.error]
+        if self.boss_result is not None and not self.boss_result.error:
+            results.append(self.boss_result)
+        return {
+            "enabled": self.ollama_client.config.structured_output,
+            "validated": sum(1 for r in results if r.parse_mode == "structured"),
+            "fallback": sum(1 for r in results if r.parse_mode == "fallback")
+        }
+    
+    async def _lookup_past_findings(self, target_info: Dict[str, Any]) -> Dict[str, List[str]]:
+        """Workerごとに、役割と対象の概要に類似した同じWorkerの過去の指摘を検索（失敗しても評価は続ける）"""
+        findings_config = self.findings_config
+        try:
+            index = FindingIndex(findings_config.index_dir)
+            if index.count == 0:
+                self.console.print(f"[yellow]⚠️ 過去の指摘のインデックスが空です（{findings_config.index_dir}）。index-findingsで作成してください[/yellow]")
+                return {}
+            matches = await search_findings(
+                index,
+                make_embedder(findings_config, self.ollama_client),
+                [f"{worker.role}\n{target_info.get('description', '')}" for worker in self.worker_agents],
+                findings_config.enrich_top_k,
+                agents=[worker.name for worker in self.worker_agents],
+                min_score=findings_config.enrich_min_score
+            )
+        except Exception as e:
+            self.console.print(f"[yellow]⚠️ 過去の指摘を検索できませんでした: {e}[/yellow]")
+            return {}
         
-        high_risk_workers = []
-        medium_risk_workers = []
-        low_risk_workers = []
+        self.past_findings = {
+            worker.name: [
+                {"text": match["text"], "report": match["report"], "risk_level": match["risk_level"], "score": match["score"]}
+                for match in worker_matches
+            ]
+            for worker, worker_matches in zip(self.worker_agents, matches)
+            if worker_matches
+        }
+        return {
+            name: [f"{compact_finding(match['text'])}（{match['report']}、リスクレベル: {match['risk_level']}）" for match in matches]
+            for name, matches in self.past_findings.items()
+        }
+    
+    def _run_stats(self) -> Dict[str, Any]:
+        """実行時の計測値（所要時間・レイテンシ・推論メトリクス・ディスパッチ・エンドポイント・キャッシュ）
         
-        for result in self.worker_results:
-            if result.priority == "高":
-                high_priority_workers.append(result)
-            elif result.priority == "中":
-                medium_priority_workers.append(result)
-            else:
-                low_priority_workers.append(result)
-            
-            if result.risk_level == "高":
-                high_risk_workers.append(result)
-            elif result.risk_level == "中":
-                medium_risk_workers.append(result)
-            else:
-                low_risk_workers.append(result)
-        
-        report = {
-            "timestamp": datetime.now().isoformat(),
-            "project_structure": {
-                "boss_agent": self.boss_agent.name,
-                "worker_agents": [worker.name for worker in self.worker_agents],
-                "total_agents": len(self.worker_agents) + 1
+        呼び出し単位の計測値はこの評価（run_tag）の分だけを集計する。エンドポイントの状態・total_requests、
+        observed_switches_total、キャッシュはクライアント全体の値（バッチ評価では全対象の合計）。
+        """
+        call_stats = self.ollama_client.run_call_stats(self.run_tag)
+        endpoint_requests = self.ollama_client.run_counts(self.run_tag).endpoint_requests
+        return {
+            "phase_timings": self.phase_timings,
+            "latency": self.ollama_client.latency_summary(self.run_tag),
+            "inference_metrics": summarize_inference(call_stats),
+            "conversation_plan": self.conversation_plan,
+            "model_warmup": self.model_warmup,
+            "past_findings": {
+                "enabled": self.findings_config.enrich_prompts,
+                "findings": self.past_findings
             },
-            "boss_evaluation": {
-                "agent_name": self.boss_result.agent_name,
-                "role": self.boss_result.role,
-                "overall_evaluation": self.boss_result.overall_evaluation,
-                "final_decision": self.boss_result.final_decision,
-                "risk_analysis": self.boss_result.risk_analysis,
-                "improvement_roadmap": self.boss_result.improvement_roadmap
+            "structured_output": self._structured_output_stats(),
+            "token_budgets": {
+                "enabled": self.ollama_client.config.enforce_token_budgets,
+                "calls": token_budget_calls(call_stats)
             },
-            "worker_summary": {
-                "total_workers": len(self.worker_results),
-                "high_priority_issues": len(high_priority_workers),
-                "medium_priority_issues": len(medium_priority_workers),
-                "low_priority_issues": len(low_priority_workers),
-                "high_risk_issues": len(high_risk_workers),
-                "medium_risk_issues": len(medium_risk_workers),
-                "low_risk_issues": len(low_risk_workers)
+            "model_dispatch": {
+                **self.model_dispatch,
+                "observed_switches_total": self.ollama_client.model_switches
             },
-            "worker_results": [
-                {
-                    "name": result.agent_name,
-                    "role": result.role,
-                    "evaluation": result.evaluation,
-                    "recommendations": result.recommendations,
-                    "risk_level": result.risk_level,
-                    "priority": result.priority
-                }
-                for result in self.worker_results
+            "endpoints": [
+                {**endpoint, "run_requests": endpoint_requests.get(endpoint["url"], 0)}
+                for endpoint in self.ollama_client.pool.summary()
             ],
-            "worker_conversations": [
-                {
-                    "from_agent": conv.from_agent,
-                    "to_agent": conv.to_agent,
-                    "message": conv.message,
-                    "timestamp": conv.timestamp,
-                    "conversation_type": conv.conversation_type
-                }
-                for conv in self.worker_conversations
-            ],
-            "issues_by_priority": {
-                "high": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in high_priority_workers],
-                "medium": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in medium_priority_workers],
-                "low": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in low_priority_workers]
-            },
-            "issues_by_risk": {
-                "high": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in high_risk_workers],
-                "medium": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in medium_risk_workers],
-                "low": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in low_risk_workers]
-            }
+            "cache": self.ollama_client.cache.stats() if self.ollama_client.cache else {"mode": "off"}
         }
+    
+    def generate_report(self) -> Dict[str, Any]:
+        """評価結果から統合レポートを生成"""
+        if not self.boss_result:
+            return {"error": "BOSS評価結果がありません"}
         
-        return report
+        return build_report(
+            self._project_structure(),
+            self.boss_result,
+            self.worker_results,
+            self.worker_conversations,
+            self._run_stats()
+        )
     
     def display_results(self):
         """結果をリッチな形式で表示"""
         if not self.boss_result:
-            console.print("[red]表示する結果がありません[/red]")
+            self.console.print("[red]表示する結果がありません[/red]")
             return
         
         # BOSS結果の表示
-        console.print(Panel.fit(
+        self.console.print(Panel.fit(
             f"[bold]👑 BOSS評価結果[/bold]\n\n"
             f"[bold]統合評価:[/bold]\n{self.boss_result.overall_evaluation}\n\n"
             f"[bold]最終判定:[/bold] {self.boss_result.final_decision}\n"
@@ -287,6 +734,15 @@ class MultiAgentSystem:
             border_style="yellow"
         ))
         
+        compression = self.boss_result.prompt_compression
+        if compression and compression["compressed"]:
+            self.console.print(
+                f"[dim]BOSSプロンプトのWorker結果を圧縮: 推定 {compression['estimated_tokens_before']} → "
+                f"{compression['estimated_tokens_after']} トークン（上限 {compression['budget']}、"
+                f"省略した文 {compression['dropped_sentences']}件・推奨事項 {compression['dropped_recommendations']}件、"
+                f"重複した推奨事項 {compression['duplicate_recommendations']}件）[/dim]"
+            )
+        
         # Worker結果のサマリーテーブル
         if self.worker_results:
             summary_table = Table(title="Workerエージェント評価サマリー")
@@ -306,11 +762,11 @@ class MultiAgentSystem:
                     f"[{priority_color}]{result.priority}[/{priority_color}]"
                 )
             
-            console.print(summary_table)
+            self.console.print(summary_table)
             
             # Worker詳細結果
             for result in self.worker_results:
-                console.print(Panel(
+                self.console.print(Panel(
                     f"[bold]{result.agent_name}[/bold] - {result.role}\n\n"
                     f"[bold]評価結果:[/bold]\n{result.evaluation}\n\n"
                     f"[bold]推奨事項:[/bold]\n" + "\n".join([f"• {rec}" for rec in result.recommendations]),
@@ -318,8 +774,110 @@ class MultiAgentSystem:
                     border_style="blue"
                 ))
         
+        self.display_recommendation_clusters()
+        
         # 会話サマリーの表示
         self.display_conversation_summary()
+        
+        # 推論メトリクスの表示
+        self.display_inference_metrics()
+    
+    def display_recommendation_clusters(self, limit: int = 10):
+        """複数のWorkerがほぼ同じ内容を挙げた推奨事項を、リスクの高い順に表示"""
+        shared = [cluster for cluster in cluster_recommendations(self.worker_results) if len(cluster.agents) > 1]
+        if not shared:
+            return
+        
+        table = Table(title="複数のWorkerに共通する推奨事項")
+        table.add_column("推奨事項", style="cyan")
+        table.add_column("Worker", style="magenta")
+        table.add_column("リスクレベル", style="red")
+        table.add_column("件数", justify="right")
+        for cluster in shared[:limit]:
+            table.add_row(cluster.representative, "\n".join(cluster.agents), cluster.risk_level, str(cluster.count))
+        self.console.print(table)
+        if len(shared) > limit:
+            self.console.print(f"[dim]ほか{len(shared) - limit}件（レポートの recommendation_clusters を参照）[/dim]")
+    
+    def display_inference_metrics(self):
+        """エージェントごとの生成速度・プロンプト評価コストを表示"""
+        metrics = summarize_inference(self.ollama_client.run_call_stats(self.run_tag))
+        if not metrics["by_agent"]:
+            return
+        
+        table = Table(title="推論メトリクス（エージェント別）")
+        table.add_column("エージェント", style="cyan")
+        table.add_column("呼び出し", justify="right")
+        table.add_column("生成トークン", justify="right")
+        table.add_column("tokens/s", justify="right", style="green")
+        table.add_column("プロンプトトークン", justify="right")
+        table.add_column("プロンプト評価(秒)", justify="right", style="yellow")
+        table.add_column("ロード(秒)", justify="right")
+        
+        for name, bucket in list(metrics["by_agent"].items()) + [("合計", metrics["total"])]:
+            table.add_row(
+                name,
+                f"{bucket['calls']}" + (f" ({bucket['cached_calls']}件キャッシュ)" if bucket["cached_calls"] else ""),
+                str(bucket["eval_tokens"]),
+                str(bucket["tokens_per_second"] or "-"),
+                str(bucket["prompt_eval_tokens"]),
+                str(bucket["prompt_eval_seconds"]),
+                str(bucket["load_seconds"])
+            )
+        self.console.print(table)
+        self._display_token_budgets(metrics)
+        
+        for endpoint in self.ollama_client.pool.summary():
+            concurrency = endpoint["concurrency"]
+            if concurrency:
+                self.console.print(
+                    f"同時実行数の上限（{endpoint['url']}）: 現在 {concurrency['limit']} "
+                    f"（範囲 {concurrency['min_limit_seen']}〜{concurrency['max_limit_seen']}、減少 {concurrency['decreases']}回）"
+                )
+        
+        prefix_reuse = metrics["prefix_reuse"]
+        if prefix_reuse["reused_calls"]:
+            self.console.print(
+                f"プレフィックス再利用: {prefix_reuse['reused_calls']}回の呼び出しで"
+                f"プロンプト評価を推定 {prefix_reuse['estimated_prompt_eval_tokens_saved']} トークン削減"
+                f"（プレフィックスのトークン数×呼び出し数。プライミング {prefix_reuse['priming_prompt_tokens']} トークン、"
+                f"推定正味 {prefix_reuse['estimated_net_prompt_eval_tokens_saved']} トークン、"
+                f"再利用した呼び出しで評価 {prefix_reuse['reused_prompt_eval_tokens']} トークン）"
+            )
+    
+    def _display_token_budgets(self, metrics: Dict[str, Any]):
+        """フェーズ・会話タイプごとの生成トークン数と上限の比較を表示"""
+        buckets = [
+            (name, bucket) for name, bucket in list(metrics["by_phase"].items()) + list(metrics["by_conversation_type"].items())
+            if bucket["budgeted_calls"] and name != "conversation"
+        ]
+        if not buckets:
+            return
+        
+        table = Table(title="生成トークン数と上限（フェーズ別）")
+        table.add_column("フェーズ", style="cyan")
+        table.add_column("呼び出し", justify="right")
+        table.add_column("生成トークン", justify="right")
+        table.add_column("上限（合計）", justify="right")
+        table.add_column("使用率", justify="right", style="green")
+        table.add_column("上限到達", justify="right", style="red")
+        for name, bucket in buckets + [("合計", metrics["total"])]:
+            table.add_row(
+                name,
+                str(bucket["budgeted_calls"]),
+                str(bucket["budgeted_eval_tokens"]),
+                str(bucket["token_budget"]),
+                f"{bucket['budget_utilization']:.0%}" if bucket["budget_utilization"] is not None else "-",
+                str(bucket["budget_exhausted_calls"])
+            )
+        self.console.print(table)
+    
+    def save_metrics(self, filename: str):
+        """呼び出しごとの推論メトリクスをPrometheusのテキスト形式で保存"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(to_prometheus(self.ollama_client.run_call_stats(self.run_tag)))
+        self.console.print(f"[green]メトリクスを保存しました: {filename}[/green]")
+        return filename
     
     def save_report(self, filename: str = None):
         """レポートをJSONファイルに保存"""
@@ -332,5 +890,5 @@ class MultiAgentSystem:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(report, f, ensure_ascii=False, indent=2)
         
-        console.print(f"[green]レポートを保存しました: {filename}[/green]")
+        self.console.print(f"[green]レポートを保存しました: {filename}[/green]")
         return filename 
\ No newline at end of file
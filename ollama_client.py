@@ -1,75 +1,690 @@
 import aiohttp
 import asyncio
 import json
-from typing import Dict, Any, Optional
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 from config import OllamaConfig
+from response_cache import ResponseCache
+from endpoint_pool import EndpointPool, Endpoint, AIMDLimiter, CircuitOpenError
+from ollama_errors import (
+    OllamaError,
+    OllamaConnectionError,
+    OllamaTimeoutError,
+    OllamaServerError,
+    OllamaRequestError,
+    OllamaUnavailableError,
+    OllamaModelNotFoundError,
+    status_error
+)
+
+# 実行中の評価の識別子（タスクは作成時のコンテキストを引き継ぐため、並行する評価の呼び出しを区別できる）
+current_run: ContextVar[Optional[str]] = ContextVar("current_run", default=None)
+
+# Ollamaが返すタイミング情報（durationはナノ秒）
+TIMING_FIELDS = ("eval_count", "eval_duration", "prompt_eval_count", "prompt_eval_duration", "load_duration", "total_duration")
+
+@dataclass
+class GenerationStats:
+    model: str
+    streamed: bool
+    first_token_latency: Optional[float]  # 秒（非ストリーミング時はNone）
+    total_time: float  # 秒
+    cached: bool = False
+    # 呼び出し元のタグ
+    agent: Optional[str] = None
+    phase: Optional[str] = None  # "worker_evaluation" / "conversation" / "boss_evaluation"
+    conversation_type: Optional[str] = None
+    prefix_tokens_reused: int = 0  # contextで再利用したプレフィックスのトークン数
+    token_budget: Optional[int] = None  # 生成トークン数の上限（num_predict）
+    done_reason: Optional[str] = None  # "stop"（停止シーケンス・自然終了）/ "length"（上限に到達）
+    run: Optional[str] = field(default_factory=current_run.get)  # 呼び出し元の評価（current_run）
+    # Ollamaのタイミング情報（キャッシュヒット時はNone）
+    eval_count: Optional[int] = None
+    eval_duration: Optional[int] = None
+    prompt_eval_count: Optional[int] = None
+    prompt_eval_duration: Optional[int] = None
+    load_duration: Optional[int] = None
+    total_duration: Optional[int] = None
+
+@dataclass
+class RunCounters:
+    """評価（current_run）ごとの再試行・ヘッジ・モデル切り替え・エンドポイント別リクエスト数"""
+    retries: int = 0
+    hedged_requests: int = 0
+    hedge_wins: int = 0
+    model_switches: int = 0  # この評価の呼び出し順で、直前と異なるモデルを呼び出した回数
+    last_model: Optional[str] = None
+    endpoint_requests: Dict[str, int] = field(default_factory=dict)
 
 class OllamaClient:
     def __init__(self, config: OllamaConfig):
         self.config = config
         self.base_url = config.base_url
-        self.timeout = aiohttp.ClientTimeout(total=config.timeout)
+        # 接続確立と生成待ちのタイムアウトを分離（長い生成でも全体時間で打ち切らない）
+        self.timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=config.connect_timeout,
+            sock_read=config.timeout
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.pool = EndpointPool(
+            config.endpoints or [config.base_url],
+            config.health_check_interval,
+            config.circuit_failure_threshold,
+            config.circuit_reset_timeout
+        )
+        if config.adaptive_concurrency:
+            for endpoint in self.pool.endpoints:
+                endpoint.limiter = AIMDLimiter(
+                    initial_limit=config.adaptive_initial_limit,
+                    min_limit=config.adaptive_min_limit,
+                    max_limit=config.adaptive_max_limit,
+                    tolerance=config.adaptive_latency_tolerance,
+                    backoff=config.adaptive_backoff,
+                    load_threshold=config.adaptive_load_threshold
+                )
+        self.retry_count = 0
+        self.hedged_requests = 0  # 追加リクエストを発行した回数
+        self.hedge_wins = 0  # 追加リクエストの方が先に完了した回数
+        self.call_stats: List[GenerationStats] = []
+        self.model_switches = 0  # 直前のリクエストと異なるモデルを呼び出した回数
+        self._last_model: Optional[str] = None
+        self.run_counters: Dict[Optional[str], RunCounters] = {}
+        # モデル -> そのモデルを使用中の評価の数（バッチ評価で他の対象が使用中のモデルを解放しないため）
+        self.model_holds: Dict[str, int] = {}
+        self.cache: Optional[ResponseCache] = None
+        if config.cache_mode != "off":
+            self.cache = ResponseCache(
+                config.cache_path,
+                mode=config.cache_mode,
+                max_size_mb=config.cache_max_size_mb,
+                max_age_days=config.cache_max_age_days
+            )
+    
+    async def __aenter__(self) -> "OllamaClient":
+        await self._get_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """共有セッションを取得（未作成・クローズ済みなら作成）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.max_connections,
+                limit_per_host=self.config.max_connections_per_host,
+                keepalive_timeout=self.config.keepalive_timeout,
+                ttl_dns_cache=self.config.dns_cache_ttl
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+    
+    async def close(self):
+        """共有セッションとキャッシュをクローズ"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
     
     async def check_models(self) -> Dict[str, Any]:
-        """利用可能なモデル一覧を取得"""
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            try:
-                async with session.get(f"{self.base_url}/api/tags") as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        raise Exception(f"Failed to get models: {response.status}")
-            except Exception as e:
-                raise Exception(f"Error connecting to Ollama: {e}")
+        """全エンドポイントの死活とモデル一覧を確認し、利用可能なモデル一覧を取得"""
+        session = await self._get_session()
+        await self.pool.refresh(session)
+        if not any(endpoint.healthy for endpoint in self.pool.endpoints):
+            errors = "; ".join(f"{e.url}: {e.last_error}" for e in self.pool.endpoints)
+            raise OllamaConnectionError(f"Error connecting to Ollama: {errors}")
+        return {"models": self.pool.available_models()}
     
-    async def generate_response(
-        self, 
-        model: str, 
-        prompt: str, 
-        system_prompt: Optional[str] = None,
-        temperature: float = 0.7,
-        max_tokens: Optional[int] = None
-    ) -> str:
-        """Ollamaモデルにプロンプトを送信してレスポンスを取得"""
+    def _build_payload(
+        self,
+        model: str,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_tokens: Optional[int],
+        stream: bool,
+        context: Optional[List[int]] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        stop: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """/api/generate 用のリクエストボディを作成（contextがある場合はシステムプロンプトを含めない）"""
         payload = {
             "model": model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": temperature
             }
         }
         
-        if system_prompt:
+        if context:
+            # システムプロンプトは評価済みのcontextに含まれている
+            payload["context"] = context
+        elif system_prompt:
             payload["system"] = system_prompt
         
+        if response_format is not None:
+            # JSONスキーマに従った出力に制約する
+            payload["format"] = response_format
+        
         if max_tokens:
             payload["options"]["num_predict"] = max_tokens
         
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
+        if stop:
+            payload["options"]["stop"] = stop
+        
+        if self.config.seed is not None:
+            payload["options"]["seed"] = self.config.seed
+        
+        if self.config.keep_alive:
+            payload["keep_alive"] = self.config.keep_alive
+        
+        return payload
+    
+    def _lookup_cache(self, payload: Dict[str, Any], tags: Optional[Dict[str, Any]]):
+        """キャッシュキーを作成し、ヒットした場合はレスポンスを返す"""
+        if self.cache is None:
+            return None, None
+        cache_key = ResponseCache.make_key(payload)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.call_stats.append(GenerationStats(
+                model=payload["model"],
+                streamed=payload["stream"],
+                first_token_latency=None,
+                total_time=0.0,
+                cached=True,
+                token_budget=payload["options"].get("num_predict"),
+                **(tags or {})
+            ))
+        return cache_key, cached
+    
+    def _counters(self) -> RunCounters:
+        """現在の評価の計数（評価の外からの呼び出しはNoneにまとめる）"""
+        run = current_run.get()
+        if run not in self.run_counters:
+            self.run_counters[run] = RunCounters()
+        return self.run_counters[run]
+    
+    def _record_model(self, model: str):
+        """モデル切り替え回数を記録（クライアント全体と評価ごと）"""
+        if self._last_model is not None and self._last_model != model:
+            self.model_switches += 1
+        self._last_model = model
+        counters = self._counters()
+        if counters.last_model is not None and counters.last_model != model:
+            counters.model_switches += 1
+        counters.last_model = model
+    
+    def _record_checkout(self, endpoint: Endpoint):
+        requests = self._counters().endpoint_requests
+        requests[endpoint.url] = requests.get(endpoint.url, 0) + 1
+    
+    async def _backoff(self, attempt: int):
+        """ジッター付き指数バックオフで待機"""
+        self.retry_count += 1
+        self._counters().retries += 1
+        delay = min(self.config.retry_max_delay, self.config.retry_base_delay * (2 ** attempt))
+        await asyncio.sleep(random.uniform(0, delay))
+    
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        """同モデルの過去の応答時間のp95（サンプル不足ならNone）"""
+        samples = sorted(
+            s.total_time for s in self.call_stats
+            # プレフィックスのプライミング（数トークンしか生成しない）は応答が短く、p95を押し下げるため除く
+            if s.model == model and not s.cached and not s.streamed and s.phase != "prefix"
+        )
+        if len(samples) < self.config.hedge_min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    
+    async def generate_response(
+        self, 
+        model: str, 
+        prompt: str, 
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tags: Optional[Dict[str, Any]] = None,
+        context: Optional[List[int]] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        stop: Optional[List[str]] = None
+    ) -> str:
+        """Ollamaモデルにプロンプトを送信してレスポンスを取得（tagsはagent/phase/conversation_type、response_formatはJSONスキーマ、stopは停止シーケンス）"""
+        payload = self._build_payload(
+            model, prompt, system_prompt, temperature, max_tokens,
+            stream=False, context=context, response_format=response_format, stop=stop
+        )
+        cache_key, cached = self._lookup_cache(payload, tags)
+        if cached is not None:
+            return cached
+        
+        result = await self._generate_with_retry(payload, tags)
+        text = result.get("response", "")
+        if self.cache is not None:
+            self.cache.put(cache_key, text)
+        return text
+    
+    async def prime_context(
+        self,
+        model: str,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 8,
+        tags: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Optional[List[int]], int]:
+        """共通プレフィックスを一度だけ評価し、後続リクエストで再利用するcontextとそのプロンプトトークン数を取得"""
+        payload = self._build_payload(model, prompt, system_prompt, temperature, max_tokens, stream=False)
+        cache_key, cached = self._lookup_cache(payload, tags)
+        if cached is not None:
+            primed = json.loads(cached)
+            return primed["context"], primed["prompt_eval_count"]
+        
+        result = await self._generate_with_retry(payload, tags)
+        context = result.get("context")
+        prompt_eval_count = result.get("prompt_eval_count") or 0
+        if context and self.cache is not None:
+            self.cache.put(cache_key, json.dumps({"context": context, "prompt_eval_count": prompt_eval_count}))
+        return context, prompt_eval_count
+    
+    async def _generate_with_retry(self, payload: Dict[str, Any], tags: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """非ストリーミングの/api/generateをリトライ付きで実行し、呼び出し統計を記録"""
+        self._record_model(payload["model"])
+        session = await self._get_session()
+        started = time.perf_counter()
+        for attempt in range(self.config.max_retries + 1):
+            await self.pool.recheck_unhealthy(session)
+            try:
+                result = await self._generate_hedged(session, payload)
+                break
+            except OllamaError as e:
+                if not e.retryable or attempt == self.config.max_retries:
+                    raise
+                await self._backoff(attempt)
+        
+        self.call_stats.append(GenerationStats(
+            model=payload["model"],
+            streamed=False,
+            first_token_latency=None,
+            total_time=time.perf_counter() - started,
+            token_budget=payload["options"].get("num_predict"),
+            done_reason=result.get("done_reason"),
+            **(tags or {}),
+            **{field: result.get(field) for field in TIMING_FIELDS}
+        ))
+        return result
+    
+    async def _generate_hedged(self, session: aiohttp.ClientSession, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """p95を超えても応答がなければ同じリクエストを追加発行し、先に完了した方を採用"""
+        hedge_delay = self._hedge_delay(payload["model"]) if self.config.hedge_requests else None
+        if hedge_delay is None:
+            return await self._generate_once(session, payload)
+        
+        primary = asyncio.create_task(self._generate_once(session, payload))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+        
+        self.hedged_requests += 1
+        self._counters().hedged_requests += 1
+        hedge = asyncio.create_task(self._generate_once(session, payload))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                            self._counters().hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _acquire(self, endpoint: Endpoint) -> float:
+        """適応的同時実行制御の枠を確保し、リクエスト開始時刻（perf_counter）を返す"""
+        if endpoint.limiter is None:
+            return time.perf_counter()
+        try:
+            return await endpoint.limiter.acquire()
+        except asyncio.CancelledError:
+            self.pool.release(endpoint)
+            raise
+    
+    def _release(self, endpoint: Endpoint):
+        if endpoint.limiter is not None:
+            endpoint.limiter.release()
+        self.pool.release(endpoint)
+    
+    def _record_success(self, endpoint: Endpoint, started: float, elapsed: float, result: Dict[str, Any]):
+        """サーバー側の処理（ロード・プロンプト評価・生成）以外にかかった時間をキュー待ちの遅延として記録"""
+        if endpoint.limiter is None:
+            return
+        server_seconds = sum((result.get(field) or 0) for field in ("load_duration", "prompt_eval_duration", "eval_duration")) / 1e9
+        endpoint.limiter.record_success(started, max(0.0, elapsed - server_seconds), (result.get("load_duration") or 0) / 1e9)
+    
+    def _record_overload(self, endpoint: Endpoint, started: float, reason: str):
+        if endpoint.limiter is not None:
+            endpoint.limiter.record_overload(started, reason)
+    
+    async def _generate_once(self, session: aiohttp.ClientSession, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """エンドポイントを選んで非ストリーミングの/api/generateを1回実行"""
+        try:
+            endpoint = self.pool.checkout(payload["model"])
+        except CircuitOpenError as e:
+            raise OllamaUnavailableError(str(e))
+        self._record_checkout(endpoint)
+        
+        started = await self._acquire(endpoint)
+        try:
+            async with session.post(
+                f"{endpoint.url}/api/generate",
+                json=payload
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    error = status_error(response.status, error_text)
+                    if error.retryable:
+                        self.pool.mark_failure(endpoint, error)
+                        self._record_overload(endpoint, started, f"http_{response.status}")
+                    raise error
+                result = await response.json()
+            self.pool.mark_success(endpoint)
+            self._record_success(endpoint, started, time.perf_counter() - started, result)
+            return result
+        except (asyncio.TimeoutError, aiohttp.ServerTimeoutError) as e:
+            # ServerTimeoutErrorはClientErrorのサブクラスのため、先に判定する
+            self.pool.mark_failure(endpoint, e)
+            self._record_overload(endpoint, started, "timeout")
+            raise OllamaTimeoutError(f"Request timeout ({endpoint.url}): {e}")
+        except aiohttp.ClientError as e:
+            self.pool.mark_failure(endpoint, e)
+            raise OllamaConnectionError(f"Network error ({endpoint.url}): {e}")
+        finally:
+            self._release(endpoint)
+    
+    async def stream_response(
+        self,
+        model: str,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tags: Optional[Dict[str, Any]] = None,
+        context: Optional[List[int]] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        stop: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """OllamaのNDJSONストリームからトークンを逐次取得（トークン受信前の失敗のみリトライ）"""
+        payload = self._build_payload(
+            model, prompt, system_prompt, temperature, max_tokens,
+            stream=True, context=context, response_format=response_format, stop=stop
+        )
+        cache_key, cached = self._lookup_cache(payload, tags)
+        if cached is not None:
+            yield cached
+            return
+        self._record_model(model)
+        
+        session = await self._get_session()
+        started = time.perf_counter()
+        first_token_latency = None
+        tokens = []
+        final: Dict[str, Any] = {}
+        for attempt in range(self.config.max_retries + 1):
+            await self.pool.recheck_unhealthy(session)
+            try:
+                async for token in self._stream_once(session, payload, final):
+                    if first_token_latency is None:
+                        first_token_latency = time.perf_counter() - started
+                    tokens.append(token)
+                    yield token
+                break
+            except OllamaError as e:
+                if tokens or not e.retryable or attempt == self.config.max_retries:
+                    raise
+                await self._backoff(attempt)
+        
+        self.call_stats.append(GenerationStats(
+            model=model,
+            streamed=True,
+            first_token_latency=first_token_latency,
+            total_time=time.perf_counter() - started,
+            token_budget=payload["options"].get("num_predict"),
+            done_reason=final.get("done_reason"),
+            **(tags or {}),
+            **{field: final.get(field) for field in TIMING_FIELDS}
+        ))
+        if self.cache is not None:
+            self.cache.put(cache_key, "".join(tokens))
+    
+    async def _stream_once(
+        self,
+        session: aiohttp.ClientSession,
+        payload: Dict[str, Any],
+        final: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """エンドポイントを選んでストリーミングの/api/generateを1回実行（最終チャンクはfinalに格納）"""
+        try:
+            endpoint = self.pool.checkout(payload["model"])
+        except CircuitOpenError as e:
+            raise OllamaUnavailableError(str(e))
+        self._record_checkout(endpoint)
+        
+        started = await self._acquire(endpoint)
+        first_token_latency: Optional[float] = None
+        try:
+            async with session.post(
+                f"{endpoint.url}/api/generate",
+                json=payload
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    error = status_error(response.status, error_text)
+                    if error.retryable:
+                        self.pool.mark_failure(endpoint, error)
+                        self._record_overload(endpoint, started, f"http_{response.status}")
+                    raise error
+                
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise OllamaServerError(f"Generation failed: {chunk['error']}")
+                    
+                    token = chunk.get("response", "")
+                    if token:
+                        if first_token_latency is None:
+                            first_token_latency = time.perf_counter() - started
+                        yield token
+                    
+                    if chunk.get("done"):
+                        final.update(chunk)
+                        break
+            self.pool.mark_success(endpoint)
+            # ストリーミングでは最初のトークンまでの時間から遅延を求める（生成時間を含めない）
+            if first_token_latency is not None:
+                self._record_success(endpoint, started, first_token_latency, {**final, "eval_duration": 0})
+        except (asyncio.TimeoutError, aiohttp.ServerTimeoutError) as e:
+            # ServerTimeoutErrorはClientErrorのサブクラスのため、先に判定する
+            self.pool.mark_failure(endpoint, e)
+            self._record_overload(endpoint, started, "timeout")
+            raise OllamaTimeoutError(f"Request timeout ({endpoint.url}): {e}")
+        except aiohttp.ClientError as e:
+            self.pool.mark_failure(endpoint, e)
+            raise OllamaConnectionError(f"Network error ({endpoint.url}): {e}")
+        finally:
+            self._release(endpoint)
+    
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        """/api/embeddingsでテキストごとの埋め込みを取得（エンドポイントあたりの接続数の範囲で並行）"""
+        session = await self._get_session()
+        slots = asyncio.Semaphore(self.config.max_connections_per_host * len(self.pool.endpoints))
+        
+        async def embed_one(text: str) -> List[float]:
+            async with slots:
+                try:
+                    endpoint = self.pool.checkout(model)
+                except CircuitOpenError as e:
+                    raise OllamaUnavailableError(str(e))
+                
+                try:
+                    async with session.post(
+                        f"{endpoint.url}/api/embeddings",
+                        json={"model": model, "prompt": text, "keep_alive": self.config.keep_alive}
+                    ) as response:
+                        if response.status != 200:
+                            error = status_error(response.status, await response.text())
+                            if error.retryable:
+                                self.pool.mark_failure(endpoint, error)
+                            raise error
+                        result = await response.json()
+                    self.pool.mark_success(endpoint)
+                    return result["embedding"]
+                except (asyncio.TimeoutError, aiohttp.ServerTimeoutError) as e:
+                    self.pool.mark_failure(endpoint, e)
+                    raise OllamaTimeoutError(f"Request timeout ({endpoint.url}): {e}")
+                except aiohttp.ClientError as e:
+                    self.pool.mark_failure(endpoint, e)
+                    raise OllamaConnectionError(f"Network error ({endpoint.url}): {e}")
+                finally:
+                    self.pool.release(endpoint)
+        
+        return list(await asyncio.gather(*(embed_one(text) for text in texts)))
+    
+    def hold_models(self, models: List[str]):
+        """評価で使用するモデルを使用中として数える"""
+        for model in models:
+            self.model_holds[model] = self.model_holds.get(model, 0) + 1
+    
+    def release_model(self, model: str) -> bool:
+        """モデルの使用を終える。他に使用中の評価がなければTrue（解放してよい）"""
+        remaining = self.model_holds.get(model, 0) - 1
+        if remaining > 0:
+            self.model_holds[model] = remaining
+            return False
+        self.model_holds.pop(model, None)
+        return True
+    
+    async def unload_model(self, model: str):
+        """keep_alive=0のリクエストでモデルをメモリから解放（モデルを持つ全エンドポイント）"""
+        session = await self._get_session()
+        for endpoint in self.pool.endpoints_with_model(model):
             try:
                 async with session.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload
+                    f"{endpoint.url}/api/generate",
+                    json={"model": model, "keep_alive": 0}
                 ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result.get("response", "")
-                    else:
+                    if response.status != 200:
                         error_text = await response.text()
-                        raise Exception(f"Generation failed: {response.status} - {error_text}")
+                        raise Exception(f"Unload failed: {response.status} - {error_text}")
             except aiohttp.ClientError as e:
                 raise Exception(f"Network error: {e}")
-            except asyncio.TimeoutError:
-                raise Exception("Request timeout")
-            except Exception as e:
-                raise Exception(f"Unexpected error: {e}")
+    
+    async def preload_model(self, model: str, keep_alive: Optional[str] = None) -> Dict[str, Any]:
+        """プロンプトなしのリクエストでモデルをメモリに読み込み（モデルを持つ全エンドポイント）、読み込み時間を返す"""
+        session = await self._get_session()
+        keep_alive = keep_alive or self.config.preload_keep_alive or self.config.keep_alive
+        
+        async def load(endpoint) -> Tuple[float, Optional[str]]:
+            # 評価のリクエストと同じく処理中の数と同時実行数の枠に含める（ロード時間はリミッターの調整には使わない）
+            self.pool.claim(endpoint)
+            started = await self._acquire(endpoint)
+            try:
+                async with session.post(
+                    f"{endpoint.url}/api/generate",
+                    json={"model": model, "keep_alive": keep_alive}
+                ) as response:
+                    if response.status != 200:
+                        return time.perf_counter() - started, f"{response.status} - {await response.text()}"
+                    await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                return time.perf_counter() - started, str(e) or type(e).__name__
+            finally:
+                self._release(endpoint)
+            return time.perf_counter() - started, None
+        
+        endpoints = self.pool.endpoints_with_model(model)
+        loads = await asyncio.gather(*(load(endpoint) for endpoint in endpoints))
+        return {
+            "model": model,
+            "loaded": [endpoint.url for endpoint, (_, error) in zip(endpoints, loads) if not error],
+            "load_seconds": round(max((seconds for seconds, error in loads if not error), default=0.0), 3),
+            "keep_alive": keep_alive,
+            "errors": {endpoint.url: error for endpoint, (_, error) in zip(endpoints, loads) if error}
+        }
+    
+    async def warm_up(self, models: List[str], keep_alive: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """接続テスト（/api/tags）でモデルの存在を確かめてから、各モデルを並行して事前に読み込む
+        
+        存在しないモデルが1つでもあれば読み込みを始める前にOllamaModelNotFoundErrorを送出し、
+        評価の途中（や時間のかかる読み込みの後）で失敗しないようにする。
+        """
+        if not await self.test_connection():
+            raise OllamaConnectionError("Error connecting to Ollama")
+        
+        missing = [model for model in models if not self.pool.endpoints_with_model(model)]
+        if missing:
+            available = ", ".join(sorted(m["name"] for m in self.pool.available_models())) or "none"
+            raise OllamaModelNotFoundError(
+                f"Models not found on any Ollama endpoint: {', '.join(missing)} "
+                f"(available: {available}; run `ollama pull <model>` to install)"
+            )
+        loads = await asyncio.gather(*(self.preload_model(model, keep_alive) for model in models))
+        return {load["model"]: load for load in loads}
+    
+    def run_call_stats(self, run: Optional[str]) -> List[GenerationStats]:
+        """指定した評価（current_run）の呼び出しだけを取り出す"""
+        return [s for s in self.call_stats if s.run == run]
+    
+    def run_counts(self, run: Optional[str]) -> RunCounters:
+        """指定した評価の再試行・ヘッジ・モデル切り替え・エンドポイント別リクエスト数"""
+        return self.run_counters.get(run) or RunCounters()
+    
+    def latency_summary(self, run: Optional[str] = None) -> Dict[str, Any]:
+        """指定した評価の呼び出しごとのレイテンシ統計を集計"""
+        stats = self.run_call_stats(run)
+        counters = self.run_counts(run)
+        first_token = [s.first_token_latency for s in stats if s.first_token_latency is not None]
+        total = [s.total_time for s in stats if not s.cached]
+        return {
+            "total_calls": len(stats),
+            "streamed_calls": sum(1 for s in stats if s.streamed),
+            "cached_calls": sum(1 for s in stats if s.cached),
+            "avg_first_token_latency": round(sum(first_token) / len(first_token), 3) if first_token else None,
+            "max_first_token_latency": round(max(first_token), 3) if first_token else None,
+            "avg_total_time": round(sum(total) / len(total), 3) if total else None,
+            "max_total_time": round(max(total), 3) if total else None,
+            "retries": counters.retries,
+            "hedged_requests": counters.hedged_requests,
+            "hedge_wins": counters.hedge_wins
+        }
     
     async def test_connection(self) -> bool:
         """Ollamaサーバーとの接続をテスト"""
         try:
             models = await self.check_models()
-            print(f"✅ Ollama接続成功: {len(models.get('models', []))}個のモデルが利用可能")
+            healthy = sum(1 for endpoint in self.pool.endpoints if endpoint.healthy)
+            print(
+                f"✅ Ollama接続成功: {len(models.get('models', []))}個のモデルが利用可能 "
+                f"({healthy}/{len(self.pool.endpoints)}エンドポイント)"
+            )
+            for endpoint in self.pool.endpoints:
+                if not endpoint.healthy:
+                    print(f"⚠️ {endpoint.url} に接続できません: {endpoint.last_error}")
             return True
         except Exception as e:
             print(f"❌ Ollama接続失敗: {e}")
@@ -0,0 +1,34 @@
+class OllamaError(Exception):
+    """Ollama呼び出しの失敗（retryableならリトライ対象）"""
+    retryable = False
+
+class OllamaConnectionError(OllamaError):
+    """接続・通信エラー"""
+    retryable = True
+
+class OllamaTimeoutError(OllamaError):
+    """タイムアウト"""
+    retryable = True
+
+class OllamaServerError(OllamaError):
+    """5xx応答（モデルのロード失敗・過負荷など）"""
+    retryable = True
+
+class OllamaRequestError(OllamaError):
+    """4xx応答（モデル未導入・不正なリクエストなど）"""
+    retryable = False
+
+class OllamaUnavailableError(OllamaError):
+    """サーキットブレーカーにより送信を見送った"""
+    retryable = True
+
+class OllamaModelNotFoundError(OllamaRequestError):
+    """エージェントが使用するモデルがどのエンドポイントにも導入されていない"""
+    retryable = False
+
+def status_error(status: int, error_text: str, action: str = "Generation failed") -> OllamaError:
+    """HTTPステータスからエラーを分類"""
+    message = f"{action}: {status} - {error_text}"
+    if status >= 500 or status == 429:
+        return OllamaServerError(message)
+    return OllamaRequestError(message)
@@ -0,0 +1,225 @@
+import re
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from recommendation_clusters import RISK_ORDER, cluster_texts
+
+if TYPE_CHECKING:
+    from agent import AgentResult
+
+# かな・漢字・全角記号（CJK記号、ひらがな、カタカナ、CJK統合漢字・拡張A・互換漢字、全角英数・半角カナ）
+_JAPANESE = r"\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef"
+# 文字種ごとの連続部分: 日本語 / 英字 / 数字 / 改行 / その他の記号
+_RUNS = re.compile(
+    rf"([{_JAPANESE}]+)"
+    r"|([A-Za-z]+)"
+    r"|([0-9]+)"
+    r"|(\n)"
+    rf"|([^\sA-Za-z0-9{_JAPANESE}]+)"
+)
+# 文の区切り（句点・感嘆符・疑問符・改行）
+_SENTENCE = re.compile(r"[^。！？!?\n]+[。！？!?]*")
+
+def estimate_tokens(text: str) -> int:
+    """日本語を考慮したトークン数の推定（多めに見積もる）
+    
+    かな・漢字・全角記号は1文字1トークン、英字は4文字、数字は3文字ごとに1トークン、
+    改行と記号は1つ1トークンとして数え、空白は前後の語に含まれるものとして数えない。
+    """
+    tokens = 0
+    for japanese, word, number, newline, symbols in _RUNS.findall(text):
+        if japanese:
+            tokens += len(japanese)
+        elif word:
+            tokens += -(-len(word) // 4)
+        elif number:
+            tokens += -(-len(number) // 3)
+        elif newline:
+            tokens += 1
+        else:
+            tokens += len(symbols)
+    return tokens
+
+def split_sentences(text: str) -> List[str]:
+    """評価文を文単位に分割（空の文は除く）"""
+    return [sentence.strip() for sentence in _SENTENCE.findall(text) if sentence.strip()]
+
+def _render_worker(
+    result: "AgentResult",
+    evaluation: str,
+    recommendations: List[str]
+) -> str:
+    if result.error:
+        # 失敗した評価を「不明」リスクの結果として混ぜず、未評価の観点として明示する
+        return (
+            f"## {result.agent_name} ({result.role})\n"
+            f"評価: 評価に失敗したため未評価です（{result.error}）。この観点は判定根拠に含めず、リスク分析で未評価である旨を明記してください。"
+        )
+    return (
+        f"## {result.agent_name} ({result.role})\n"
+        f"評価: {evaluation}\n"
+        f"推奨事項: {', '.join(recommendations)}\n"
+        f"リスクレベル: {result.risk_level}\n"
+        f"優先度: {result.priority}"
+    )
+
+def render_worker_results(worker_results: List["AgentResult"]) -> str:
+    """Worker結果を省略せずにBOSSプロンプト用の形式で並べる"""
+    return "\n\n".join(
+        _render_worker(result, result.evaluation, result.recommendations)
+        for result in worker_results
+    )
+
+class _WorkerPlan:
+    """圧縮時に1人のWorkerについて残す文・推奨事項"""
+    
+    def __init__(self, result: "AgentResult"):
+        self.result = result
+        self.sentences = split_sentences(result.evaluation) if not result.error else []
+        self.recommendations: List[str] = []  # Worker間でほぼ同じ内容の推奨事項をまとめた後の推奨事項
+        self.also_by: Dict[int, List[str]] = {}  # 推奨事項の番号 -> 同じ指摘をした他のWorker
+        self.kept_sentences: Set[int] = set()
+        self.kept_recommendations: Set[int] = set()
+    
+    def render(self) -> str:
+        sentences = [s for i, s in enumerate(self.sentences) if i in self.kept_sentences]
+        evaluation = "".join(sentences)
+        if len(sentences) < len(self.sentences):
+            evaluation += f"…（{len(self.sentences) - len(sentences)}文省略）"
+        else:
+            evaluation = self.result.evaluation
+        recommendations = [
+            rec + (f"（同様の指摘: {'、'.join(self.also_by[i])}）" if i in self.also_by else "")
+            for i, rec in enumerate(self.recommendations)
+            if i in self.kept_recommendations
+        ]
+        if len(recommendations) < len(self.recommendations):
+            recommendations.append(f"ほか{len(self.recommendations) - len(recommendations)}件省略")
+        elif not recommendations and self.result.recommendations:
+            recommendations.append("他Workerの推奨事項と同様")
+        return _render_worker(self.result, evaluation, recommendations)
+    
+    def text(self, kind: str, index: int) -> str:
+        return self.sentences[index] if kind == "sentence" else self.recommendations[index]
+    
+    def keep_all(self):
+        self.kept_sentences = set(range(len(self.sentences)))
+        self.kept_recommendations = set(range(len(self.recommendations)))
+    
+    def keep(self, kind: str, index: int, kept: bool = True):
+        target = self.kept_sentences if kind == "sentence" else self.kept_recommendations
+        if kept:
+            target.add(index)
+        else:
+            target.discard(index)
+
+def pack_worker_results(
+    worker_results: List["AgentResult"],
+    budget: Optional[int]
+) -> Tuple[str, Dict[str, Any]]:
+    """Worker結果を推定トークン数の上限に収まるように詰め、BOSSプロンプト用のテキストと圧縮の記録を返す
+    
+    Worker間でほぼ同じ内容の推奨事項（recommendation_clustersで同じクラスタになったもの）は、
+    最もリスクの高いWorkerの記述1件にまとめて他のWorkerの名前を添える。それでも上限に収まらない場合は、
+    全Workerの見出し・リスクレベル・優先度を残したうえで、リスクの高いWorkerから順に評価の先頭の文・
+    推奨事項・残りの文を上限まで詰める。省略した文・推奨事項は件数だけを記載する。
+    """
+    before = estimate_tokens(render_worker_results(worker_results))
+    plans = [_WorkerPlan(result) for result in worker_results]
+    # リスクの高い順（失敗したWorkerは最後）、同じリスクなら列挙順
+    order = sorted(
+        range(len(plans)),
+        key=lambda i: (3 if plans[i].result.error else RISK_ORDER.get(plans[i].result.risk_level, 1), i)
+    )
+    
+    # ほぼ同じ内容の推奨事項をまとめる（リスクの高いWorkerの記述を残し、他のWorkerの名前を添える）
+    items = [(i, rec) for i in order if not plans[i].result.error for rec in plans[i].result.recommendations]
+    owners: Dict[int, Tuple[int, int]] = {}
+    duplicates = 0
+    for (i, rec), label in zip(items, cluster_texts([rec for _, rec in items]).tolist()):
+        plan = plans[i]
+        if label not in owners:
+            owners[label] = (i, len(plan.recommendations))
+            plan.recommendations.append(rec)
+            continue
+        duplicates += 1
+        owner, rec_index = owners[label]
+        also_by = plans[owner].also_by.setdefault(rec_index, [])
+        if owner != i and plan.result.agent_name not in also_by:
+            also_by.append(plan.result.agent_name)
+    
+    def render() -> str:
+        return "\n\n".join(plan.render() for plan in plans)
+    
+    for plan in plans:
+        plan.keep_all()
+    text = render()
+    if budget is None or estimate_tokens(text) <= budget:
+        after = estimate_tokens(text)
+        return text, {
+            "compressed": False,
+            "budget": budget,
+            "estimated_tokens_before": before,
+            "estimated_tokens_after": after,
+            "dropped_tokens": before - after,
+            "duplicate_recommendations": duplicates
+        }
+    
+    for plan in plans:
+        plan.kept_sentences.clear()
+        plan.kept_recommendations.clear()
+    
+    # 詰める順序: (段階, リスク, Worker内の順位, 列挙順)。全Workerの評価の先頭の文と推奨事項を
+    # リスクの高い順に詰めてから、残りの文を同じくリスクの高い順に詰める
+    candidates = []
+    for i in order:
+        plan = plans[i]
+        sequence = (
+            [("sentence", 0)] if plan.sentences else []
+        ) + [("recommendation", j) for j in range(len(plan.recommendations))]
+        rank = RISK_ORDER.get(plan.result.risk_level, 1)
+        for position, (kind, index) in enumerate(sequence):
+            candidates.append(((0, rank, position, i), kind, index))
+        for index in range(1, len(plan.sentences)):
+            candidates.append(((1, rank, index, i), "sentence", index))
+    candidates.sort(key=lambda candidate: candidate[0])
+    
+    remaining = budget - estimate_tokens(render())
+    kept = []
+    for (_, _, _, i), kind, index in candidates:
+        # 区切り（、や改行）の分として1トークン多く見積もる
+        cost = estimate_tokens(plans[i].text(kind, index)) + 1
+        if cost <= remaining:
+            plans[i].keep(kind, index)
+            kept.append((i, kind, index))
+            remaining -= cost
+    
+    # 重複の注記などで上限を超えた場合は、優先度の低いものから外す
+    text = render()
+    while kept and estimate_tokens(text) > budget:
+        i, kind, index = kept.pop()
+        plans[i].keep(kind, index, kept=False)
+        text = render()
+    
+    after = estimate_tokens(text)
+    workers = {
+        plan.result.agent_name: {
+            "kept_sentences": len(plan.kept_sentences),
+            "total_sentences": len(plan.sentences),
+            "kept_recommendations": len(plan.kept_recommendations),
+            "total_recommendations": len(plan.recommendations)
+        }
+        for plan in plans
+        if not plan.result.error
+    }
+    return text, {
+        "compressed": True,
+        "budget": budget,
+        "estimated_tokens_before": before,
+        "estimated_tokens_after": after,
+        "dropped_tokens": before - after,
+        "over_budget": after > budget,  # 見出し・リスクレベル・優先度だけでも上限を超える場合
+        "duplicate_recommendations": duplicates,
+        "dropped_sentences": sum(w["total_sentences"] - w["kept_sentences"] for w in workers.values()),
+        "dropped_recommendations": sum(w["total_recommendations"] - w["kept_recommendations"] for w in workers.values()),
+        "workers": workers
+    }
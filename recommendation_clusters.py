@@ -0,0 +1,213 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from agent import AgentResult
+
+RISK_ORDER = {"高": 0, "中": 1, "低": 2}
+
+# 類似判定で無視する空白・句読点・括弧・記号
+_NORMALIZE = re.compile(r"[\s、。,.・:：;；!！?？「」『』()（）\[\]【】<>＜＞\-－_/／]+")
+# MinHashの署名長とLSHの分割（BANDS × ROWS = NUM_PERM）
+NUM_PERM = 60
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+# 1つのクラスタに記録する表記の数の上限
+MAX_VARIANTS = 5
+# MinHashを計算するときに一度に扱う推奨事項の数（メモリ使用量を抑える）
+_CHUNK_TEXTS = 4096
+
+@dataclass
+class RecommendationCluster:
+    representative: str  # 最もリスクの高いWorkerの記述
+    agents: List[str]  # 同様の推奨事項を挙げたWorker（初出順）
+    risk_level: str  # まとめた推奨事項を挙げたWorkerの最も高いリスクレベル
+    priority: str
+    count: int  # まとめた推奨事項の数
+    variants: List[str]  # 表記の異なる記述（最大MAX_VARIANTS件）
+    targets: Optional[List[int]] = None  # バッチ評価で同様の推奨事項が挙がった対象の番号
+
+def normalize_text(text: str) -> str:
+    """全角・半角と大文字・小文字をそろえ、空白・句読点・記号を取り除く"""
+    return _NORMALIZE.sub("", unicodedata.normalize("NFKC", text).lower())
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64の最終段で64ビットのハッシュ値をかき混ぜる（オーバーフローは2^64を法として折り返す）"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+def shingle_hashes(texts: Sequence[str], ngram: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+    """全テキスト（正規化済み）の文字n-gramのハッシュ値と、各テキストの先頭のn-gramの位置をまとめて計算
+    
+    テキストを連結したコードポイント列の上でn-gramを一括でハッシュし、テキストの境界をまたぐn-gramを除く。
+    n文字未満のテキストは末尾を埋めて1つのn-gramとする。
+    """
+    normalized = [text.ljust(ngram, "\0") for text in texts]
+    lengths = np.fromiter((len(text) for text in normalized), dtype=np.int64, count=len(normalized))
+    codes = np.frombuffer("".join(normalized).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    owners = np.repeat(np.arange(len(normalized)), lengths)
+    
+    windows = len(codes) - ngram + 1
+    hashes = np.zeros(windows, dtype=np.uint64)
+    for offset in range(ngram):
+        hashes = _mix(hashes ^ codes[offset:offset + windows])
+    valid = owners[:windows] == owners[ngram - 1:]
+    hashes = hashes[valid]
+    # 各テキストのn-gramの数は length - ngram + 1（1以上）
+    counts = lengths - ngram + 1
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return hashes, offsets
+
+def minhash_signatures(texts: Sequence[str], ngram: int = 2, num_perm: int = NUM_PERM, seed: int = 0) -> np.ndarray:
+    """テキスト（正規化済み）ごとのMinHash署名（num_perm個の32ビット値）"""
+    if not texts:
+        return np.zeros((0, num_perm), dtype=np.uint32)
+    hashes, offsets = shingle_hashes(texts, ngram)
+    rng = np.random.default_rng(seed)
+    # (a·x + b) mod 2^64 の上位32ビットを置換とする（aは奇数）
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    
+    bounds = np.append(offsets, len(hashes))
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for start in range(0, len(texts), _CHUNK_TEXTS):
+        stop = min(start + _CHUNK_TEXTS, len(texts))
+        chunk = hashes[bounds[start]:bounds[stop]]
+        permuted = ((chunk[:, None] * a + b) >> np.uint64(32)).astype(np.uint32)
+        signatures[start:stop] = np.minimum.reduceat(permuted, offsets[start:stop] - bounds[start], axis=0)
+    return signatures
+
+def _leader_clusters(size: int, left: np.ndarray, right: np.ndarray, similarity: np.ndarray) -> np.ndarray:
+    """番号の小さい順に、類似した中心（リーダー）のうち最も近いものに加える。どの中心とも類似しなければ自分が中心になる
+    
+    連結成分でまとめると類似の連鎖で無関係な推奨事項まで1つになるため、各要素は中心との類似度がしきい値以上のものに限る。
+    戻り値は各要素が属する中心の番号。
+    """
+    labels = np.arange(size)
+    if len(left) == 0:
+        return labels
+    earlier, later = np.minimum(left, right), np.maximum(left, right)
+    # 複数の帯で重複した組を除き、後の要素ごとに類似度の高い順に並べる
+    _, unique = np.unique(earlier * size + later, return_index=True)
+    earlier, later, similarity = earlier[unique], later[unique], similarity[unique]
+    order = np.lexsort((-similarity, later))
+    is_leader = [True] * size
+    assigned = labels.tolist()
+    for node, candidate in zip(later[order].tolist(), earlier[order].tolist()):
+        if is_leader[node] and is_leader[candidate]:
+            assigned[node] = candidate
+            is_leader[node] = False
+    return np.asarray(assigned)
+
+def cluster_texts(texts: Sequence[str], threshold: float = 0.5, ngram: int = 2, seed: int = 0) -> np.ndarray:
+    """文字n-gramのJaccard類似度がthreshold以上と推定されるテキストを同じクラスタにまとめる
+    
+    正規化後に同一のテキストは1つにまとめてから、MinHash署名をBANDS個の帯に分け、
+    帯が一致したテキスト同士（LSHの候補）について署名の一致率（Jaccard類似度の推定値）を確かめる。
+    戻り値は初出順に0から振ったクラスタ番号。
+    """
+    if len(texts) == 0:
+        return np.zeros(0, dtype=np.int64)
+    distinct: Dict[str, int] = {}
+    inverse = np.fromiter(
+        (distinct.setdefault(normalize_text(text), len(distinct)) for text in texts),
+        dtype=np.int64,
+        count=len(texts)
+    )
+    size = len(distinct)
+    signatures = minhash_signatures(list(distinct), ngram, seed=seed)
+    
+    left: List[np.ndarray] = []
+    right: List[np.ndarray] = []
+    weights = _mix(np.arange(1, ROWS + 1, dtype=np.uint64))
+    for band in range(BANDS):
+        rows = signatures[:, band * ROWS:(band + 1) * ROWS].astype(np.uint64)
+        keys = _mix((rows * weights).sum(axis=1, dtype=np.uint64))
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        # 同じ帯を持つテキストを、その中で最初のテキストと組にする
+        group_start = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        first = order[np.repeat(group_start, np.diff(np.append(group_start, size)))]
+        candidates = first != order
+        if candidates.any():
+            left.append(first[candidates])
+            right.append(order[candidates])
+    
+    if left:
+        left_all, right_all = np.concatenate(left), np.concatenate(right)
+        similarity = (signatures[left_all] == signatures[right_all]).mean(axis=1)
+        accepted = similarity >= threshold
+        labels = _leader_clusters(size, left_all[accepted], right_all[accepted], similarity[accepted])
+    else:
+        labels = np.arange(size)
+    
+    # 元のテキストに戻し、初出順に0から番号を振り直す
+    labels = labels[inverse]
+    _, first_index, cluster = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first_index), dtype=np.int64)
+    rank[np.argsort(first_index)] = np.arange(len(first_index))
+    return rank[cluster.reshape(-1)]
+
+def _level(levels: List[str]) -> str:
+    return min(levels, key=lambda level: RISK_ORDER.get(level, len(RISK_ORDER)))
+
+def build_clusters(
+    texts: Sequence[str],
+    agents: Sequence[str],
+    risk_levels: Sequence[str],
+    priorities: Sequence[str],
+    labels: np.ndarray,
+    targets: Optional[Sequence[int]] = None
+) -> List[RecommendationCluster]:
+    """クラスタ番号ごとに推奨事項をまとめ、リスクの高い順・挙げたWorkerの多い順に並べる"""
+    members: Dict[int, List[int]] = {}
+    for index, label in enumerate(labels.tolist()):
+        members.setdefault(label, []).append(index)
+    
+    clusters = []
+    for indices in members.values():
+        best = min(indices, key=lambda i: (
+            RISK_ORDER.get(risk_levels[i], len(RISK_ORDER)),
+            RISK_ORDER.get(priorities[i], len(RISK_ORDER)),
+            i
+        ))
+        variants = list(dict.fromkeys(texts[i] for i in indices))
+        clusters.append(RecommendationCluster(
+            representative=texts[best],
+            agents=list(dict.fromkeys(agents[i] for i in indices)),
+            risk_level=_level([risk_levels[i] for i in indices]),
+            priority=_level([priorities[i] for i in indices]),
+            count=len(indices),
+            variants=variants[:MAX_VARIANTS],
+            targets=sorted(set(targets[i] for i in indices)) if targets is not None else None
+        ))
+    clusters.sort(key=lambda cluster: (
+        RISK_ORDER.get(cluster.risk_level, len(RISK_ORDER)),
+        -len(cluster.agents),
+        -cluster.count,
+        RISK_ORDER.get(cluster.priority, len(RISK_ORDER))
+    ))
+    return clusters
+
+def cluster_recommendations(
+    worker_results: List["AgentResult"],
+    threshold: float = 0.5
+) -> List[RecommendationCluster]:
+    """評価に成功したWorkerの推奨事項を、Workerをまたいでほぼ同じ内容ごとにまとめる"""
+    items = [
+        (rec, result.agent_name, result.risk_level, result.priority)
+        for result in worker_results
+        if not result.error
+        for rec in result.recommendations
+    ]
+    if not items:
+        return []
+    texts, agents, risk_levels, priorities = (list(column) for column in zip(*items))
+    return build_clusters(texts, agents, risk_levels, priorities, cluster_texts(texts, threshold))
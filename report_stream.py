@@ -0,0 +1,234 @@
+import json
+import os
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator
+
+from agent import AgentResult, BossResult, WorkerConversation
+from recommendation_clusters import cluster_recommendations
+
+# "json": 終了時に従来形式で一括保存 / "jsonl": 結果が届くたびにイベントを追記
+REPORT_FORMATS = ("json", "jsonl")
+
+def build_report(
+    project_structure: Dict[str, Any],
+    boss_result: BossResult,
+    worker_results: List[AgentResult],
+    conversations: List[WorkerConversation],
+    run_stats: Dict[str, Any],
+    timestamp: Optional[str] = None
+) -> Dict[str, Any]:
+    """評価結果から統合レポート（従来のJSON形式）を生成"""
+    
+    # Worker結果の分類
+    high_priority_workers = []
+    medium_priority_workers = []
+    low_priority_workers = []
+    
+    high_risk_workers = []
+    medium_risk_workers = []
+    low_risk_workers = []
+    
+    for result in worker_results:
+        # 評価に失敗したWorkerはリスク・優先度の集計に含めない（failed_workersで別途報告）
+        if result.error:
+            continue
+        if result.priority == "高":
+            high_priority_workers.append(result)
+        elif result.priority == "中":
+            medium_priority_workers.append(result)
+        else:
+            low_priority_workers.append(result)
+        
+        if result.risk_level == "高":
+            high_risk_workers.append(result)
+        elif result.risk_level == "中":
+            medium_risk_workers.append(result)
+        else:
+            low_risk_workers.append(result)
+    
+    # Workerをまたいでほぼ同じ内容の推奨事項をまとめる
+    clusters = cluster_recommendations(worker_results)
+    
+    report = {
+        "timestamp": timestamp or datetime.now().isoformat(),
+        "project_structure": project_structure,
+        "boss_evaluation": {
+            "agent_name": boss_result.agent_name,
+            "role": boss_result.role,
+            "overall_evaluation": boss_result.overall_evaluation,
+            "final_decision": boss_result.final_decision,
+            "risk_analysis": boss_result.risk_analysis,
+            "improvement_roadmap": boss_result.improvement_roadmap,
+            "prompt_compression": boss_result.prompt_compression
+        },
+        **run_stats,
+        "worker_summary": {
+            "total_workers": len(worker_results),
+            "failed_workers": [r.agent_name for r in worker_results if r.error],
+            "high_priority_issues": len(high_priority_workers),
+            "medium_priority_issues": len(medium_priority_workers),
+            "low_priority_issues": len(low_priority_workers),
+            "high_risk_issues": len(high_risk_workers),
+            "medium_risk_issues": len(medium_risk_workers),
+            "low_risk_issues": len(low_risk_workers),
+            "unique_recommendations": len(clusters)
+        },
+        "worker_results": [
+            {
+                "name": result.agent_name,
+                "role": result.role,
+                "evaluation": result.evaluation,
+                "recommendations": result.recommendations,
+                "risk_level": result.risk_level,
+                "priority": result.priority
+            }
+            for result in worker_results
+        ],
+        "worker_conversations": [
+            {
+                "from_agent": conv.from_agent,
+                "to_agent": conv.to_agent,
+                "message": conv.message,
+                "timestamp": conv.timestamp,
+                "conversation_type": conv.conversation_type
+            }
+            for conv in conversations
+        ],
+        "issues_by_priority": {
+            "high": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in high_priority_workers],
+            "medium": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in medium_priority_workers],
+            "low": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in low_priority_workers]
+        },
+        "issues_by_risk": {
+            "high": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in high_risk_workers],
+            "medium": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in medium_risk_workers],
+            "low": [{"agent": r.agent_name, "recommendations": r.recommendations} for r in low_risk_workers]
+        },
+        # リスクの高い順・挙げたWorkerの多い順に並べた重複のない推奨事項
+        "recommendation_clusters": [asdict(cluster) for cluster in clusters]
+    }
+    
+    return report
+
+class ReportStreamWriter:
+    """評価結果を到着順に1行1イベント（JSONL）で追記するレポートライター"""
+    
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+    
+    def write(self, event_type: str, data: Dict[str, Any]):
+        """イベントを1行追記（インデントなしで書き出し、すぐにフラッシュ）"""
+        event = {"type": event_type, "timestamp": datetime.now().isoformat(), "data": data}
+        self._file.write(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+    
+    def record_run_started(self, target_info: Dict[str, Any], project_structure: Dict[str, Any]):
+        self.write("run_started", {"target_info": target_info, "project_structure": project_structure})
+    
+    def record_worker_result(self, result: AgentResult):
+        self.write("worker_result", asdict(result))
+    
+    def record_conversation(self, conversation: WorkerConversation, order: Optional[int] = None):
+        """会話を記録（orderは列挙順での位置。完了順に書き出しても従来レポートの順序を復元できる）"""
+        self.write("conversation", {**asdict(conversation), "order": order})
+    
+    def record_boss_result(self, result: BossResult):
+        self.write("boss_result", asdict(result))
+    
+    def record_run_finished(self, run_stats: Dict[str, Any]):
+        self.write("run_finished", run_stats)
+    
+    def close(self):
+        self._file.close()
+
+def iter_report_events(path: str) -> Iterator[Dict[str, Any]]:
+    """レポートストリームのイベントを順に読む（書き込み途中の末尾行は無視）"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                return
+
+def load_report_stream(path: str) -> Dict[str, Any]:
+    """レポートストリームから現時点の評価状態を再構築（実行中のストリームも読める）"""
+    state = {
+        "target_info": None,
+        "project_structure": None,
+        "worker_results": {},
+        "conversations": [],
+        "boss_result": None,
+        "run_stats": None,
+        "started_at": None,
+        "finished_at": None
+    }
+    for event in iter_report_events(path):
+        data = event["data"]
+        if event["type"] == "run_started":
+            state["target_info"] = data["target_info"]
+            state["project_structure"] = data["project_structure"]
+            state["started_at"] = event["timestamp"]
+        elif event["type"] == "worker_result":
+            # 同じWorkerの結果が複数ある場合（再実行時など）は後のものを採用
+            state["worker_results"][data["agent_name"]] = AgentResult(**data)
+        elif event["type"] == "conversation":
+            order = data.pop("order", None)
+            state["conversations"].append((order, WorkerConversation(**data)))
+        elif event["type"] == "boss_result":
+            state["boss_result"] = BossResult(**data)
+        elif event["type"] == "run_finished":
+            state["run_stats"] = data
+            state["finished_at"] = event["timestamp"]
+    
+    # 完了順に書き出された会話を列挙順に並べ直す（順序不明のものは末尾）
+    ordered = sorted(state["conversations"], key=lambda item: (item[0] is None, item[0] or 0))
+    state["conversations"] = [conv for _, conv in ordered]
+    return state
+
+def summarize_report_stream(state: Dict[str, Any]) -> Dict[str, Any]:
+    """再構築した状態からサマリー（進捗・判定・リスク/優先度の件数）を作成"""
+    results = list(state["worker_results"].values())
+    succeeded = [r for r in results if not r.error]
+    conversation_types: Dict[str, int] = {}
+    for conv in state["conversations"]:
+        conversation_types[conv.conversation_type] = conversation_types.get(conv.conversation_type, 0) + 1
+    
+    expected_workers = (state["project_structure"] or {}).get("worker_agents", [])
+    return {
+        "status": "finished" if state["finished_at"] else "running",
+        "target_url": (state["target_info"] or {}).get("url"),
+        "started_at": state["started_at"],
+        "finished_at": state["finished_at"],
+        "workers_completed": len(results),
+        "workers_expected": len(expected_workers),
+        "failed_workers": [r.agent_name for r in results if r.error],
+        "risk_levels": {level: sum(1 for r in succeeded if r.risk_level == level) for level in ("高", "中", "低")},
+        "priorities": {level: sum(1 for r in succeeded if r.priority == level) for level in ("高", "中", "低")},
+        "conversations": len(state["conversations"]),
+        "conversation_types": conversation_types,
+        "final_decision": state["boss_result"].final_decision if state["boss_result"] else None
+    }
+
+def build_legacy_report(state: Dict[str, Any]) -> Dict[str, Any]:
+    """レポートストリームから従来形式のJSONレポートを生成"""
+    if state["boss_result"] is None:
+        return {"error": "BOSS評価結果がありません"}
+    
+    worker_order = (state["project_structure"] or {}).get("worker_agents") or list(state["worker_results"])
+    worker_results = [state["worker_results"][name] for name in worker_order if name in state["worker_results"]]
+    return build_report(
+        state["project_structure"],
+        state["boss_result"],
+        worker_results,
+        state["conversations"],
+        state["run_stats"] or {},
+        timestamp=state["finished_at"]
+    )
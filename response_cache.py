@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Any, Optional
+
+CACHE_MODES = ("read-write", "read-only", "off")
+# サイズ上限を超えたら上限のこの割合まで削除する（上限付近で書き込みのたびに削除が走らないように）
+EVICT_TARGET_RATIO = 0.9
+
+class ResponseCache:
+    """Ollamaレスポンスのディスクキャッシュ（SQLite、LRU・有効期限による削除）
+    
+    合計サイズと最も古いエントリの作成時刻を保持しておき、書き込み時はサイズ上限か有効期限を
+    超えた場合にだけ削除を行う（毎回の書き込みで全件を走査しない）。
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        mode: str = "read-write",
+        max_size_mb: float = 256,
+        max_age_days: float = 30
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode} (expected one of {', '.join(CACHE_MODES)})")
+        self.path = path
+        self.mode = mode
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._size = 0  # 保存しているレスポンスの合計バイト数
+        self._oldest_created: Optional[float] = None  # 最も古いエントリの作成時刻
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+        if self.mode == "read-write":
+            self.evict()
+        else:
+            self._refresh_totals()
+    
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """生成結果に影響する項目（モデル・システムプロンプト・プロンプト・オプション等）からキーを作成"""
+        material = {
+            k: payload[k]
+            for k in ("model", "system", "prompt", "options", "format", "context")
+            if k in payload
+        }
+        encoded = json.dumps(material, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """キャッシュを参照（ヒット時はアクセス時刻を更新）"""
+        row = self._conn.execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.max_age_seconds:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        if self.mode == "read-write":
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return row[0]
+    
+    def put(self, key: str, response: str):
+        """レスポンスを保存（read-writeモードのみ）"""
+        if self.mode != "read-write":
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, response, size, now, now)
+        )
+        self._conn.commit()
+        self.writes += 1
+        self._size += size - (previous[0] if previous else 0)
+        if self._oldest_created is None:
+            self._oldest_created = now
+        
+        # サイズ上限か有効期限を超えたときだけ削除する
+        if self._size > self.max_size_bytes or now - self._oldest_created > self.max_age_seconds:
+            self.evict()
+    
+    def _refresh_totals(self):
+        """合計サイズと最も古いエントリの作成時刻を読み直す"""
+        self._size, self._oldest_created = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0), MIN(created_at) FROM responses"
+        ).fetchone()
+    
+    def evict(self):
+        """期限切れのエントリと、サイズ上限を超えた場合は上限のEVICT_TARGET_RATIOまで古いエントリ（LRU）を削除"""
+        cursor = self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+        )
+        self.evictions += cursor.rowcount
+        
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_size_bytes:
+            target = int(self.max_size_bytes * EVICT_TARGET_RATIO)
+            stale = []
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+                if total <= target:
+                    break
+                stale.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            self.evictions += len(stale)
+        self._conn.commit()
+        self._refresh_totals()
+    
+    def stats(self) -> Dict[str, Any]:
+        """ヒット・ミス等の統計を取得"""
+        entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size
+        }
+    
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,140 @@
+import re
+from typing import Any, Dict, List, Literal, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, Field, ValidationError
+
+# セクション名 -> 見出しとして受け付ける表記（長いものから順に照合する）
+WORKER_SECTIONS: Dict[str, Tuple[str, ...]] = {
+    "evaluation": ("評価結果", "評価"),
+    "recommendations": ("推奨事項", "改善提案", "推奨"),
+    "risk_level": ("リスクレベル", "リスク"),
+    "priority": ("優先度", "優先順位")
+}
+
+BOSS_SECTIONS: Dict[str, Tuple[str, ...]] = {
+    "overall_evaluation": ("統合評価結果", "統合評価", "総合評価"),
+    "final_decision": ("最終判定", "判定"),
+    "risk_analysis": ("リスク分析",),
+    "improvement_roadmap": ("改善ロードマップ", "ロードマップ")
+}
+
+# 箇条書きの行頭（-, *, •, ・, 1. / 1)）
+_BULLET = re.compile(r"^[ \t]*(?:[-*•・]|\d+[.)．])(.*)$", re.M)
+_LEVEL = re.compile(r"[高中低]")
+# 英字に挟まれていないGo / No-Go（No Go、NO-GO、全角ハイフン等の表記ゆれも許容）
+_DECISION = re.compile(r"(?<![A-Za-z])(no(?:[ \t]*[-‐－ー_])?[ \t]*)?go(?![A-Za-z])", re.I)
+
+class SectionTokenizer:
+    """見出し行を1つのコンパイル済み正規表現で走査し、応答をセクションごとに分割する
+    
+    `## 評価結果`、`### 1. 評価結果：`、`**評価結果**`、`【評価結果】` などの見出しの表記ゆれを受け付け、
+    見出し行の後ろに続く文字列（`## リスクレベル: 高` の「高」など）もセクション本文に含める。
+    応答全体を1回走査するだけなので、処理時間は応答の長さに比例する。
+    """
+    
+    def __init__(self, sections: Dict[str, Tuple[str, ...]]):
+        self._keys: Dict[str, str] = {}
+        for key, aliases in sections.items():
+            for alias in aliases:
+                self._keys[alias] = key
+        names = "|".join(re.escape(name) for name in sorted(self._keys, key=len, reverse=True))
+        self._heading = re.compile(
+            r"^[ \t]*(?:#{1,6}[ \t]*(?:\*\*)?|\*\*|【)"
+            r"(?:\d+[.)．][ \t]*)?"
+            rf"({names})(?=[ \t*:：】(（]|$)"
+            r"[ \t]*(?:\*\*|】)?[ \t]*[:：]?(?:\*\*)?(.*)$",
+            re.M
+        )
+    
+    def split(self, text: str) -> Dict[str, str]:
+        """セクション名 -> 本文（同じ見出しが複数回現れた場合は連結）。見出し前の前置きは含めない"""
+        parts: Dict[str, List[str]] = {}
+        key: Optional[str] = None
+        start = 0
+        for match in self._heading.finditer(text):
+            if key is not None:
+                parts[key].append(text[start:match.start()])
+            key = self._keys[match.group(1)]
+            parts.setdefault(key, []).append(match.group(2).strip() + "\n")
+            start = match.end()
+        if key is not None:
+            parts[key].append(text[start:])
+        return {name: "".join(chunks) for name, chunks in parts.items()}
+
+WORKER_TOKENIZER = SectionTokenizer(WORKER_SECTIONS)
+BOSS_TOKENIZER = SectionTokenizer(BOSS_SECTIONS)
+
+def section_text(text: str) -> str:
+    """空行を除き、各行の前後の空白を取り除いたテキスト"""
+    return "\n".join(line for line in (line.strip() for line in text.split("\n")) if line)
+
+def bullet_items(text: str) -> List[str]:
+    """箇条書きの項目（空の項目は除く）"""
+    return [item for item in (item.strip() for item in _BULLET.findall(text)) if item]
+
+def parse_level(text: str, default: str = "中") -> str:
+    """最初の空でない行に含まれる高/中/低（見出し行の後ろに書かれた値もこの行に含まれる）"""
+    for line in text.split("\n"):
+        if line.strip():
+            match = _LEVEL.search(line)
+            return match.group(0) if match else default
+    return default
+
+def parse_decision(text: str, default: str = "No-Go") -> str:
+    """最初に現れたGo / No-Goの表記を判定結果とする"""
+    match = _DECISION.search(text)
+    if match is None:
+        return default
+    return "No-Go" if match.group(1) is not None else "Go"
+
+def parse_worker_sections(response: str) -> Dict[str, object]:
+    """Worker応答から評価・推奨事項・リスクレベル・優先度を取り出す（見つからない項目はNone）"""
+    sections = WORKER_TOKENIZER.split(response)
+    return {
+        "evaluation": section_text(sections.get("evaluation", "")) or None,
+        "recommendations": bullet_items(sections.get("recommendations", "")) or None,
+        "risk_level": parse_level(sections["risk_level"]) if "risk_level" in sections else None,
+        "priority": parse_level(sections["priority"]) if "priority" in sections else None
+    }
+
+def parse_boss_sections(response: str) -> Dict[str, object]:
+    """BOSS応答から統合評価・最終判定・リスク分析・改善ロードマップを取り出す（見つからない項目はNone）"""
+    sections = BOSS_TOKENIZER.split(response)
+    return {
+        "overall_evaluation": section_text(sections.get("overall_evaluation", "")) or None,
+        "final_decision": parse_decision(sections["final_decision"]) if "final_decision" in sections else None,
+        "risk_analysis": section_text(sections.get("risk_analysis", "")) or None,
+        "improvement_roadmap": bullet_items(sections.get("improvement_roadmap", "")) or None
+    }
+
+class WorkerResponse(BaseModel):
+    """構造化出力モードのWorker応答（AgentResultのうちLLMが生成する項目）"""
+    evaluation: str = Field(min_length=1, description="専門分野での評価")
+    recommendations: List[str] = Field(min_length=1, description="改善提案")
+    risk_level: Literal["高", "中", "低"]
+    priority: Literal["高", "中", "低"]
+
+class BossResponse(BaseModel):
+    """構造化出力モードのBOSS応答（BossResultのうちLLMが生成する項目）"""
+    overall_evaluation: str = Field(min_length=1, description="プロジェクト全体の品質評価")
+    final_decision: Literal["Go", "No-Go"]
+    risk_analysis: str = Field(min_length=1, description="高/中/低リスクの詳細分析")
+    improvement_roadmap: List[str] = Field(min_length=1, description="短期・中期・長期の改善項目")
+
+# Ollamaのformatに渡すJSONスキーマ
+WORKER_RESPONSE_SCHEMA: Dict[str, Any] = WorkerResponse.model_json_schema()
+BOSS_RESPONSE_SCHEMA: Dict[str, Any] = BossResponse.model_json_schema()
+
+ResponseModel = TypeVar("ResponseModel", bound=BaseModel)
+
+def parse_structured(response: str, model: Type[ResponseModel]) -> Optional[ResponseModel]:
+    """JSON応答をpydanticで検証（コードブロックで囲まれていても受け付ける）。検証に失敗した場合はNone"""
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.strip("`").strip()
+        if text.startswith("json"):
+            text = text[len("json"):]
+    try:
+        return model.model_validate_json(text)
+    except ValidationError:
+        return None
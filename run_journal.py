@@ -0,0 +1,94 @@
+import json
+import os
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from agent import AgentResult, BossResult, WorkerConversation
+
+class RunJournal:
+    """評価の進捗を追記専用のJSONLに記録し、中断した実行の再開に使う"""
+    
+    def __init__(self, path: str, run_id: str, events: Optional[List[Dict[str, Any]]] = None):
+        self.path = path
+        self.run_id = run_id
+        self.events = events or []
+    
+    @classmethod
+    def create(cls, directory: str, run_id: Optional[str] = None) -> "RunJournal":
+        """新しい実行のジャーナルを作成"""
+        os.makedirs(directory, exist_ok=True)
+        run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(directory, f"{run_id}.jsonl")
+        if os.path.exists(path):
+            raise ValueError(f"Run journal already exists: {path}")
+        return cls(path, run_id)
+    
+    @classmethod
+    def load(cls, directory: str, run_id: str) -> "RunJournal":
+        """既存のジャーナルを読み込む（書き込み途中で中断された末尾行は無視）"""
+        path = os.path.join(directory, f"{run_id}.jsonl")
+        if not os.path.exists(path):
+            raise ValueError(f"Run journal not found: {path}")
+        
+        events = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return cls(path, run_id, events)
+    
+    def append(self, event_type: str, data: Dict[str, Any]):
+        """イベントを1行追記し、ディスクまで書き出す"""
+        event = {"type": event_type, "timestamp": datetime.now().isoformat(), "data": data}
+        self.events.append(event)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def record_run_started(self, target_info: Dict[str, Any]):
+        self.append("run_started", {"target_info": target_info})
+    
+    def record_worker_result(self, result: AgentResult):
+        self.append("worker_result", asdict(result))
+    
+    def record_conversation(self, conversation: WorkerConversation):
+        self.append("conversation", asdict(conversation))
+    
+    def record_boss_result(self, result: BossResult):
+        self.append("boss_result", asdict(result))
+    
+    def _data(self, event_type: str) -> List[Dict[str, Any]]:
+        return [event["data"] for event in self.events if event["type"] == event_type]
+    
+    def target_info(self) -> Optional[Dict[str, Any]]:
+        """記録済みの評価対象を取得"""
+        started = self._data("run_started")
+        return started[0]["target_info"] if started else None
+    
+    def completed_worker_results(self) -> Dict[str, AgentResult]:
+        """正常に完了したWorker評価（エージェント名→結果）"""
+        return {
+            data["agent_name"]: AgentResult(**data)
+            for data in self._data("worker_result")
+            if not data.get("error")
+        }
+    
+    def completed_conversations(self) -> Dict[Tuple[str, str, str], WorkerConversation]:
+        """正常に完了した会話（(発言者, 相手, 会話タイプ)→会話）"""
+        return {
+            (data["from_agent"], data["to_agent"], data["conversation_type"]): WorkerConversation(**data)
+            for data in self._data("conversation")
+            if not data.get("error")
+        }
+    
+    def completed_boss_result(self) -> Optional[BossResult]:
+        """正常に完了したBOSS評価"""
+        results = [data for data in self._data("boss_result") if not data.get("error")]
+        return BossResult(**results[-1]) if results else None
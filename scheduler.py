@@ -0,0 +1,24 @@
+import asyncio
+from typing import Dict, Callable, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+class RequestScheduler:
+    """全体およびモデル単位の同時実行数を制限してLLM呼び出しを実行"""
+    
+    def __init__(self, max_concurrent: int, max_concurrent_per_model: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_concurrent_per_model = max(1, max_concurrent_per_model)
+        self._global = asyncio.Semaphore(self.max_concurrent)
+        self._per_model: Dict[str, asyncio.Semaphore] = {}
+    
+    def _model_semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._per_model:
+            self._per_model[model] = asyncio.Semaphore(self.max_concurrent_per_model)
+        return self._per_model[model]
+    
+    async def run(self, model: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """枠が空くまで待機してからfactoryを実行（モデル枠→全体枠の順に確保）"""
+        async with self._model_semaphore(model):
+            async with self._global:
+                return await factory()
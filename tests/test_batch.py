@@ -0,0 +1,44 @@
+import asyncio
+import json
+import os
+
+from rich.console import Console
+
+from batch import run_batch
+from config import BOSS_CONFIG, WORKER_CONFIGS, config
+from mock_ollama import MockOllamaServer
+from multi_agent_system import MultiAgentSystem
+
+TARGETS = [
+    {"url": f"https://example.com/shop{i}", "source_code": f"print({i})", "description": "テスト用の評価対象"}
+    for i in range(4)
+]
+
+def test_batch_reports_only_their_own_calls(tmp_path):
+    models = sorted({worker.model for worker in WORKER_CONFIGS} | {BOSS_CONFIG.model})
+    
+    async def scenario():
+        async with MockOllamaServer(models, latency=0.0) as server:
+            ollama_config = config.ollama.model_copy(update={"base_url": server.url, "endpoints": [], "cache_mode": "off"})
+            async with MultiAgentSystem(stream=False, ollama_config=ollama_config, past_findings=False) as system:
+                system.console = Console(quiet=True)
+                # 1対象分の評価で送るリクエスト数（プレフィックスのcontextは対象ごとに作るため、どの対象でも同じ）
+                await system.run_evaluation(TARGETS[0])
+                per_target = server.requests_served
+                assert system._run_stats()["latency"]["total_calls"] == per_target
+                
+                before = server.requests_served
+                summary = await run_batch(system, TARGETS[1:], str(tmp_path), concurrency=3)
+                assert summary["failed"] == 0
+                assert server.requests_served - before == per_target * 3
+                return per_target, summary
+    
+    per_target, summary = asyncio.run(scenario())
+    for entry in summary["targets"]:
+        with open(os.path.join(tmp_path, entry["report"]), encoding="utf-8") as f:
+            report = json.load(f)
+        # 並行して評価した他の対象の呼び出しが混ざらない
+        assert report["latency"]["total_calls"] == per_target
+        assert report["inference_metrics"]["total"]["calls"] == per_target
+        assert sum(endpoint["run_requests"] for endpoint in report["endpoints"]) == per_target
+        assert report["model_dispatch"]["observed_switches"] <= per_target
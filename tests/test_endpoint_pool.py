@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+from config import config
+from endpoint_pool import CircuitOpenError, EndpointPool
+from mock_ollama import MockOllamaServer
+from ollama_client import OllamaClient, OllamaTimeoutError
+
+MODEL = "gemma3:latest"
+
+def _open_circuit(pool: EndpointPool):
+    endpoint = pool.checkout(MODEL)
+    for _ in range(pool.circuit_failure_threshold):
+        pool.mark_failure(endpoint, Exception("timeout"))
+    pool.release(endpoint)
+    return endpoint
+
+def test_open_circuit_fails_fast_then_allows_one_probe():
+    pool = EndpointPool(["http://a"], circuit_failure_threshold=2, circuit_reset_timeout=30.0)
+    endpoint = _open_circuit(pool)
+    with pytest.raises(CircuitOpenError):
+        pool.checkout(MODEL)
+    
+    # リセット時間の経過後はhalf-openの試行を1件だけ通す
+    endpoint.circuit_opened_at = time.monotonic() - 31.0
+    probe = pool.checkout(MODEL)
+    with pytest.raises(CircuitOpenError):
+        pool.checkout(MODEL)
+    
+    # 試行が失敗すればサーキットを開き直し、成功すれば閉じる
+    pool.mark_failure(probe, Exception("timeout"))
+    pool.release(probe)
+    with pytest.raises(CircuitOpenError):
+        pool.checkout(MODEL)
+    endpoint.circuit_opened_at = time.monotonic() - 31.0
+    probe = pool.checkout(MODEL)
+    pool.mark_success(probe)
+    pool.release(probe)
+    assert pool.checkout(MODEL) is endpoint
+    assert pool.checkout(MODEL) is endpoint
+
+def test_open_circuit_fails_fast_with_adaptive_concurrency():
+    client = OllamaClient(config.ollama.model_copy(update={"base_url": "http://a", "endpoints": [], "cache_mode": "off"}))
+    assert client.pool.endpoints[0].limiter is not None
+    _open_circuit(client.pool)
+    with pytest.raises(CircuitOpenError):
+        client.pool.checkout(MODEL)
+
+def test_read_timeouts_reduce_concurrency_limit():
+    async def scenario():
+        async with MockOllamaServer([MODEL], latency=1.0) as server:
+            client = OllamaClient(config.ollama.model_copy(update={
+                "base_url": server.url, "endpoints": [], "cache_mode": "off", "timeout": 0.2, "max_retries": 0,
+                "adaptive_initial_limit": 4
+            }))
+            async with client:
+                for _ in range(2):
+                    with pytest.raises(OllamaTimeoutError):
+                        await client.generate_response(MODEL, "評価してください")
+            return client.pool.endpoints[0].limiter
+    
+    limiter = asyncio.run(scenario())
+    assert limiter.decreases >= 1
+    assert limiter.current_limit < 4
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pytest
+
+from finding_index import FindingIndex, LocalEmbedder, extract_findings, index_reports, search_findings
+
+def _write_report(path, workers):
+    report = {
+        "timestamp": "2026-01-01T00:00:00",
+        "worker_results": [
+            {"name": name, "role": "role", "evaluation": evaluation, "recommendations": recommendations,
+             "risk_level": "中", "priority": "高"}
+            for name, evaluation, recommendations in workers
+        ]
+    }
+    path.write_text(json.dumps(report, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+def test_extract_findings_skips_empty_text():
+    report = {"worker_results": [{"name": "A", "evaluation": " ", "recommendations": ["監視を追加", ""]}]}
+    findings = extract_findings(report, "r.json")
+    assert [(f["agent"], f["kind"], f["text"]) for f in findings] == [("A", "recommendation", "監視を追加")]
+    assert extract_findings({"results": []}, "other.json") == []
+
+def test_index_append_search_and_incremental_skip(tmp_path):
+    first = _write_report(tmp_path / "r1.json", [
+        ("セキュリティ", "CSPヘッダーが未設定です", ["CSPとHSTSのヘッダーを設定する"]),
+        ("法務", "特定商取引法の表記がありません", ["特定商取引法に基づく表記ページを追加する"])
+    ])
+    second = _write_report(tmp_path / "r2.json", [("性能", "画像が最適化されていません", ["画像を遅延読み込みする"])])
+    unsupported = tmp_path / "other.json"
+    unsupported.write_text("{}", encoding="utf-8")
+    directory = str(tmp_path / "index")
+    embedder = LocalEmbedder(128)
+    
+    async def scenario():
+        index = FindingIndex(directory)
+        stats = await index_reports(index, embedder, [first, str(unsupported)])
+        assert stats == {"indexed_reports": 1, "skipped_reports": 0, "unsupported_reports": 1, "findings": 4}
+        
+        # 索引済みのレポートはスキップし、新しいレポートだけを追記する
+        reopened = FindingIndex(directory)
+        stats = await index_reports(reopened, embedder, [first, str(unsupported), second])
+        assert stats == {"indexed_reports": 1, "skipped_reports": 2, "unsupported_reports": 0, "findings": 2}
+        assert reopened.count == 6
+        assert reopened.vectors().shape == (6, 128)
+        
+        [hits] = await search_findings(reopened, embedder, ["特定商取引法に基づく表記を追加"], top_k=2)
+        assert hits[0]["agent"] == "法務"
+        assert hits[0]["score"] >= hits[1]["score"]
+        
+        [hits, none] = await search_findings(FindingIndex(directory), embedder, ["ヘッダーを設定", "ヘッダーを設定"],
+                                             top_k=5, agents=["性能", "未知のWorker"])
+        assert {hit["agent"] for hit in hits} == {"性能"} and len(hits) == 2
+        assert none == []
+        
+        with pytest.raises(Exception):
+            FindingIndex(directory).check_embedder(LocalEmbedder(64))
+    
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+
+from rich.console import Console
+
+from batch import run_batch
+from config import BOSS_CONFIG, WORKER_CONFIGS, config
+from mock_ollama import MockOllamaServer
+from multi_agent_system import MultiAgentSystem
+
+TARGETS = [
+    {"url": f"https://example.com/shop{i}", "source_code": f"print({i})", "description": "テスト用の評価対象"}
+    for i in range(3)
+]
+
+def test_release_model_counts_holders():
+    from ollama_client import OllamaClient
+    client = OllamaClient(config.ollama.model_copy(update={"cache_mode": "off"}))
+    client.hold_models(["a", "b"])
+    client.hold_models(["a"])
+    assert client.release_model("a") is False
+    assert client.release_model("a") is True
+    assert client.release_model("b") is True
+    assert client.model_holds == {}
+
+def test_batch_does_not_unload_models_in_use_by_other_targets(tmp_path):
+    models = sorted({worker.model for worker in WORKER_CONFIGS} | {BOSS_CONFIG.model})
+    unloads = []
+    
+    async def scenario():
+        async with MockOllamaServer(models, latency=0.0) as server:
+            ollama_config = config.ollama.model_copy(update={"base_url": server.url, "endpoints": [], "cache_mode": "off"})
+            async with MultiAgentSystem(
+                stream=False, dispatch_mode="model_affinity", ollama_config=ollama_config, past_findings=False
+            ) as system:
+                system.console = Console(quiet=True)
+                client = system.ollama_client
+                unload_model = client.unload_model
+                
+                async def record_unload(model: str):
+                    # 解放する時点で、他の対象がそのモデルを使用中として数えていない
+                    unloads.append((model, client.model_holds.get(model, 0)))
+                    await unload_model(model)
+                
+                client.unload_model = record_unload
+                summary = await run_batch(system, TARGETS, str(tmp_path), concurrency=len(TARGETS))
+                assert summary["failed"] == 0
+                assert client.model_holds == {}
+    
+    asyncio.run(scenario())
+    assert unloads
+    assert all(holders == 0 for _, holders in unloads)
+    # 並行する対象のうち最後に使い終えた対象だけが解放する
+    assert len(unloads) == len({model for model, _ in unloads})
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from config import config
+from mock_ollama import MockOllamaServer
+from ollama_client import GenerationStats, OllamaClient, OllamaTimeoutError
+
+MODEL = "gemma3:latest"
+
+def _client(url: str) -> OllamaClient:
+    # 応答待ち（sock_read）のタイムアウトを遅延より短くし、リトライしない
+    return OllamaClient(config.ollama.model_copy(update={
+        "base_url": url, "endpoints": [], "cache_mode": "off", "timeout": 0.2, "max_retries": 0
+    }))
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_slow_endpoint_raises_timeout_error(stream):
+    async def scenario():
+        async with MockOllamaServer([MODEL], latency=1.0) as server:
+            async with _client(server.url) as client:
+                with pytest.raises(OllamaTimeoutError):
+                    if stream:
+                        async for _ in client.stream_response(MODEL, "評価してください"):
+                            pass
+                    else:
+                        await client.generate_response(MODEL, "評価してください")
+    
+    asyncio.run(scenario())
+
+def test_hedge_delay_ignores_prefix_priming():
+    client = OllamaClient(config.ollama.model_copy(update={"cache_mode": "off", "hedge_min_samples": 5}))
+    # 数トークンしか生成しないプライミングは短く、混ぜるとp95が下がる
+    client.call_stats = [GenerationStats(MODEL, False, None, 0.05, phase="prefix") for _ in range(20)]
+    assert client._hedge_delay(MODEL) is None
+    client.call_stats += [GenerationStats(MODEL, False, None, 2.0, phase="worker_evaluation") for _ in range(5)]
+    assert client._hedge_delay(MODEL) == 2.0
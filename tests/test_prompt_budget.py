@@ -0,0 +1,42 @@
+from agent import AgentResult
+from prompt_budget import estimate_tokens, pack_worker_results, render_worker_results, split_sentences
+
+def _result(name: str, risk_level: str, recommendations, evaluation: str = "評価は概ね良好です。監視の整備が必要です。") -> AgentResult:
+    return AgentResult(name, "role", evaluation, recommendations, risk_level, "中")
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("評価結果") == 4
+    assert estimate_tokens("hello world") == 4
+    assert estimate_tokens("12345") == 2
+    assert estimate_tokens("a\nb") == 3
+    assert estimate_tokens("（CSP）") == 3
+
+def test_split_sentences():
+    assert split_sentences("決済は安全です。表記が不足しています！\n対応してください") == [
+        "決済は安全です。", "表記が不足しています！", "対応してください"
+    ]
+
+def test_pack_worker_results_without_budget_merges_duplicates():
+    results = [
+        _result("A", "低", ["セキュリティヘッダー（CSP、HSTS）を設定する"]),
+        _result("B", "高", ["セキュリティヘッダー(CSP, HSTS)を設定する", "ログを監査する"])
+    ]
+    text, compression = pack_worker_results(results, None)
+    # リスクの高いBの記述を残し、Aの重複した推奨事項はまとめられる
+    assert text.count("HSTS") == 1
+    assert "ログを監査する" in text
+    assert estimate_tokens(text) <= estimate_tokens(render_worker_results(results))
+    assert compression["compressed"] is False
+    assert compression["duplicate_recommendations"] == 1
+
+def test_pack_worker_results_respects_budget():
+    long_evaluation = "。".join(f"観点{i}について詳細な確認が必要です" for i in range(40)) + "。"
+    results = [_result(name, level, [f"{name}の推奨事項{i}" for i in range(10)], long_evaluation)
+               for name, level in (("A", "低"), ("B", "高"), ("C", "中"))]
+    text, compression = pack_worker_results(results, 300)
+    assert estimate_tokens(text) <= 300
+    # 全Workerの見出しは残る
+    assert all(name in text for name in "ABC")
+    assert compression["compressed"] is True and not compression["over_budget"]
+    assert compression["dropped_sentences"] > 0
@@ -0,0 +1,29 @@
+from agent import AgentResult
+from recommendation_clusters import cluster_recommendations, cluster_texts
+
+def test_cluster_texts_groups_near_duplicates():
+    labels = cluster_texts([
+        "セキュリティヘッダー（CSP、HSTS）を設定する",
+        "特定商取引法に基づく表記ページを追加する",
+        "セキュリティヘッダー(CSP, HSTS)を設定する。",
+        "セキュリティヘッダーCSPとHSTSを設定する",
+        "特定商取引法に基づく表記ページを追加する"
+    ])
+    assert labels.tolist() == [0, 1, 0, 0, 1]
+    assert cluster_texts([]).tolist() == []
+
+def test_cluster_texts_keeps_unrelated_texts_apart():
+    labels = cluster_texts(["画像を遅延読み込みする", "パスワードをハッシュ化して保存する", "ログを監査する"])
+    assert labels.tolist() == [0, 1, 2]
+
+def test_cluster_recommendations_orders_by_risk_and_agents():
+    results = [
+        AgentResult("A", "role", "評価", ["ログを監査する", "画像を遅延読み込みする"], "低", "低"),
+        AgentResult("B", "role", "評価", ["ログを監査する。"], "高", "中"),
+        AgentResult("C", "role", "", [], "", "", error="timeout")
+    ]
+    clusters = cluster_recommendations(results)
+    assert [cluster.agents for cluster in clusters] == [["A", "B"], ["A"]]
+    assert clusters[0].representative == "ログを監査する。"
+    assert clusters[0].risk_level == "高"
+    assert clusters[0].count == 2
@@ -0,0 +1,89 @@
+import pytest
+
+from mock_ollama import DEFAULT_RESPONSE
+from response_parser import (
+    BossResponse,
+    WorkerResponse,
+    parse_boss_sections,
+    parse_decision,
+    parse_level,
+    parse_structured,
+    parse_worker_sections
+)
+
+@pytest.mark.parametrize("text, expected", [
+    ("高 - リリース前に対応が必要", "高"),
+    ("\n\n  低\n高", "低"),
+    ("リスクは中程度", "中"),
+    ("特になし\n高", "中"),
+    ("", "中")
+])
+def test_parse_level(text, expected):
+    assert parse_level(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("Go", "Go"),
+    ("No-Go - 法的表記の不備", "No-Go"),
+    ("NO GO", "No-Go"),
+    ("no－go", "No-Go"),
+    ("判定: Go（条件付き）", "Go"),
+    ("Google Analyticsを導入済み", "No-Go"),
+    ("", "No-Go")
+])
+def test_parse_decision(text, expected):
+    assert parse_decision(text) == expected
+
+def test_parse_worker_sections_default_response():
+    sections = parse_worker_sections(DEFAULT_RESPONSE)
+    assert sections["evaluation"].startswith("決済フローはStripe Checkout")
+    assert sections["recommendations"] == [
+        "特定商取引法に基づく表記ページを追加する",
+        "決済失敗時のエラーメッセージを具体化する",
+        "セキュリティヘッダー（CSP、HSTS）を設定する"
+    ]
+    assert sections["risk_level"] == "中"
+    assert sections["priority"] == "高"
+
+@pytest.mark.parametrize("response", [
+    "## 評価結果\n良好\n## 推奨事項\n- 監視を追加\n## リスクレベル: 低\n## 優先度: 高",
+    "### 1. 評価結果：\n良好\n### 2. 推奨事項：\n1. 監視を追加\n### 3. リスクレベル：低\n### 4. 優先度：高",
+    "**評価結果**\n良好\n**推奨事項**\n* 監視を追加\n**リスクレベル**: 低\n**優先度**: 高",
+    "【評価】\n良好\n【改善提案】\n・監視を追加\n【リスク】低\n【優先順位】高",
+    "前置きの文章\n\n## 評価結果\n良好\n\n## 推奨事項\n- 監視を追加\n\n## リスクレベル\n低\n\n## 優先度\n高"
+])
+def test_parse_worker_sections_heading_variants(response):
+    assert parse_worker_sections(response) == {
+        "evaluation": "良好",
+        "recommendations": ["監視を追加"],
+        "risk_level": "低",
+        "priority": "高"
+    }
+
+def test_parse_worker_sections_missing_sections():
+    assert parse_worker_sections("見出しのない応答") == {
+        "evaluation": None,
+        "recommendations": None,
+        "risk_level": None,
+        "priority": None
+    }
+
+def test_parse_boss_sections_default_response():
+    sections = parse_boss_sections(DEFAULT_RESPONSE)
+    assert sections["overall_evaluation"].startswith("Workerの評価を統合すると")
+    assert sections["final_decision"] == "No-Go"
+    assert "法的表記" in sections["risk_analysis"]
+    assert sections["improvement_roadmap"][0] == "短期: 特定商取引法に基づく表記の追加"
+
+def test_parse_boss_sections_decision_on_heading_line():
+    sections = parse_boss_sections("## 総合評価\n概ね良好\n## 最終判定: Go\n## ロードマップ\n- 監視の整備")
+    assert sections["overall_evaluation"] == "概ね良好"
+    assert sections["final_decision"] == "Go"
+    assert sections["risk_analysis"] is None
+    assert sections["improvement_roadmap"] == ["監視の整備"]
+
+def test_parse_structured():
+    response = '```json\n{"evaluation": "良好", "recommendations": ["監視を追加"], "risk_level": "低", "priority": "高"}\n```'
+    parsed = parse_structured(response, WorkerResponse)
+    assert parsed == WorkerResponse(evaluation="良好", recommendations=["監視を追加"], risk_level="低", priority="高")
+    assert parse_structured('{"final_decision": "Maybe"}', BossResponse) is None
+    assert parse_structured("JSONではない応答", WorkerResponse) is None
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+import pytest
+from rich.console import Console
+
+from agent import AgentResult, WorkerConversation
+from config import BOSS_CONFIG, WORKER_CONFIGS, config
+from mock_ollama import MockOllamaServer
+from multi_agent_system import MultiAgentSystem
+from run_journal import RunJournal
+
+TARGET = {"url": "https://example.com", "source_code": "print('hello')", "description": "テスト用の評価対象"}
+
+def _result(name: str, error=None) -> AgentResult:
+    return AgentResult(name, "role", "評価", ["推奨"], "中", "高", error=error)
+
+def test_create_rejects_existing_run(tmp_path):
+    RunJournal.create(str(tmp_path), "run1").record_run_started(TARGET)
+    with pytest.raises(ValueError):
+        RunJournal.create(str(tmp_path), "run1")
+    with pytest.raises(ValueError):
+        RunJournal.load(str(tmp_path), "missing")
+
+def test_load_skips_failed_events_and_torn_tail(tmp_path):
+    journal = RunJournal.create(str(tmp_path), "run1")
+    journal.record_run_started(TARGET)
+    journal.record_worker_result(_result("A"))
+    journal.record_worker_result(_result("B", error="timeout"))
+    journal.record_conversation(WorkerConversation("A", "B", "質問", "2026-01-01T00:00:00", "question"))
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "worker_result", "data": {"agent_na')
+    
+    loaded = RunJournal.load(str(tmp_path), "run1")
+    assert loaded.target_info() == TARGET
+    assert list(loaded.completed_worker_results()) == ["A"]
+    assert loaded.completed_worker_results()["A"] == _result("A")
+    assert list(loaded.completed_conversations()) == [("A", "B", "question")]
+    assert loaded.completed_boss_result() is None
+
+async def _evaluate(url: str, journal: RunJournal) -> MultiAgentSystem:
+    ollama_config = config.ollama.model_copy(update={"base_url": url, "endpoints": [], "cache_mode": "off"})
+    async with MultiAgentSystem(stream=False, journal=journal, ollama_config=ollama_config, past_findings=False) as system:
+        system.console = Console(quiet=True)
+        await system.run_evaluation(journal.target_info() or TARGET)
+        return system
+
+def test_resume_skips_completed_requests(tmp_path):
+    models = sorted({worker.model for worker in WORKER_CONFIGS} | {BOSS_CONFIG.model})
+    
+    async def scenario():
+        async with MockOllamaServer(models, latency=0.0) as server:
+            # 最初の実行で全リクエストを記録
+            journal = RunJournal.create(str(tmp_path), "run1")
+            first = await _evaluate(server.url, journal)
+            total = server.requests_served
+            assert first.boss_result is not None and first.boss_result.error is None
+            
+            # 完了済みの実行を再開しても、リクエストは発生しない
+            resumed = await _evaluate(server.url, RunJournal.load(str(tmp_path), "run1"))
+            assert server.requests_served == total
+            assert resumed.boss_result == first.boss_result
+            assert [r.agent_name for r in resumed.worker_results] == [r.agent_name for r in first.worker_results]
+            
+            # 1件目のWorker評価の直後で中断された実行は、残りのリクエストだけを送る
+            with open(journal.path, encoding="utf-8") as f:
+                events = [json.loads(line) for line in f]
+            kept = [events[0], next(event for event in events if event["type"] == "worker_result")]
+            partial = tmp_path / "run2.jsonl"
+            partial.write_text("".join(json.dumps(event, ensure_ascii=False) + "\n" for event in kept), encoding="utf-8")
+            before = server.requests_served
+            await _evaluate(server.url, RunJournal.load(str(tmp_path), "run2"))
+            assert server.requests_served - before == total - 1
+    
+    asyncio.run(scenario())
@@ -0,0 +1,9 @@
+import pytest
+
+from benchmark import benchmark_startup
+
+@pytest.mark.parametrize("command", ["show-config", "show-structure", "preview-conversations"])
+def test_startup_does_not_import_heavy_modules(command):
+    # 評価時にしか使わない重いモジュール（aiohttp、エージェント等）を起動時に読み込まない
+    [result] = benchmark_startup([command], repeat=1)
+    assert result["forbidden_modules"] == []
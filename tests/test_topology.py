@@ -0,0 +1,33 @@
+import pytest
+
+from topology import build_pairs, parse_conversation_types
+
+NAMES = ["A", "B", "C", "D"]
+
+def test_build_pairs_counts():
+    assert len(build_pairs(NAMES, "all-pairs")) == 12
+    assert build_pairs(NAMES, "ring") == [(0, 1), (1, 2), (2, 3), (3, 0)]
+    assert build_pairs(NAMES, "star", hub="C") == [(2, 0), (0, 2), (2, 1), (1, 2), (2, 3), (3, 2)]
+    assert build_pairs(["A"], "all-pairs") == []
+
+def test_build_pairs_random_k_is_deterministic():
+    pairs = build_pairs(NAMES, "random-k", neighbors=2, seed=7)
+    assert pairs == build_pairs(NAMES, "random-k", neighbors=2, seed=7)
+    assert len(pairs) == 8
+    assert all(i != j for i, j in pairs)
+    assert len(build_pairs(NAMES, "random-k", neighbors=10, seed=7)) == 12
+
+def test_build_pairs_rejects_invalid_arguments():
+    with pytest.raises(ValueError):
+        build_pairs(NAMES, "mesh")
+    with pytest.raises(ValueError):
+        build_pairs(NAMES, "star", hub="Z")
+    with pytest.raises(ValueError):
+        build_pairs(NAMES, "random-k", neighbors=0)
+
+def test_parse_conversation_types():
+    assert parse_conversation_types("dispute, question") == ["question", "dispute"]
+    with pytest.raises(ValueError):
+        parse_conversation_types("question,chat")
+    with pytest.raises(ValueError):
+        parse_conversation_types(" , ")
@@ -0,0 +1,60 @@
+import random
+from typing import List, Optional, Tuple
+
+TOPOLOGIES = ("all-pairs", "ring", "star", "random-k")
+CONVERSATION_TYPES = ("question", "answer", "collaboration", "dispute")
+
+def build_pairs(
+    names: List[str],
+    topology: str = "all-pairs",
+    hub: Optional[str] = None,
+    neighbors: int = 2,
+    seed: Optional[int] = None
+) -> List[Tuple[int, int]]:
+    """会話する（話しかける側, 相手）のインデックスの組を決定的な順序で列挙
+    
+    all-pairs: 全ての順序付きペア（N·(N−1)組）
+    ring: 各Workerが次のWorkerに話しかける（N組）
+    star: 中心のWorkerと他の各Workerが双方向に話しかける（2·(N−1)組）
+    random-k: 各Workerがシード付き乱数で選んだk人に話しかける（N·k組）
+    """
+    n = len(names)
+    if n < 2:
+        return []
+    
+    if topology == "all-pairs":
+        return [(i, j) for i in range(n) for j in range(n) if i != j]
+    
+    if topology == "ring":
+        # 2人の場合は(0, 1), (1, 0)となる
+        return [(i, (i + 1) % n) for i in range(n)]
+    
+    if topology == "star":
+        if hub is not None and hub not in names:
+            raise ValueError(f"Unknown hub worker: {hub}")
+        center = names.index(hub) if hub is not None else 0
+        return [pair for i in range(n) if i != center for pair in ((center, i), (i, center))]
+    
+    if topology == "random-k":
+        if neighbors < 1:
+            raise ValueError("neighbors must be at least 1")
+        rng = random.Random(seed)
+        k = min(neighbors, n - 1)
+        return [
+            (i, j)
+            for i in range(n)
+            for j in sorted(rng.sample([other for other in range(n) if other != i], k))
+        ]
+    
+    raise ValueError(f"Unknown topology: {topology} (expected one of {', '.join(TOPOLOGIES)})")
+
+def parse_conversation_types(value: str) -> List[str]:
+    """カンマ区切りの会話タイプを検証して列挙順に並べる"""
+    requested = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in requested if item not in CONVERSATION_TYPES]
+    if unknown or not requested:
+        raise ValueError(
+            f"Unknown conversation types: {', '.join(unknown) or value!r} "
+            f"(expected a comma-separated subset of {', '.join(CONVERSATION_TYPES)})"
+        )
+    return [conv_type for conv_type in CONVERSATION_TYPES if conv_type in requested]